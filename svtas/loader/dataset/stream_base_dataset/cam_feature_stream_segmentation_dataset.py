@@ -7,12 +7,10 @@ Description: feature dataset class
 FilePath     : /SVTAS/svtas/loader/dataset/stream_base_dataset/cam_feature_stream_segmentation_dataset.py
 '''
 
-import copy
 import os
 import os.path as osp
 
 import numpy as np
-import torch
 
 from ...builder import DATASET
 from .stream_base_dataset import StreamDataset
@@ -109,36 +107,8 @@ class CAMFeatureStreamSegmentationDataset(StreamDataset):
         return info_list
     
     def _get_one_videos_clip(self, idx, info):
-        feature_list = []
-        labels_list = []
-        masks_list = []
-        vid_list = []
-        precise_sliding_num_list = []
-
-        for single_info in info:
-            sample_segment = single_info.copy()
-            sample_segment['sample_sliding_idx'] = idx
-            sample_segment = self.pipeline(sample_segment)
-            # imgs: tensor labels: ndarray mask: ndarray vid_list : str list
-            feature_list.append(copy.deepcopy(sample_segment['feature'].unsqueeze(0)))
-            labels_list.append(np.expand_dims(sample_segment['labels'], axis=0).copy())
-            masks_list.append(np.expand_dims(sample_segment['masks'], axis=0).copy())
-            vid_list.append(copy.deepcopy(sample_segment['video_name']))
-            precise_sliding_num_list.append(np.expand_dims(sample_segment['precise_sliding_num'], axis=0).copy())
-
-        feature = copy.deepcopy(torch.concat(feature_list, dim=0))
-        labels = copy.deepcopy(np.concatenate(labels_list, axis=0).astype(np.int64))
-        masks = copy.deepcopy(np.concatenate(masks_list, axis=0).astype(np.float32))
-        precise_sliding_num = copy.deepcopy(np.concatenate(precise_sliding_num_list, axis=0).astype(np.float32))
-
-        # compose result
-        data_dict = {}
-        data_dict['feature'] = feature
-        data_dict['raw_feature'] = copy.deepcopy(feature)
-        data_dict['labels'] = labels
-        data_dict['masks'] = masks
-        data_dict['precise_sliding_num'] = precise_sliding_num
-        data_dict['vid_list'] = vid_list
+        data_dict = self._compose_videos_clip(idx, info, tensor_keys=['feature'])
+        data_dict['raw_feature'] = data_dict['feature'].clone()
         return data_dict
     
     def _get_end_videos_clip(self):
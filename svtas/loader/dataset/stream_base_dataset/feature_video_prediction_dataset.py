@@ -6,10 +6,7 @@ LastEditTime : 2022-11-08 10:00:56
 Description  : Feature Video Prediction dataset
 FilePath     : /SVTAS/svtas/loader/dataset/stream_base_dataset/feature_video_prediction_dataset.py
 '''
-import copy
-
 import numpy as np
-import torch
 
 from ...builder import DATASET
 from .feature_stream_segmentation_dataset import \
@@ -23,40 +20,9 @@ class FeatureVideoPredictionDataset(FeatureStreamSegmentationDataset):
         super().__init__(**kwargs)
     
     def _get_one_videos_clip(self, idx, info):
-        feature_list = []
-        labels_list = []
-        pred_labels_list = []
-        masks_list = []
-        vid_list = []
-        precise_sliding_num_list = []
-
-        for single_info in info:
-            sample_segment = single_info.copy()
-            sample_segment['sample_sliding_idx'] = idx
-            sample_segment = self.pipeline(sample_segment)
-            # imgs: tensor labels: ndarray mask: ndarray vid_list : str list
-            feature_list.append(copy.deepcopy(sample_segment['feature'].unsqueeze(0)))
-            labels_list.append(np.expand_dims(sample_segment['labels'], axis=0).copy())
-            pred_labels_list.append(np.expand_dims(sample_segment['pred_labels'], axis=0).copy())
-            masks_list.append(np.expand_dims(sample_segment['masks'], axis=0).copy())
-            vid_list.append(copy.deepcopy(sample_segment['video_name']))
-            precise_sliding_num_list.append(np.expand_dims(sample_segment['precise_sliding_num'], axis=0).copy())
-
-        feature = copy.deepcopy(torch.concat(feature_list, dim=0))
-        labels = copy.deepcopy(np.tenate(labels_list, axis=0).astype(np.int64))
-        pred_labels = copy.deepcopy(np.concatenate(pred_labels_list, axis=0).astype(np.int64))
-        masks = copy.deepcopy(np.concatenate(masks_list, axis=0).astype(np.float32))
-        precise_sliding_num = copy.deepcopy(np.concatenate(precise_sliding_num_list, axis=0).astype(np.float32))
-
-        # compose result
-        data_dict = {}
-        data_dict['feature'] = feature
-        data_dict['labels'] = labels
-        data_dict['pred_labels'] = pred_labels
-        data_dict['masks'] = masks
-        data_dict['precise_sliding_num'] = precise_sliding_num
-        data_dict['vid_list'] = vid_list
-        return data_dict
+        return self._compose_videos_clip(idx, info, tensor_keys=['feature'],
+                                         array_keys_dtype={'labels': np.int64, 'pred_labels': np.int64,
+                                                           'masks': np.float32, 'precise_sliding_num': np.float32})
     
     def _get_end_videos_clip(self):
         # compose result
@@ -1,9 +1,7 @@
-import copy
 import os
 import os.path as osp
 
 import numpy as np
-import torch
 
 from ...builder import DATASET
 from .raw_frame_stream_segmentation_dataset import \
@@ -129,44 +127,7 @@ class RGBMVsResFrameStreamSegmentationDataset(RawFrameStreamSegmentationDataset)
         return info_list
     
     def _get_one_videos_clip(self, idx, info):
-        imgs_list = []
-        flow_imgs_list = []
-        res_imgs_list = []
-        labels_list = []
-        masks_list = []
-        vid_list = []
-        precise_sliding_num_list = []
-
-        for single_info in info:
-            sample_segment = single_info.copy()
-            sample_segment['sample_sliding_idx'] = idx
-            sample_segment = self.pipeline(sample_segment)
-            # imgs: tensor labels: ndarray mask: ndarray vid_list : str list
-            imgs_list.append(copy.deepcopy(sample_segment['imgs'].unsqueeze(0)))
-            flow_imgs_list.append(copy.deepcopy(sample_segment['flows'].unsqueeze(0)))
-            res_imgs_list.append(copy.deepcopy(sample_segment['res'].unsqueeze(0)))
-            labels_list.append(np.expand_dims(sample_segment['labels'], axis=0).copy())
-            masks_list.append(np.expand_dims(sample_segment['masks'], axis=0).copy())
-            vid_list.append(copy.deepcopy(sample_segment['video_name']))
-            precise_sliding_num_list.append(np.expand_dims(sample_segment['precise_sliding_num'], axis=0).copy())
-
-        imgs = copy.deepcopy(torch.concat(imgs_list, dim=0))
-        flow_imgs = copy.deepcopy(torch.concat(flow_imgs_list, dim=0))
-        res_imgs = copy.deepcopy(torch.concat(res_imgs_list, dim=0))
-        labels = copy.deepcopy(np.concatenate(labels_list, axis=0).astype(np.int64))
-        masks = copy.deepcopy(np.concatenate(masks_list, axis=0).astype(np.float32))
-        precise_sliding_num = copy.deepcopy(np.concatenate(precise_sliding_num_list, axis=0).astype(np.float32))
-        
-        # compose result
-        data_dict = {}
-        data_dict['imgs'] = imgs
-        data_dict['flows'] = flow_imgs
-        data_dict['res'] = res_imgs
-        data_dict['labels'] = labels
-        data_dict['masks'] = masks
-        data_dict['precise_sliding_num'] = precise_sliding_num
-        data_dict['vid_list'] = vid_list
-        return data_dict
+        return self._compose_videos_clip(idx, info, tensor_keys=['imgs', 'flows', 'res'])
     
     def _get_end_videos_clip(self):
         # compose result
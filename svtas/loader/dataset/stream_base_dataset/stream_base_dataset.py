@@ -8,9 +8,14 @@ FilePath     : /SVTAS/loader/dataset/stream_base_dataset/stream_base_dataset.py
 '''
 from abc import abstractmethod
 
+import numpy as np
 import torch
 import os.path as osp
 import torch.utils.data as data
+from ...decode.container_cache import get_container_cache
+from ....utils.logger import get_logger
+
+CONTAINER_PATH_KEYS = ['filename', 'flows_path', 'res_path', 'flow_feature_name']
 
 
 class StreamDataset(data.IterableDataset):
@@ -28,7 +33,9 @@ class StreamDataset(data.IterableDataset):
                  drap_last=False,
                  local_rank=-1,
                  nprocs=1,
-                 data_path=None):
+                 data_path=None,
+                 length_aware_batch=False,
+                 skip_padding_window=True):
         super().__init__()
         self.suffix = suffix
         self.data_path = data_path
@@ -48,6 +55,13 @@ class StreamDataset(data.IterableDataset):
         if self.nprocs > 1:
             self.drap_last = True
         self.video_batch_size = video_batch_size
+        self.train_mode = train_mode
+
+        # length aware schedule
+        self.length_aware_batch = length_aware_batch
+        self.skip_padding_window = skip_padding_window
+        self._video_len_dict = dict()
+        self._padding_sample_dict = dict()
 
         # actions dict generate
         file_ptr = open(self.actions_map_file_path, 'r')
@@ -79,11 +93,69 @@ class StreamDataset(data.IterableDataset):
         for step, sample_videos in enumerate(video_sampler_dataloader):
             if self.drap_last is True and len(list(sample_videos)) < self.video_batch_size:
                 break
-            sample_videos_list.append([step, list(sample_videos)])
+            sample_videos_list.append([step, [int(idx) for idx in sample_videos]])
 
+        if self.length_aware_batch:
+            sample_videos_list = self._length_aware_order_sample(sample_videos_list)
         info_list = self.load_file(sample_videos_list).copy()
         return info_list
     
+    def _load_video_len(self, sample_idx_list):
+        """
+        Get label length of videos, label files are only read once and cached.
+        """
+        miss_idx_list = [idx for idx in sample_idx_list if idx not in self._video_len_dict]
+        if len(miss_idx_list) > 0:
+            info_list = self.load_file([[0, miss_idx_list]])
+            for list_idx, sample_idx in enumerate(miss_idx_list):
+                single_info = info_list[list_idx % self.nprocs][0][2][list_idx // self.nprocs]
+                if 'raw_labels' not in single_info:
+                    return None
+                self._video_len_dict[sample_idx] = len(single_info['raw_labels'])
+        return [self._video_len_dict[idx] for idx in sample_idx_list]
+
+    @staticmethod
+    def _padding_ratio(video_len_list, video_batch_size):
+        padding_len = 0
+        total_len = 0
+        for start_idx in range(0, len(video_len_list), video_batch_size):
+            step_len_list = video_len_list[start_idx:start_idx + video_batch_size]
+            padding_len += max(step_len_list) * len(step_len_list) - sum(step_len_list)
+            total_len += max(step_len_list) * len(step_len_list)
+        return padding_len / max(total_len, 1)
+
+    def _length_aware_order_sample(self, sample_videos_list):
+        """
+        Group videos of similar length into one video batch, so that every step
+        is padded to a closer `max_len`. The order only depends on the shuffled
+        video order, so all ranks and workers get the same schedule.
+        """
+        sample_idx_list = [idx for _, sample_idx in sample_videos_list for idx in sample_idx]
+        video_len_list = self._load_video_len(sample_idx_list)
+        if video_len_list is None:
+            return sample_videos_list
+        video_len_dict = dict(zip(sample_idx_list, video_len_list))
+
+        # stable sort keep the shuffled order of videos with the same length
+        sorted_idx_list = sorted(sample_idx_list, key=lambda idx: video_len_dict[idx])
+        batch_list = [sorted_idx_list[start_idx:start_idx + self.video_batch_size]
+                      for start_idx in range(0, len(sorted_idx_list), self.video_batch_size)]
+        full_batch_list = [batch for batch in batch_list if len(batch) == self.video_batch_size]
+        last_batch_list = [batch for batch in batch_list if len(batch) < self.video_batch_size]
+        if self.train_mode:
+            perm = torch.randperm(len(full_batch_list)).tolist()
+            full_batch_list = [full_batch_list[i] for i in perm]
+        batch_list = full_batch_list + last_batch_list
+
+        raw_padding_ratio = self._padding_ratio(video_len_list, self.video_batch_size)
+        padding_ratio = self._padding_ratio([video_len_dict[idx] for batch in batch_list for idx in batch],
+                                            self.video_batch_size)
+        self.padding_ratio_info = dict(raw_padding_ratio=raw_padding_ratio, padding_ratio=padding_ratio)
+        logger = get_logger("SVTAS")
+        logger.info("length aware batch padding ratio: {:.4f} -> {:.4f}, saved {:.4f}".format(
+            raw_padding_ratio, padding_ratio, raw_padding_ratio - padding_ratio))
+        return [[step, batch] for step, batch in enumerate(batch_list)]
+
     def _genrate_sampler(self, woker_id, num_workers):
         if self.local_rank < 0:
             # single gpu train
@@ -93,6 +165,42 @@ class StreamDataset(data.IterableDataset):
             sample_info_list = self.info_list[self.local_rank]
             return self._step_sliding_sampler(woker_id=woker_id, num_workers=num_workers, info_list=sample_info_list)
     
+    def _video_sliding_num(self, single_info):
+        sliding_window = getattr(self, 'sliding_window', None)
+        if sliding_window is None or 'raw_labels' not in single_info:
+            return None
+        video_len = len(single_info['raw_labels'])
+        return video_len // sliding_window + int(video_len % sliding_window != 0)
+
+    def _release_video_containers(self, info, emitted_sliding_cnt=None):
+        """
+        Retire cached containers of videos whose last sliding window has been emitted,
+        or drop all containers of `info` when `emitted_sliding_cnt` is None.
+        """
+        cache = get_container_cache()
+        if cache is None:
+            return
+        for single_info in info:
+            if emitted_sliding_cnt is not None:
+                video_sliding_num = self._video_sliding_num(single_info)
+                if video_sliding_num is None or emitted_sliding_cnt < video_sliding_num:
+                    continue
+            for key in CONTAINER_PATH_KEYS:
+                if key in single_info:
+                    if emitted_sliding_cnt is None:
+                        cache.discard(single_info[key])
+                    else:
+                        cache.retire(single_info[key])
+
+    def _log_container_cache_info(self, woker_id):
+        cache = get_container_cache()
+        if cache is None:
+            return
+        cache_info = cache.info()
+        logger = get_logger("SVTAS")
+        logger.info("worker {:d} container cache hits: {:d}, misses: {:d}, evictions: {:d}".format(
+            woker_id, cache_info['hits'], cache_info['misses'], cache_info['evictions']))
+
     def _step_sliding_sampler(self, woker_id, num_workers, info_list):
         # dispatch function
         current_sliding_cnt = woker_id * self.temporal_clip_batch_size
@@ -107,6 +215,7 @@ class StreamDataset(data.IterableDataset):
                         data_dict['step'] = step
                         data_dict['current_sliding_cnt'] = current_sliding_cnt
                         yield data_dict
+                        self._release_video_containers(info, emitted_sliding_cnt=current_sliding_cnt + 1)
                         current_sliding_cnt = current_sliding_cnt + 1
                         mini_sliding_cnt = mini_sliding_cnt + 1
                     else:
@@ -121,8 +230,59 @@ class StreamDataset(data.IterableDataset):
             # modify num_worker
             current_sliding_cnt = current_sliding_cnt - sliding_num
             next_step_flag = False
+            self._release_video_containers(info)
+            self._padding_sample_dict.clear()
+        self._log_container_cache_info(woker_id)
         yield self._get_end_videos_clip()
 
+    def _alloc_batch_tensor(self, batch_size, sample):
+        batch_tensor = torch.empty((batch_size, ) + tuple(sample.shape), dtype=sample.dtype)
+        # tensor already in shared memory is not copied again when sent from worker
+        if torch.utils.data.get_worker_info() is not None:
+            batch_tensor.share_memory_()
+        return batch_tensor
+
+    def _compose_videos_clip(self,
+                             idx,
+                             info,
+                             tensor_keys=['imgs'],
+                             array_keys_dtype={'labels': np.int64, 'masks': np.float32, 'precise_sliding_num': np.float32},
+                             list_keys=[]):
+        """
+        Run pipeline for every video of `info` and write each sample straight into
+        preallocated batch buffers, instead of deepcopy and concat.
+        """
+        batch_size = len(info)
+        data_dict = {}
+        vid_list = []
+        for batch_idx, single_info in enumerate(info):
+            sample_segment = self._padding_sample_dict.get(single_info['video_name'], None)
+            if sample_segment is None:
+                sample_segment = single_info.copy()
+                sample_segment['sample_sliding_idx'] = idx
+                sample_segment = self.pipeline(sample_segment)
+                video_sliding_num = self._video_sliding_num(single_info)
+                if self.skip_padding_window and video_sliding_num is not None and idx >= video_sliding_num:
+                    # fully padded windows of a finished video are all the same
+                    self._padding_sample_dict[single_info['video_name']] = sample_segment
+            # imgs: tensor labels: ndarray mask: ndarray vid_list : str list
+            for key in tensor_keys:
+                if batch_idx == 0:
+                    data_dict[key] = self._alloc_batch_tensor(batch_size, sample_segment[key])
+                data_dict[key][batch_idx].copy_(sample_segment[key])
+            for key, dtype in array_keys_dtype.items():
+                value = np.asarray(sample_segment[key])
+                if batch_idx == 0:
+                    data_dict[key] = np.empty((batch_size, ) + value.shape, dtype=dtype)
+                data_dict[key][batch_idx] = value
+            for key in list_keys:
+                if batch_idx == 0:
+                    data_dict[key] = []
+                data_dict[key].append(sample_segment[key])
+            vid_list.append(sample_segment['video_name'])
+        data_dict['vid_list'] = vid_list
+        return data_dict
+
     def __len__(self):
         """get the size of the dataset."""
         return self.step_num
@@ -8,12 +8,15 @@ FilePath     : /SVTAS/svtas/loader/decode/__init__.py
 '''
 from .decode import (FeatureDecoder, VideoDecoder, TwoPathwayVideoDecoder, ThreePathwayVideoDecoder)
 from .container import (NPYContainer, DecordContainer, PyAVContainer, OpenCVContainer,
-                        PyAVMVExtractor)
+                        PyAVMVExtractor, ShardContainer)
+from .container_cache import ContainerCache, get_container_cache
 
 __all__ = [
     'FeatureDecoder', 'TwoPathwayVideoDecoder', 'VideoDecoder',
     'ThreePathwayVideoDecoder',
 
     'NPYContainer', 'DecordContainer', 'PyAVContainer',
-    'OpenCVContainer', 'PyAVMVExtractor'
+    'OpenCVContainer', 'PyAVMVExtractor', 'ShardContainer',
+
+    'ContainerCache', 'get_container_cache'
 ]
\ No newline at end of file
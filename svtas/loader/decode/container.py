@@ -7,6 +7,8 @@ Description  : video container
 FilePath     : /SVTAS/svtas/loader/decode/container.py
 '''
 import re
+import os
+import json
 import av
 import cv2
 import decord as de
@@ -17,27 +19,85 @@ from ..builder import CONTAINER
 
 @CONTAINER.register()
 class NPYContainer(object):
-    def __init__(self, file_path, temporal_dim=-1, is_transpose=False, revesive_name=[(r'(mp4|avi)', 'npy')]):
+    """
+    Numpy feature container.
+
+    Args:
+        file_path: str, path of feature file
+        temporal_dim: int, temporal dim of feature
+        is_transpose: bool, whether transpose feature after load
+        revesive_name: list, regex pairs to convert video path to feature path
+        mmap_mode: str|None, `np.load` mmap_mode, e.g. 'r'. When set, feature file is
+            memory-mapped and `get_batch` only reads the pages of requested frames
+    """
+    def __init__(self,
+                 file_path,
+                 temporal_dim=-1,
+                 is_transpose=False,
+                 revesive_name=[(r'(mp4|avi)', 'npy')],
+                 mmap_mode=None):
         self.temporal_dim = temporal_dim
         self.revesive_name = revesive_name
+        self.mmap_mode = mmap_mode
         for p, r in revesive_name:
             file_path = re.sub(p, r, file_path)
+        # transpose is a strided view, no copy for both load mode
         if is_transpose:
-            self.data = np.load(file_path).T
+            self.data = np.load(file_path, mmap_mode=mmap_mode).T
         else:
-            self.data = np.load(file_path)
+            self.data = np.load(file_path, mmap_mode=mmap_mode)
+        self.concat_containers = []
+        self.concat_dim = None
         self.out_dtype = 'numpy'
+        self.closed = False
     
+    @property
+    def temporal_axis(self):
+        # keep the index axis of `data[:, idx]` / `data[idx, :]`
+        return 1 if self.temporal_dim == -1 else 0
+
+    @property
+    def nbytes(self):
+        # mapped pages are owned by page cache, not by the worker
+        if self.mmap_mode is not None:
+            return 0
+        return self.data.nbytes + sum(c.nbytes for c in self.concat_containers)
+
     def concat(self, rhs_container, dim=0):
-        self.data = np.concatenate([self.data, rhs_container.data], axis=dim)
+        if self.mmap_mode is not None and dim % self.data.ndim != self.temporal_dim % self.data.ndim:
+            # lazy concat, only requested window of each container is concatenated
+            self.concat_containers.append(rhs_container)
+            self.concat_dim = dim
+        else:
+            self.data = np.concatenate([self.data, rhs_container.data], axis=dim)
         return self
 
+    @staticmethod
+    def _frames_idx_to_index(frames_idx):
+        # evenly spaced index can be a slice which returns a view instead of a copy
+        frames_idx = [int(i) for i in frames_idx]
+        if len(frames_idx) > 1:
+            step = frames_idx[1] - frames_idx[0]
+            if step > 0 and all(frames_idx[i + 1] - frames_idx[i] == step for i in range(len(frames_idx) - 1)):
+                return slice(frames_idx[0], frames_idx[-1] + 1, step)
+        elif len(frames_idx) == 1:
+            return slice(frames_idx[0], frames_idx[0] + 1)
+        return frames_idx
+
+    def _get_window(self, frames_idx):
+        index = [slice(None)] * self.data.ndim
+        index[self.temporal_axis] = self._frames_idx_to_index(frames_idx)
+        return self.data[tuple(index)]
+
     def get_batch(self, frames_idx):
-        if self.temporal_dim == -1:
-            return self.data[:, frames_idx]
-        else:
-            return self.data[frames_idx, :]
+        if len(self.concat_containers) > 0:
+            return np.concatenate([self._get_window(frames_idx)] + [c.get_batch(frames_idx) for c in self.concat_containers],
+                                  axis=self.concat_dim)
+        return self._get_window(frames_idx)
     
+    def close(self):
+        self.closed = True
+
     def __len__(self):
         return self.data.shape[self.temporal_dim]
 
@@ -50,6 +110,7 @@ class DecordContainer(object):
         if to_ndarray is True:
             self.out_dtype = 'numpy'
             self.sample_dim = sample_dim
+        self.closed = False
 
     def get_batch(self, frames_idx):
         if self.to_ndarray:
@@ -57,21 +118,103 @@ class DecordContainer(object):
         else:
             return self.data.get_batch(frames_idx)
 
+    def close(self):
+        self.data = None
+        self.closed = True
+
     def __len__(self):
         return len(self.data)
 
+@CONTAINER.register()
+class ShardContainer(object):
+    """
+    Pre-decoded frame shard container, the shards are written by
+    `tools/dataset_transform/convert_video_to_frame_shards.py`. Each video is a
+    directory with an `index.json` and chunked `[chunk_size, H, W, C]` uint8 npy
+    shards which are memory-mapped, so reading a window needs no codec work.
+    Raw optical flow shards of `tools/extract/extract_flow_opencv.py` record
+    their dtype in `index.json`.
+
+    Args:
+        file_path: str, path of video
+        revesive_name: list, regex pairs to convert video path to shard directory
+        to_ndarray: bool, output numpy frames instead of PIL frames
+        sample_dim: int, only used when `to_ndarray` is True, same as `DecordContainer`
+    """
+    def __init__(self,
+                 file_path,
+                 revesive_name=[(r'Videos', 'frame_shards'), (r'\.(mp4|avi)$', '')],
+                 to_ndarray=False,
+                 sample_dim=2):
+        for p, r in revesive_name:
+            file_path = re.sub(p, r, file_path)
+        self.shard_path = file_path
+        with open(os.path.join(file_path, 'index.json'), 'r') as f:
+            self.index = json.load(f)
+        self.chunk_size = self.index['chunk_size']
+        self.num_frames = self.index['num_frames']
+        self.data = {}
+        self.out_dtype = 'PIL'
+        self.to_ndarray = to_ndarray
+        if to_ndarray is True:
+            self.out_dtype = 'numpy'
+            self.sample_dim = sample_dim
+        self.closed = False
+
+    @property
+    def nbytes(self):
+        # shards are memory-mapped, counted as `NPYContainer` with mmap_mode
+        return 0
+
+    def _get_shard(self, shard_idx):
+        if shard_idx not in self.data:
+            self.data[shard_idx] = np.load(os.path.join(self.shard_path, self.index['shards'][shard_idx]), mmap_mode='r')
+        return self.data[shard_idx]
+
+    def get_batch(self, frames_idx):
+        frames_idx = np.asarray(frames_idx, dtype=np.int64)
+        shards_idx = frames_idx // self.chunk_size
+        frames = np.empty([len(frames_idx)] + self.index['frame_shape'], dtype=self.index.get('dtype', 'uint8'))
+        for shard_idx in np.unique(shards_idx):
+            mask = shards_idx == shard_idx
+            frames[mask] = self._get_shard(int(shard_idx))[frames_idx[mask] - shard_idx * self.chunk_size]
+        if self.to_ndarray:
+            return frames[:, :, :, 1:(self.sample_dim+1)]
+        return frames
+
+    def close(self):
+        self.data = {}
+        self.closed = True
+
+    def __len__(self):
+        return self.num_frames
+
 @CONTAINER.register()
 class PyAVContainer(object):
     """
     ref:https://github.com/facebookresearch/SlowFast/blob/main/slowfast/datasets/decoder.py
+
+    Args:
+        file_path: str, path of video
+        multi_thread_decode: bool, whether enable multiple threads for decoding
+        stream_cursor: bool, keep the decoder positioned after each `get_batch` so that
+            consecutive sliding windows of the same video only decode new frames,
+            seeking happens only when indexes go backwards or jump forward past the
+            seek margin. The container is kept open until `close` is called.
     """
-    def __init__(self, file_path, multi_thread_decode=False):
+    def __init__(self, file_path, multi_thread_decode=False, stream_cursor=False):
         container = av.open(file_path)
         if multi_thread_decode:
             # Enable multiple threads for decoding.
             container.streams.video[0].thread_type = "AUTO"
         self.data = container
         self.out_dtype = 'numpy'
+        self.closed = False
+        self.stream_cursor = stream_cursor
+        # stream cursor state
+        self._frame_iter = None
+        self._cursor_idx = -1
+        self._frames_buffer = {}
     
     def pyav_decode_stream(self, frames_index, stream, stream_name):
         """
@@ -102,6 +245,46 @@ class PyAVContainer(object):
         result = [frames[pts] for pts in sorted(frames)]
         return result, max_pts
     
+    def _seek_stream_cursor(self, frames_index, stream, stream_name):
+        margin = 1024
+        seek_offset = max(min(frames_index) - margin, 0)
+        self.data.seek(seek_offset, any_frame=False, backward=True, stream=stream)
+        self._frame_iter = self.data.decode(**stream_name)
+        self._cursor_idx = -1
+
+    def pyav_decode_stream_cursor(self, frames_index, stream, stream_name):
+        """
+        Decode the video with PyAV decoder from the last decoded position.
+        Args:
+            frames_index (list[int]): frame index to be sampled
+            stream (stream): PyAV stream.
+            stream_name (dict): a dictionary of streams.
+        Returns:
+            result (list): list of rgb ndarray frames decoded.
+        """
+        frames = {idx: self._frames_buffer[idx] for idx in frames_index if idx in self._frames_buffer}
+        need_index = [idx for idx in frames_index if idx not in frames]
+        if len(need_index) > 0:
+            margin = 1024
+            if self._frame_iter is None or min(need_index) <= self._cursor_idx \
+                or min(need_index) - self._cursor_idx > margin:
+                self._seek_stream_cursor(need_index, stream, stream_name)
+            max_index = max(need_index)
+            need_index = set(need_index)
+            for frame in self._frame_iter:
+                # frame.pts is start from 1
+                self._cursor_idx = frame.pts - 1
+                if self._cursor_idx in need_index:
+                    frames[self._cursor_idx] = frame.to_rgb().to_ndarray()
+                if self._cursor_idx >= max_index:
+                    break
+            else:
+                # decoder reach end of stream
+                self._frame_iter = None
+        # keep decoded frames of this window for overlapped windows
+        self._frames_buffer = frames
+        return [frames[idx] for idx in sorted(frames)]
+
     def pyav_decode(self, frames_index):
         """
         Convert the video from its original fps to the target_fps. If the video
@@ -118,13 +301,20 @@ class PyAVContainer(object):
 
         frames = None
         # If video stream was found, fetch video frames from the video.
-        if self.data.streams.video:
+        if self.data.streams.video and self.stream_cursor:
+            frames = self.pyav_decode_stream_cursor(
+                frames_index,
+                self.data.streams.video[0],
+                {"video": 0},
+            )
+            frames = np.stack(frames)
+        elif self.data.streams.video:
             video_frames, max_pts = self.pyav_decode_stream(
                 frames_index,
                 self.data.streams.video[0],
                 {"video": 0},
             )
-            self.data.close()
+            self.close()
 
             frames = [frame.to_rgb().to_ndarray() for frame in video_frames]
             frames = np.stack(frames)
@@ -133,16 +323,66 @@ class PyAVContainer(object):
     def get_batch(self, frames_idx):
         return self.pyav_decode(frames_idx)
     
+    def close(self):
+        if not self.closed:
+            self._frame_iter = None
+            self._frames_buffer = {}
+            self.data.close()
+            self.closed = True
+
     def __len__(self):
         return self.data.streams.video[0].frames
 
 @CONTAINER.register()
 class OpenCVContainer(object):
-    def __init__(self, file_path):
+    """
+    OpenCV video container.
+
+    Args:
+        file_path: str, path of video
+        stream_cursor: bool, keep the capture positioned after each `get_batch` so that
+            consecutive sliding windows of the same video only decode new frames,
+            seeking happens only when indexes go backwards or jump forward past the
+            seek margin. The capture is kept open until `close` is called.
+    """
+    def __init__(self, file_path, stream_cursor=False):
         self.data = cv2.VideoCapture(file_path)
         self.out_dtype = 'numpy'
+        self.closed = False
+        self.stream_cursor = stream_cursor
+        # stream cursor state, index of next frame to be read
+        self._next_frame_idx = 0
+        self._frames_buffer = {}
+
+    def _get_batch_stream_cursor(self, frames_idx):
+        margin = 1024
+        frames = {idx: self._frames_buffer[idx] for idx in frames_idx if idx in self._frames_buffer}
+        need_idx = [idx for idx in frames_idx if idx not in frames]
+        if len(need_idx) > 0:
+            if min(need_idx) < self._next_frame_idx or min(need_idx) - self._next_frame_idx > margin:
+                self._next_frame_idx = max(0, min(need_idx) - margin)
+                self.data.set(cv2.CAP_PROP_POS_FRAMES, self._next_frame_idx)
+            max_idx = max(need_idx)
+            need_idx = set(need_idx)
+            while self._next_frame_idx <= max_idx:
+                # only grab frames which are not sampled
+                if self._next_frame_idx in need_idx:
+                    ret, img = self.data.read()
+                    if ret:
+                        frames[self._next_frame_idx] = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+                else:
+                    ret = self.data.grab()
+                if not ret:
+                    break
+                self._next_frame_idx += 1
+        # keep decoded frames of this window for overlapped windows
+        self._frames_buffer = frames
+        return np.stack([frames[idx] for idx in sorted(frames)])
 
     def get_batch(self, frames_idx):
+        if self.stream_cursor:
+            return self._get_batch_stream_cursor(frames_idx)
+
         frames = []
         margin = 1024
         current_frame_idx = max(0, min(frames_idx) - margin)
@@ -160,9 +400,15 @@ class OpenCVContainer(object):
             if len(frames) == len(frames_idx):
                 break
         frames = copy.deepcopy(np.stack(frames))
-        self.data.release()
+        self.close()
         return frames
     
+    def close(self):
+        if not self.closed:
+            self._frames_buffer = {}
+            self.data.release()
+            self.closed = True
+
     def __len__(self):
         return int(self.data.get(cv2.CAP_PROP_FRAME_COUNT))
 
@@ -310,6 +556,7 @@ class PyAVMVExtractor(object):
         self.last_frame = None
         self.last_mvs_frame = None
         self.pad_factor = 32
+        self.closed = False
     
     def _get_mvs_img(self, mvs, w, h, output_dict):
         mv_frame = np.zeros((h, w, 2))
@@ -402,8 +649,13 @@ class PyAVMVExtractor(object):
         for k, v in output_dict.items():
             frames = copy.deepcopy(np.stack(v))
             return_dict[k] = frames
-        self.data.close()
+        self.close()
         return return_dict
     
+    def close(self):
+        if not self.closed:
+            self.data.close()
+            self.closed = True
+
     def __len__(self):
         return self.data.streams.video[0].frames
\ No newline at end of file
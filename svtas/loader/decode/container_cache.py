@@ -0,0 +1,163 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-06 10:12:31
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-06 10:12:31
+Description  : per-worker LRU cache of opened video containers
+FilePath     : /SVTAS/svtas/loader/decode/container_cache.py
+'''
+import os
+from collections import OrderedDict
+
+
+class RetiredContainer(object):
+    """
+    Metadata-only placeholder of a container whose last sliding window has
+    been emitted. The sampler only needs `len` and `out_dtype` for the padded
+    windows that follow, so the real handle can be closed early.
+    """
+    def __init__(self, container, length):
+        self.out_dtype = container.out_dtype
+        self.dict_keys = getattr(container, 'dict_keys', [])
+        self.length = length
+        self.closed = False
+
+    def get_batch(self, frames_idx):
+        raise RuntimeError("container has been retired, all sliding windows were emitted!")
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return self.length
+
+class ContainerCache(object):
+    """
+    LRU cache of opened containers, keyed by file path and bounded by the
+    number of opened handles and by their bytes.
+
+    Args:
+        max_handles: int, max number of opened containers
+        max_bytes: int, max bytes of opened containers, the in-memory size is used
+            when the container exposes it, otherwise the size of the file on disk
+    """
+    def __init__(self,
+                 max_handles=8,
+                 max_bytes=4 * 1024 ** 3):
+        self.max_handles = max_handles
+        self.max_bytes = max_bytes
+        self._containers = OrderedDict()
+        self._nbytes = dict()
+        self._lengths = dict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _container_nbytes(file_path, container):
+        nbytes = getattr(container, 'nbytes', None)
+        if nbytes is None:
+            nbytes = getattr(getattr(container, 'data', None), 'nbytes', None)
+        if nbytes is not None:
+            return int(nbytes)
+        if os.path.isfile(file_path):
+            return os.path.getsize(file_path)
+        return 0
+
+    def _pop(self, key):
+        container = self._containers.pop(key)
+        self.total_bytes -= self._nbytes.pop(key)
+        self._lengths.pop(key)
+        return container
+
+    def _evict_overflow(self):
+        # always keep the most recently used container
+        while len(self._containers) > 1 and (len(self._containers) > self.max_handles
+                                             or self.total_bytes > self.max_bytes):
+            key = next(iter(self._containers))
+            self._pop(key).close()
+            self.evictions += 1
+
+    def get(self, file_path, build_fn, cfg_key=None):
+        """
+        Get the container of `file_path`, build it by `build_fn` when missing.
+        """
+        key = (file_path, cfg_key)
+        container = self._containers.get(key, None)
+        if container is not None and not getattr(container, 'closed', False):
+            self._containers.move_to_end(key)
+            self.hits += 1
+            return container
+        if container is not None:
+            # container has closed itself after decoding
+            self._pop(key)
+
+        self.misses += 1
+        container = build_fn()
+        nbytes = self._container_nbytes(file_path, container)
+        self._containers[key] = container
+        self._nbytes[key] = nbytes
+        self._lengths[key] = len(container)
+        self.total_bytes += nbytes
+        self._evict_overflow()
+        return container
+
+    def retire(self, file_path):
+        """
+        Close all containers of `file_path` and keep only their metadata.
+        """
+        for key in [k for k in self._containers.keys() if k[0] == file_path]:
+            container = self._containers[key]
+            if isinstance(container, RetiredContainer):
+                continue
+            self._containers[key] = RetiredContainer(container, self._lengths[key])
+            self.total_bytes -= self._nbytes[key]
+            self._nbytes[key] = 0
+            container.close()
+            self.evictions += 1
+
+    def discard(self, file_path):
+        """
+        Close and drop all containers of `file_path`.
+        """
+        for key in [k for k in self._containers.keys() if k[0] == file_path]:
+            self._pop(key).close()
+
+    def clear(self):
+        for key in list(self._containers.keys()):
+            self._pop(key).close()
+
+    def info(self):
+        return dict(hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions,
+                    handles=len(self._containers),
+                    bytes=self.total_bytes)
+
+    def __len__(self):
+        return len(self._containers)
+
+# one cache per process, so every dataloader worker owns its handles
+_WORKER_CONTAINER_CACHE = dict()
+
+def get_container_cache(cfg=None):
+    """
+    Get the container cache of current process, build it from `cfg` if it
+    does not exist. Return None when no cache is configured.
+    """
+    pid = os.getpid()
+    cache = _WORKER_CONTAINER_CACHE.get(pid, None)
+    if cache is None and cfg is not None:
+        cache = ContainerCache(**cfg)
+        _WORKER_CONTAINER_CACHE[pid] = cache
+    return cache
+
+def build_cached_container(file_path, build_fn, cache_cfg=None, cfg_key=None):
+    """
+    Build container by `build_fn`, reuse the opened one if `cache_cfg` is set.
+    """
+    if cache_cfg is None:
+        return build_fn()
+    cache = get_container_cache(cache_cfg)
+    return cache.get(file_path, build_fn, cfg_key=cfg_key)
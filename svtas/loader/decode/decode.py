@@ -7,6 +7,18 @@ Description  : feature decode
 FilePath     : /SVTAS/svtas/loader/decode/decode.py
 '''
 from ..builder import DECODE, build_container
+from .container_cache import build_cached_container
+
+def _backend_cache_key(backend):
+    return repr(sorted((k, v) for k, v in backend.items() if k != 'file_path'))
+
+def _build_backend_container(backend, file_path, container_cache=None):
+    backend['file_path'] = file_path
+    cfg = backend.copy()
+    return build_cached_container(file_path,
+                                  lambda: build_container(cfg),
+                                  cache_cfg=container_cache,
+                                  cfg_key=_backend_cache_key(cfg))
 
 @DECODE.register()
 class FeatureDecoder():
@@ -14,6 +26,8 @@ class FeatureDecoder():
     Decode mp4 file to frames.
     Args:
         filepath: the file path of mp4 file
+        container_cache: dict|None, config of per-worker `ContainerCache`, e.g.
+            dict(max_handles=8, max_bytes=4 * 1024 ** 3), None means not cache
     """
     def __init__(self,
                  backend=dict(
@@ -27,10 +41,23 @@ class FeatureDecoder():
                     is_transpose=False,
                     temporal_dim=0,
                     revesive_name=[(r'(mp4|avi)', 'npy')]
-                 )):
+                 ),
+                 container_cache=None):
 
         self.backend = backend
         self.flow_feature_backend = flow_feature_backend
+        self.container_cache = container_cache
+
+    def _build_feature_container(self, file_path, flow_feature_path=None):
+        backend = self.backend.copy()
+        backend['file_path'] = file_path
+        feature_container = build_container(backend)
+        if flow_feature_path is not None:
+            flow_feature_backend = self.flow_feature_backend.copy()
+            flow_feature_backend['file_path'] = flow_feature_path
+            flow_container = build_container(flow_feature_backend)
+            feature_container = feature_container.concat(flow_container, dim=0)
+        return feature_container
 
     def __call__(self, results):
         """
@@ -40,21 +67,19 @@ class FeatureDecoder():
         """
         file_path = results['filename']
         results['format'] = 'feature'
-        self.backend['file_path'] = file_path
+        flow_feature_path = None
+        if "flow_feature_name" in list(results.keys()) and self.flow_feature_backend is not None:
+            flow_feature_path = results['flow_feature_name']
         try:
-            feature_container = build_container(self.backend)
+            # rgb and flow feature are cached as one concatenated container
+            feature_container = build_cached_container(
+                file_path,
+                lambda: self._build_feature_container(file_path, flow_feature_path),
+                cache_cfg=self.container_cache,
+                cfg_key=(_backend_cache_key(self.backend), flow_feature_path))
         except:
             print("file: " + file_path + " get error!")
             raise
-        
-        if "flow_feature_name" in list(results.keys()) and self.flow_feature_backend is not None:
-            self.flow_feature_backend['file_path'] = results['flow_feature_name']
-            try:
-                flow_container = build_container(self.flow_feature_backend)
-                feature_container = feature_container.concat(flow_container, dim=0)
-            except:
-                print("file: " + file_path + " get error!")
-                raise
 
         feature_len = len(feature_container)
         results['frames'] = feature_container
@@ -72,9 +97,11 @@ class VideoDecoder():
     """
     def __init__(self,
                  backend=dict(
-                    name='DecordContainer')):
+                    name='DecordContainer'),
+                 container_cache=None):
 
         self.backend = backend
+        self.container_cache = container_cache
 
     def __call__(self, results):
         """
@@ -84,10 +111,9 @@ class VideoDecoder():
         """
         file_path = results['filename']
         results['format'] = 'video'
-        self.backend['file_path'] = file_path
         
         try:
-            container = build_container(self.backend)
+            container = _build_backend_container(self.backend, file_path, self.container_cache)
         except:
             print("file: " + file_path + " get error!")
             raise
@@ -113,10 +139,12 @@ class TwoPathwayVideoDecoder():
                     name='NPYContainer',
                     temporal_dim=0,
                     revesive_name=[(r'(mp4|avi)', 'npy')]
-                 )):
+                 ),
+                 container_cache=None):
 
         self.rgb_backend = rgb_backend
         self.flow_backend =flow_backend
+        self.container_cache = container_cache
 
     def __call__(self, results):
         """
@@ -127,17 +155,15 @@ class TwoPathwayVideoDecoder():
         file_path = results['filename']
         flow_path = results['flows_path']
         results['format'] = 'video'
-        self.rgb_backend['file_path'] = file_path
-        self.flow_backend['file_path'] = flow_path
 
         try:
-            rgb_container = build_container(self.rgb_backend)
+            rgb_container = _build_backend_container(self.rgb_backend, file_path, self.container_cache)
         except:
             print("file: " + file_path + " get error!")
             raise
         
         try:
-            flow_container = build_container(self.flow_backend)
+            flow_container = _build_backend_container(self.flow_backend, flow_path, self.container_cache)
         except:
             print("file: " + flow_path + " get error!")
             raise
@@ -169,11 +195,13 @@ class ThreePathwayVideoDecoder():
                  res_backend=dict(
                     backend=dict(
                     name='DecordContainer')
-                 )):
+                 ),
+                 container_cache=None):
 
         self.rgb_backend = rgb_backend
         self.flow_backend =flow_backend
         self.res_backend = res_backend
+        self.container_cache = container_cache
 
     def __call__(self, results):
         """
@@ -185,24 +213,21 @@ class ThreePathwayVideoDecoder():
         flow_path = results['flows_path']
         res_path = results['res_path']
         results['format'] = 'video'
-        self.rgb_backend['file_path'] = file_path
-        self.flow_backend['file_path'] = flow_path
-        self.res_backend['file_path'] = res_path
 
         try:
-            rgb_container = build_container(self.rgb_backend)
+            rgb_container = _build_backend_container(self.rgb_backend, file_path, self.container_cache)
         except:
             print("file: " + file_path + " get error!")
             raise
         
         try:
-            flow_container = build_container(self.flow_backend)
+            flow_container = _build_backend_container(self.flow_backend, flow_path, self.container_cache)
         except:
             print("file: " + flow_path + " get error!")
             raise
 
         try:
-            res_container = build_container(self.res_backend)
+            res_container = _build_backend_container(self.res_backend, res_path, self.container_cache)
         except:
             print("file: " + flow_path + " get error!")
             raise
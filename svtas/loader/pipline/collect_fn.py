@@ -8,6 +8,7 @@ FilePath     : /SVTAS/svtas/loader/pipline/collect_fn.py
 '''
 import copy
 
+import numpy as np
 import torch
 
 from ..builder import PIPLINE
@@ -24,7 +25,10 @@ class StreamBatchCompose():
             data = {}
             for key, value in batch[index].items():
                 if key in self.to_tensor_keys:
-                    if not torch.is_tensor(value):
+                    if isinstance(value, np.ndarray):
+                        # share memory with ndarray, no copy
+                        data[key] = torch.from_numpy(value)
+                    elif not torch.is_tensor(value):
                         data[key] = torch.tensor(value)
                     else:
                         data[key] = value
@@ -94,7 +98,8 @@ class BatchCompose():
         data = {}
         for key in batch[0].keys():
             if key in self.to_tensor_keys:
-                data[key] = copy.deepcopy(self._compose_tensor(batch, key))
+                # tensors are composed into new memory, no need to deepcopy
+                data[key] = self._compose_tensor(batch, key)
             elif key in self.max_keys:
                 data[key] = copy.deepcopy(self._compose_max(batch, key))
             elif key in self.compress_keys:
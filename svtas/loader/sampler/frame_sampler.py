@@ -73,7 +73,8 @@ class VideoStreamSampler():
                  channel_mode_dict={"imgs":"RGB", "res":"RGB", "flows":"XY"},
                  channel_num_dict={"imgs":3, "res":3, "flows":2},
                  sample_mode='random',
-                 frame_idx_key='sample_sliding_idx'
+                 frame_idx_key='sample_sliding_idx',
+                 sample_to_batch=False
                  ):
         # assert len(sample_rate_dict)==len(clip_seg_num_dict)==len(sliding_window_dict)==(len(sample_add_key_pair)+1)
 
@@ -86,6 +87,8 @@ class VideoStreamSampler():
         self.frame_idx_key = frame_idx_key
         self.sample_add_key_pair = sample_add_key_pair
         self.channel_num_dict = channel_num_dict
+        # output `[T, H, W, C]` uint8 array for `VideoBatchTransform` instead of frame list
+        self.sample_to_batch = sample_to_batch
         self.sample = FrameIndexSample(mode = sample_mode)
     
     def _sample_label(self, results, sample_rate, sample_num, sliding_windows, add_key='labels', sample_key='raw_labels'):
@@ -130,7 +133,10 @@ class VideoStreamSampler():
 
     def _sample_2_PIL_frame(self, frames_select, channel_mode, channel_num, sample_num):
         imgs = []
-        np_frames = frames_select.asnumpy()
+        if isinstance(frames_select, np.ndarray):
+            np_frames = frames_select
+        else:
+            np_frames = frames_select.asnumpy()
         if np_frames.shape[0] > 0:
             for i in range(np_frames.shape[0]):
                 imgbuf = np_frames[i].copy()
@@ -160,6 +166,23 @@ class VideoStreamSampler():
                 imgs.append(np_frames)
         return imgs
     
+    def _sample_2_batch_frame(self, frames_select, channel_num, sample_num):
+        if isinstance(frames_select, np.ndarray):
+            np_frames = frames_select
+        else:
+            np_frames = frames_select.asnumpy()
+        if np_frames.shape[0] > 0:
+            frame_shape = np_frames.shape[1:]
+        else:
+            frame_shape = (224, 224, channel_num)
+        pad_len = sample_num - np_frames.shape[0]
+        if pad_len > 0:
+            np_frames = np.concatenate([np_frames, np.zeros((pad_len, ) + tuple(frame_shape), dtype=np_frames.dtype)], axis=0)
+        return np_frames
+
+    def _sample_2_batch_frame_for_none(self, channel_num, sample_num):
+        return np.zeros((sample_num, 224, 224, channel_num), dtype=np.uint8)
+
     def _sample_2_numpy_frame_for_none(self, channel_mode, channel_num, sample_num):
         imgs = []
         np_frames = np.zeros((224, 224, channel_num))
@@ -199,7 +222,9 @@ class VideoStreamSampler():
                 print("file: " + filename + " sample frame index: " + ",".join([str(i) for i in frames_idx]) +" error!")
                 raise
             # dearray_to_img
-            if container.out_dtype == "PIL":
+            if self.sample_to_batch and container.out_dtype in ["PIL", "numpy"]:
+                imgs = self._sample_2_batch_frame(frames_select=frames_select, channel_num=channel_num, sample_num=sample_num)
+            elif container.out_dtype == "PIL":
                 imgs = self._sample_2_PIL_frame(frames_select=frames_select, channel_mode=channel_mode, channel_num=channel_num, sample_num=sample_num)
             elif container.out_dtype == "numpy":
                 imgs = self._sample_2_numpy_frame(frames_select=frames_select, channel_mode=channel_mode, channel_num=channel_num, sample_num=sample_num)
@@ -208,7 +233,9 @@ class VideoStreamSampler():
             else:
                 raise NotImplementedError
         else:
-            if container.out_dtype == "numpy":
+            if self.sample_to_batch and container.out_dtype in ["PIL", "numpy"]:
+                imgs = self._sample_2_batch_frame_for_none(channel_num=channel_num, sample_num=sample_num)
+            elif container.out_dtype == "numpy":
                 imgs = self._sample_2_numpy_frame_for_none(channel_mode=channel_mode, channel_num=channel_num, sample_num=sample_num)
             elif container.out_dtype == "PIL":
                 imgs = self._sample_2_PIL_frame_for_none(channel_mode=channel_mode, channel_num=channel_num, sample_num=sample_num)
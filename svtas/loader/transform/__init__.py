@@ -8,12 +8,13 @@ FilePath     : /SVTAS/svtas/loader/transform/__init__.py
 '''
 from .transform import (FeatureStreamTransform,
                         VideoTransform,
+                        VideoBatchTransform,
                         VideoRawStoreTransform,
                         VideoClipTransform,
                         FeatureRawStoreTransform)
 
 __all__ = [
-    'FeatureStreamTransform', 'VideoTransform',
+    'FeatureStreamTransform', 'VideoTransform', 'VideoBatchTransform',
     'VideoRawStoreTransform', 'VideoClipTransform',
     'FeatureRawStoreTransform'
 ]
\ No newline at end of file
@@ -11,6 +11,7 @@ import torch
 import copy
 import torchvision.transforms as transforms
 from . import transform_fn as custom_transforms
+from .transform_fn.batch_transform_fn import BATCH_TRANSFORM_MAP
 from ..builder import TRANSFORM
 
 class BaseTransform(object):
@@ -72,6 +73,48 @@ class VideoTransform(BaseTransform):
         outputs = torch.cat(outputs, dim=0)
         return outputs
 
+@TRANSFORM.register()
+class VideoBatchTransform(BaseTransform):
+    """Clip-level batched video transform
+
+    Input is `[T, H, W, C]` uint8 array (or list of frames), all ops run once over
+    the whole `[T, C, H, W]` clip tensor and random ops sample one set of parameters
+    per clip. `transform_dict` uses the same names as `VideoTransform`, names in
+    `BATCH_TRANSFORM_MAP` run batched, other ops are called on the clip tensor.
+
+    Args:
+        transform_dict: Dict[Literl|List] config of transform
+    """
+    def _get_transformers_pipline(self, cfg, key):
+        transform_op_list = []
+        for transforms_op in cfg:
+            name = list(transforms_op.keys())[0]
+            op_cfg = list(transforms_op.values())[0]
+            if op_cfg is None:
+                op_cfg = {}
+            if name in BATCH_TRANSFORM_MAP:
+                op = BATCH_TRANSFORM_MAP[name](**op_cfg)
+            else:
+                op = getattr(transforms, name, False)
+                if op is False:
+                    op = getattr(custom_transforms, name)
+                op = op(**op_cfg)
+            transform_op_list.append(op)
+        self.transforms_pipeline_dict[key] = transforms.Compose(transform_op_list)
+
+    def transform(self, inputs, transforms_pipeline):
+        if isinstance(inputs, (list, tuple)):
+            inputs = np.stack([np.asarray(input) for input in inputs])
+        elif hasattr(inputs, 'asnumpy'):
+            inputs = inputs.asnumpy()
+        clip = torch.from_numpy(np.ascontiguousarray(inputs))
+        if clip.dim() == 3:
+            clip = clip.unsqueeze(-1)
+        # [T, H, W, C] -> [T, C, H, W]
+        clip = clip.permute(0, 3, 1, 2)
+        outputs = transforms_pipeline(clip)
+        return outputs.contiguous()
+
 @TRANSFORM.register()
 class VideoRawStoreTransform(VideoTransform):
     def __call__(self, results):
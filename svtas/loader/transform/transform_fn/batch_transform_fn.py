@@ -0,0 +1,134 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-09 14:05:12
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-09 14:05:12
+Description  : Clip-level batched transform function, input is `[T, C, H, W]` tensor
+FilePath     : /SVTAS/svtas/loader/transform/transform_fn/batch_transform_fn.py
+'''
+import numbers
+import torch
+import torch.nn.functional as F
+
+__all__ = [
+    "BatchResize",
+    "BatchRandomCrop",
+    "BatchCenterCrop",
+    "BatchRandomHorizontalFlip",
+    "BatchToTensor",
+    "BatchPILToTensor",
+    "BatchToFloat",
+    "BatchNormalize",
+    "BATCH_TRANSFORM_MAP"
+]
+
+def _setup_size(size):
+    if isinstance(size, numbers.Number):
+        return int(size), int(size)
+    if len(size) == 1:
+        return int(size[0]), int(size[0])
+    return int(size[0]), int(size[1])
+
+class BatchResize(object):
+    """
+    Resize all frames of a clip in one `interpolate` call, the output size
+    follows `ResizeImproved` and `torchvision.transforms.Resize`.
+    """
+    def __init__(self, size, resize_to_smaller_edge=True, interpolation='bilinear', antialias=True, **kwargs):
+        self.size = size
+        self.resize_to_smaller_edge = resize_to_smaller_edge
+        self.interpolation = interpolation if isinstance(interpolation, str) else 'bilinear'
+        self.antialias = antialias
+
+    def _get_output_size(self, h, w):
+        if isinstance(self.size, int):
+            if (w <= h and w == self.size) or (h <= w and h == self.size):
+                return h, w
+            if (w < h) == self.resize_to_smaller_edge:
+                return int(self.size * h / w), self.size
+            return self.size, int(self.size * w / h)
+        return _setup_size(self.size)
+
+    def __call__(self, clip):
+        h, w = clip.shape[-2:]
+        oh, ow = self._get_output_size(h, w)
+        if (oh, ow) == (h, w):
+            return clip
+        dtype = clip.dtype
+        clip = F.interpolate(clip.float(), size=(oh, ow), mode=self.interpolation,
+                             align_corners=False, antialias=self.antialias)
+        if dtype == torch.uint8:
+            clip = clip.round_().clamp_(0, 255).to(torch.uint8)
+        return clip
+
+class BatchRandomCrop(object):
+    """
+    Crop all frames of a clip at one random position.
+    """
+    def __init__(self, size, **kwargs):
+        self.size = _setup_size(size)
+
+    def __call__(self, clip):
+        h, w = clip.shape[-2:]
+        th, tw = self.size
+        i = int(torch.randint(0, h - th + 1, size=(1, )).item())
+        j = int(torch.randint(0, w - tw + 1, size=(1, )).item())
+        return clip[..., i:(i + th), j:(j + tw)]
+
+class BatchCenterCrop(object):
+    def __init__(self, size, **kwargs):
+        self.size = _setup_size(size)
+
+    def __call__(self, clip):
+        h, w = clip.shape[-2:]
+        th, tw = self.size
+        i = int(round((h - th) / 2.0))
+        j = int(round((w - tw) / 2.0))
+        return clip[..., i:(i + th), j:(j + tw)]
+
+class BatchRandomHorizontalFlip(object):
+    """
+    Flip all frames of a clip with one coin.
+    """
+    def __init__(self, p=0.5):
+        self.p = p
+
+    def __call__(self, clip):
+        if torch.rand(1).item() < self.p:
+            return clip.flip(-1)
+        return clip
+
+class BatchPILToTensor(object):
+    def __call__(self, clip):
+        return clip
+
+class BatchToTensor(object):
+    def __call__(self, clip):
+        return clip.float().div_(255.0)
+
+class BatchToFloat(object):
+    def __call__(self, clip):
+        return clip.float()
+
+class BatchNormalize(object):
+    def __init__(self, mean, std, inplace=False):
+        self.mean = torch.tensor(mean, dtype=torch.float32).view(1, -1, 1, 1)
+        self.std = torch.tensor(std, dtype=torch.float32).view(1, -1, 1, 1)
+
+    def __call__(self, clip):
+        if not clip.is_floating_point():
+            clip = clip.float()
+        return (clip - self.mean.to(clip.dtype)) / self.std.to(clip.dtype)
+
+# config transform name -> batched transform
+BATCH_TRANSFORM_MAP = dict(
+    ResizeImproved=BatchResize,
+    Resize=BatchResize,
+    RandomCrop=BatchRandomCrop,
+    CenterCrop=BatchCenterCrop,
+    RandomHorizontalFlip=BatchRandomHorizontalFlip,
+    PILToTensor=BatchPILToTensor,
+    ToTensor=BatchToTensor,
+    ToFloat=BatchToFloat,
+    Normalize=BatchNormalize
+)
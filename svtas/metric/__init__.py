@@ -12,9 +12,10 @@ from .classification import ConfusionMatrix
 from .tal import TALocalizationMetric
 from .tap import TAProposalMetric
 from .svtas import SVTASegmentationMetric
+from .metric_worker import AsyncMetricWorker
 
 __all__ = [
     'TASegmentationMetric', 'BaseMetric', 'BaseTASegmentationMetric',
     'ConfusionMatrix', 'TALocalizationMetric', 'TAProposalMetric',
-    'SVTASegmentationMetric'
+    'SVTASegmentationMetric', 'AsyncMetricWorker'
 ]
\ No newline at end of file
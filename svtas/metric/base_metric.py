@@ -11,6 +11,9 @@ from .builder import METRIC
 
 @METRIC.register()
 class BaseMetric(metaclass=abc.ABCMeta):
+    # whether `update` reads `outputs['output_np']` scores
+    need_score = True
+
     def __init__(self):
         pass
 
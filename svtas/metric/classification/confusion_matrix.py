@@ -21,6 +21,8 @@ class ConfusionMatrix(BaseMetric):
         ref:https://blog.csdn.net/weixin_43760844/article/details/115208925 \\
         To visualize and caculate confusion matrix
     """
+    need_score = False
+
     def __init__(self,
                  actions_map_file_path: str,
                  img_save_path: str = None,
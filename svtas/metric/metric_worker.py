@@ -0,0 +1,66 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-12 14:36:08
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-12 14:36:08
+Description  : Background metric worker
+FilePath     : /SVTAS/svtas/metric/metric_worker.py
+'''
+import queue
+import threading
+
+
+class AsyncMetricWorker(object):
+    """
+    Run `update` of a metric in a background thread, so the runner does not
+    wait for F1, edit or file writes. `accumulate` joins all queued updates
+    before computing the metric, other attributes are read from the metric.
+
+    Args:
+        metric: metric object
+        max_queue_size: int, max number of pending updates, `update` blocks when full
+    """
+    def __init__(self, metric, max_queue_size=32):
+        self.metric = metric
+        self.max_queue_size = max_queue_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._error = None
+
+    def _run(self):
+        while True:
+            args = self._queue.get()
+            try:
+                if self._error is None:
+                    self.metric.update(*args)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def update(self, vid, ground_truth_list, outputs):
+        """
+        Queue one update, return None because the accuracy is not computed yet.
+        """
+        self._raise_error()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._queue.put((vid, ground_truth_list, outputs))
+        return None
+
+    def join(self):
+        self._queue.join()
+        self._raise_error()
+
+    def accumulate(self):
+        self.join()
+        return self.metric.accumulate()
+
+    def __getattr__(self, name):
+        return getattr(self.metric, name)
@@ -13,7 +13,8 @@ from ...utils.config import get_logger
 from ..builder import METRIC
 
 from ..tas.tas_metric_utils import get_labels_scores_start_end_time
-from ..tas.tas_metric_utils import levenstein, edit_score, f_score
+from ..tas.tas_metric_utils import levenstein
+from ..tas.tas_metric_utils import get_run_length_segments, segments_f_score, ignore_bg_class
 
 @METRIC.register()
 class SVTASegmentationMetric(BaseMetric):
@@ -35,6 +36,8 @@ class SVTASegmentationMetric(BaseMetric):
         self.elps = 1e-10
         self.file_output = file_output
         self.score_output = score_output
+        # only score output file needs `output_np`
+        self.need_score = score_output
         self.gt_file_need = gt_file_need
         self.output_format = output_format
         self.output_dir = output_dir
@@ -61,6 +64,9 @@ class SVTASegmentationMetric(BaseMetric):
         self.actions_dict = dict()
         for a in actions:
             self.actions_dict[a.split()[1]] = int(a.split()[0])
+        # integer label engine, class names are only used for file output
+        self.id2class_map = dict((v, k) for k, v in self.actions_dict.items())
+        self.bg_class_ids = [self.actions_dict[name] for name in ignore_bg_class if name in self.actions_dict]
 
         # cls score
         self.overlap = overlap
@@ -71,40 +77,55 @@ class SVTASegmentationMetric(BaseMetric):
         self.total_seg = 0
         self.total_f1 = [0. for _ in range(self.overlap_len)]
 
+    def _window_acc(self, recog_content, gt_content):
+        # accuracy of all windows by one reshape and compare
+        num_frames = len(gt_content)
+        num_windows = (num_frames + self.segment_windows_size - 1) // self.segment_windows_size
+        pad_len = num_windows * self.segment_windows_size - num_frames
+        correct = np.concatenate([recog_content == gt_content, np.zeros(pad_len, dtype=bool)])
+        correct = correct.reshape([num_windows, self.segment_windows_size]).sum(axis=1)
+        total = np.full(num_windows, self.segment_windows_size)
+        total[-1] = num_frames - (num_windows - 1) * self.segment_windows_size
+        return correct / total
+
+    @staticmethod
+    def _clip_segments(segments, start_frame, end_frame):
+        # segments of the whole video clipped into [start_frame, end_frame)
+        labels, starts, ends = segments
+        start_idx = np.searchsorted(ends, start_frame, side='right')
+        end_idx = np.searchsorted(starts, end_frame, side='left')
+        return (labels[start_idx:end_idx],
+                np.maximum(starts[start_idx:end_idx], start_frame),
+                np.minimum(ends[start_idx:end_idx], end_frame))
+
     def _update_score(self, recog_content, gt_content):
+        # recog_content, gt_content: integer labels ndarray [T]
         current_f1 = [0. for _ in range(self.overlap_len)]
         current_acc = 0.
         current_seg_cnt = 0
-        for start_frame in range(0, len(recog_content), self.segment_windows_size):
+
+        window_acc = self._window_acc(recog_content, gt_content)
+        # segment boundaries are computed once per video
+        p_video_segments = get_run_length_segments(recog_content, self.bg_class_ids)
+        y_video_segments = get_run_length_segments(gt_content, self.bg_class_ids)
+        for window_idx, start_frame in enumerate(range(0, len(recog_content), self.segment_windows_size)):
             self.total_seg += 1
             current_seg_cnt += 1
-            # cls score
-            correct = 0
-            total = 0
-
-            if start_frame + self.segment_windows_size > len(recog_content):
-                end_frame = len(recog_content)
-            else:
-                end_frame = start_frame + self.segment_windows_size
-            
-            seg_gt_content = gt_content[start_frame:end_frame]
-            seg_recog_content = recog_content[start_frame:end_frame]
+            end_frame = min(start_frame + self.segment_windows_size, len(recog_content))
 
-            for i in range(len(seg_gt_content)):
-                total += 1
-
-                if seg_gt_content[i] == seg_recog_content[i]:
-                    correct += 1
-
-            acc = correct / total
+            # cls score
+            acc = window_acc[window_idx].item()
             self.total_acc += acc
             current_acc += acc
 
-            edit_num = edit_score(seg_recog_content, seg_gt_content)
+            p_segments = self._clip_segments(p_video_segments, start_frame, end_frame)
+            y_segments = self._clip_segments(y_video_segments, start_frame, end_frame)
+
+            edit_num = levenstein(p_segments[0], y_segments[0], norm=True)
             self.total_edit += edit_num
 
             for s in range(self.overlap_len):
-                tp1, fp1, fn1 = f_score(seg_recog_content, seg_gt_content, self.overlap[s])
+                tp1, fp1, fn1 = segments_f_score(p_segments, y_segments, self.overlap[s])
 
                 # compute single f1
                 precision = tp1 / float(tp1 + fp1 + self.elps)
@@ -136,32 +157,24 @@ class SVTASegmentationMetric(BaseMetric):
         f.writelines(recog_content)
         f.close()
 
+    def _labels_to_names(self, labels):
+        return [self.id2class_map[label] for label in labels.tolist()]
+
     def _transform_model_result(self, vid, outputs_np, gt_np, outputs_arr):
-        recognition = []
-        for i in range(outputs_np.shape[0]):
-            recognition = np.concatenate((recognition, [
-                list(self.actions_dict.keys())[list(
-                    self.actions_dict.values()).index(outputs_np[i])]
-            ]))
-        recog_content = list(recognition)
-       
-        gt_content = []
-        for i in range(gt_np.shape[0]):
-            gt_content = np.concatenate((gt_content, [
-                list(self.actions_dict.keys())[list(
-                    self.actions_dict.values()).index(gt_np[i])]
-            ]))
-        gt_content = list(gt_content)
+        recog_content = np.asarray(outputs_np).astype(np.int64).reshape([-1])
+        gt_content = np.asarray(gt_np).astype(np.int64).reshape([-1])
 
         if self.file_output is True and self.train_mode is False:
             if self.gt_file_need is True:
-                self._write_seg_file(gt_content, vid + '-gt', self.output_dir)
-            self._write_seg_file(recog_content, vid + '-pred', self.output_dir)
-
-        pred_detection = get_labels_scores_start_end_time(
-            outputs_arr, recog_content, self.actions_dict)
-        gt_detection = get_labels_scores_start_end_time(
-            np.ones(outputs_arr.shape), gt_content, self.actions_dict)
+                self._write_seg_file(self._labels_to_names(gt_content), vid + '-gt', self.output_dir)
+            self._write_seg_file(self._labels_to_names(recog_content), vid + '-pred', self.output_dir)
+
+        pred_detection, gt_detection = None, None
+        if outputs_arr is not None:
+            pred_detection = get_labels_scores_start_end_time(
+                outputs_arr, recog_content, None, self.bg_class_ids)
+            gt_detection = get_labels_scores_start_end_time(
+                np.ones(outputs_arr.shape), gt_content, None, self.bg_class_ids)
         return [recog_content, gt_content, pred_detection, gt_detection]
 
     def update(self, vid, ground_truth_batch, outputs):
@@ -180,12 +193,13 @@ class SVTASegmentationMetric(BaseMetric):
             vid = [val for val in vid for i in range(repet_rate)]
         for bs in range(len(predicted_batch)):
             predicted = predicted_batch[bs]
-            output_np = output_np_batch[bs]
+            # scores are not gathered across ranks if not needed
+            output_np = output_np_batch[bs] if output_np_batch is not None else None
             groundTruth = ground_truth_batch[bs]
 
             if type(predicted) is not np.ndarray:
                 outputs_np = predicted.numpy()
-                outputs_arr = output_np.numpy()
+                outputs_arr = output_np.numpy() if output_np is not None else None
                 gt_np = groundTruth.numpy()
             else:
                 outputs_np = predicted
@@ -59,20 +59,9 @@ class TALocalizationMetric(BaseMetric):
             self.actions_dict[a.split()[1]] = int(a.split()[0])
             
         self.logger = get_logger("SVTAS")
-        # localization score
-        self.pred_results_dict = {
-            "video-id": [],
-            "t_start": [],
-            "t_end": [],
-            "label": [],
-            "score": []
-        }
-        self.gt_results_dict = {
-            "video-id": [],
-            "t_start": [],
-            "t_end": [],
-            "label": []
-        }
+        self.id2class_map = dict((v, k) for k, v in self.actions_dict.items())
+        # localization score, every video appends one array per key
+        self._clear_for_next_epoch()
 
     def _write_seg_file(self, input_data, write_name, write_path):
         if self.output_format in ['txt']:
@@ -94,21 +83,8 @@ class TALocalizationMetric(BaseMetric):
         f.close()
 
     def _transform_model_result(self, vid, outputs_np, gt_np, outputs_arr):
-        recognition = []
-        for i in range(outputs_np.shape[0]):
-            recognition = np.concatenate((recognition, [
-                list(self.actions_dict.keys())[list(
-                    self.actions_dict.values()).index(outputs_np[i])]
-            ]))
-        recog_content = list(recognition)
-       
-        gt_content = []
-        for i in range(gt_np.shape[0]):
-            gt_content = np.concatenate((gt_content, [
-                list(self.actions_dict.keys())[list(
-                    self.actions_dict.values()).index(gt_np[i])]
-            ]))
-        gt_content = list(gt_content)
+        recog_content = [self.id2class_map[label] for label in np.asarray(outputs_np).reshape([-1]).tolist()]
+        gt_content = [self.id2class_map[label] for label in np.asarray(gt_np).reshape([-1]).tolist()]
 
         pred_detection = get_labels_scores_start_end_time(
             outputs_arr, recog_content, self.actions_dict)
@@ -127,27 +103,18 @@ class TALocalizationMetric(BaseMetric):
 
         p_label, p_start, p_end, p_scores = pred_detection
         g_label, g_start, g_end, _ = gt_detection
-        p_vid_list = vid * len(p_label)
-        g_vid_list = vid * len(g_label)
 
         # collect
-        self.pred_results_dict[
-            "video-id"] = self.pred_results_dict["video-id"] + p_vid_list
-        self.pred_results_dict[
-            "t_start"] = self.pred_results_dict["t_start"] + p_start
-        self.pred_results_dict[
-            "t_end"] = self.pred_results_dict["t_end"] + p_end
-        self.pred_results_dict[
-            "label"] = self.pred_results_dict["label"] + p_label
-        self.pred_results_dict[
-            "score"] = self.pred_results_dict["score"] + p_scores
-
-        self.gt_results_dict[
-            "video-id"] = self.gt_results_dict["video-id"] + g_vid_list
-        self.gt_results_dict[
-            "t_start"] = self.gt_results_dict["t_start"] + g_start
-        self.gt_results_dict["t_end"] = self.gt_results_dict["t_end"] + g_end
-        self.gt_results_dict["label"] = self.gt_results_dict["label"] + g_label
+        self.pred_results_dict["video-id"].append(np.array(vid * len(p_label), dtype=object))
+        self.pred_results_dict["t_start"].append(np.asarray(p_start, dtype=np.int64))
+        self.pred_results_dict["t_end"].append(np.asarray(p_end, dtype=np.int64))
+        self.pred_results_dict["label"].append(np.array(p_label, dtype=object))
+        self.pred_results_dict["score"].append(np.asarray(p_scores, dtype=np.float64))
+
+        self.gt_results_dict["video-id"].append(np.array(vid * len(g_label), dtype=object))
+        self.gt_results_dict["t_start"].append(np.asarray(g_start, dtype=np.int64))
+        self.gt_results_dict["t_end"].append(np.asarray(g_end, dtype=np.int64))
+        self.gt_results_dict["label"].append(np.array(g_label, dtype=object))
         
     def update(self, vid, ground_truth_batch, outputs):
         """update metrics during each iter
@@ -185,23 +152,17 @@ class TALocalizationMetric(BaseMetric):
             self._update_score([vid[bs]], pred_detection, gt_detection)
 
             # count acc
-            acc = 0.
-            total = 1
-            for p, t in zip(recog_content, gt_content):
-                if p != t:
-                    total += 1
-                elif p == t:
-                    total += 1
-                    acc += 1
-            acc = acc / total
+            acc = float(np.sum(np.asarray(outputs_np) == np.asarray(gt_np))) / (len(gt_content) + 1)
             single_batch_acc += acc
 
         return single_batch_acc / len(predicted_batch)
     
     def _compute_metrics(self):
         # localization metric
-        prediction = pd.DataFrame(self.pred_results_dict)
-        ground_truth = pd.DataFrame(self.gt_results_dict)
+        prediction = pd.DataFrame(dict((key, np.concatenate(value) if len(value) > 0 else [])
+                                       for key, value in self.pred_results_dict.items()))
+        ground_truth = pd.DataFrame(dict((key, np.concatenate(value) if len(value) > 0 else [])
+                                         for key, value in self.gt_results_dict.items()))
 
         ap = wrapper_compute_average_precision(prediction, ground_truth,
                                                self.tiou_thresholds,
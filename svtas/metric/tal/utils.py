@@ -7,7 +7,6 @@ Description  : file content
 FilePath     : /SVTAS/svtas/metric/temporal_action_localization/utils.py
 '''
 import numpy as np
-import pandas as pd
 from joblib import Parallel, delayed
 
 ignore_bg_class = ["background", "None"]
@@ -18,8 +17,8 @@ def interpolated_prec_rec(prec, rec):
     """
     mprec = np.hstack([[0], prec, [0]])
     mrec = np.hstack([[0], rec, [1]])
-    for i in range(len(mprec) - 1)[::-1]:
-        mprec[i] = max(mprec[i], mprec[i + 1])
+    # precision envelope, running max from the end
+    mprec = np.maximum.accumulate(mprec[::-1])[::-1]
     idx = np.where(mrec[1::] != mrec[0:-1])[0] + 1
     ap = np.sum((mrec[idx] - mrec[idx - 1]) * mprec[idx])
     return ap
@@ -53,79 +52,84 @@ def segment_iou(target_segment, candidate_segments):
     tIoU = segments_intersection.astype(float) / segments_union
     return tIoU
 
-# ref: https://github.com/activitynet/ActivityNet/blob/master/Evaluation/eval_detection.py
-def compute_average_precision_detection(ground_truth,
-                                        prediction,
-                                        tiou_thresholds=np.linspace(
-                                            0.5, 0.95, 10)):
-    """Compute average precision (detection task) between ground truth and
-    predictions data frames. If multiple predictions occurs for the same
-    predicted segment, only the one with highest score is matches as
-    true positive. This code is greatly inspired by Pascal VOC devkit.
+def group_by_video(video_ids):
+    """
+    Group instance indexes by video id, the order of instances is kept.
+    """
+    video_ids = np.asarray(video_ids)
+    unique_ids, inverse = np.unique(video_ids, return_inverse=True)
+    sort_idx = np.argsort(inverse, kind='stable')
+    split_idx = np.cumsum(np.bincount(inverse, minlength=len(unique_ids)))[:-1]
+    return dict(zip(unique_ids.tolist(), np.split(sort_idx, split_idx)))
+
+def average_precision_detection(gt_video_ids,
+                                gt_segments,
+                                pred_video_ids,
+                                pred_segments,
+                                pred_scores,
+                                tiou_thresholds=np.linspace(0.5, 0.95, 10)):
+    """Array version of `compute_average_precision_detection`, every tIoU
+    threshold is matched in one pass over the predictions.
 
     Parameters
     ----------
-    ground_truth : df
-        Data frame containing the ground truth instances.
-        Required fields: ['video-id', 't_start', 't_end']
-    prediction : df
-        Data frame containing the prediction instances.
-        Required fields: ['video-id, 't_start', 't_end', 'score']
+    gt_video_ids : 1darray
+        Video id of N ground truth instances.
+    gt_segments : 2darray
+        N x [t_start, t_end] of ground truth instances.
+    pred_video_ids : 1darray
+        Video id of M prediction instances.
+    pred_segments : 2darray
+        M x [t_start, t_end] of prediction instances.
+    pred_scores : 1darray
+        Score of M prediction instances.
     tiou_thresholds : 1darray, optional
         Temporal intersection over union threshold.
 
     Outputs
     -------
-    ap : float
-        Average precision score.
+    ap : 1darray
+        Average precision score of each threshold.
     """
+    tiou_thresholds = np.asarray(tiou_thresholds)
     ap = np.zeros(len(tiou_thresholds))
-    if prediction.empty or ground_truth.empty:
+    if len(pred_scores) == 0 or len(gt_video_ids) == 0:
         return ap
 
-    npos = float(len(ground_truth))
-    lock_gt = np.ones((len(tiou_thresholds), len(ground_truth))) * -1
+    npos = float(len(gt_video_ids))
+    lock_gt = np.zeros((len(tiou_thresholds), len(gt_video_ids)), dtype=bool)
     # Sort predictions by decreasing score order.
-    sort_idx = prediction['score'].values.argsort()[::-1]
-    prediction = prediction.loc[sort_idx].reset_index(drop=True)
+    sort_idx = np.asarray(pred_scores).argsort()[::-1]
+    pred_video_ids = np.asarray(pred_video_ids)[sort_idx]
+    pred_segments = np.asarray(pred_segments)[sort_idx]
 
     # Initialize true positive and false positive vectors.
-    tp = np.zeros((len(tiou_thresholds), len(prediction)))
-    fp = np.zeros((len(tiou_thresholds), len(prediction)))
+    tp = np.zeros((len(tiou_thresholds), len(sort_idx)))
+    fp = np.zeros((len(tiou_thresholds), len(sort_idx)))
 
-    # Adaptation to query faster
-    ground_truth_gbvn = ground_truth.groupby('video-id')
+    # ground truth indexes of every video
+    gt_by_video = group_by_video(gt_video_ids)
+    gt_segments = np.asarray(gt_segments)
 
     # Assigning true positive to truly grount truth instances.
-    for idx, this_pred in prediction.iterrows():
-
-        try:
-            # Check if there is at least one ground truth in the video associated.
-            ground_truth_videoid = ground_truth_gbvn.get_group(
-                this_pred['video-id'])
-        except Exception as e:
+    for idx in range(len(sort_idx)):
+        gt_idx = gt_by_video.get(pred_video_ids[idx], None)
+        if gt_idx is None:
             fp[:, idx] = 1
             continue
 
-        this_gt = ground_truth_videoid.reset_index()
-        tiou_arr = segment_iou(this_pred[['t_start', 't_end']].values,
-                               this_gt[['t_start', 't_end']].values)
+        tiou_arr = segment_iou(pred_segments[idx], gt_segments[gt_idx])
         # We would like to retrieve the predictions with highest tiou score.
         tiou_sorted_idx = tiou_arr.argsort()[::-1]
-        for tidx, tiou_thr in enumerate(tiou_thresholds):
-            for jdx in tiou_sorted_idx:
-                if tiou_arr[jdx] < tiou_thr:
-                    fp[tidx, idx] = 1
-                    break
-                if lock_gt[tidx, this_gt.loc[jdx]['index']] >= 0:
-                    continue
-                # Assign as true positive after the filters above.
-                tp[tidx, idx] = 1
-                lock_gt[tidx, this_gt.loc[jdx]['index']] = idx
-                break
-
-            if fp[tidx, idx] == 0 and tp[tidx, idx] == 0:
-                fp[tidx, idx] = 1
+        sorted_gt_idx = gt_idx[tiou_sorted_idx]
+        # [thresholds, gts] the first unlocked ground truth over threshold is matched
+        candidate = (tiou_arr[tiou_sorted_idx][None, :] >= tiou_thresholds[:, None]) \
+            & ~lock_gt[:, sorted_gt_idx]
+        matched = candidate.any(axis=1)
+        match_idx = sorted_gt_idx[candidate.argmax(axis=1)]
+        tp[matched, idx] = 1
+        fp[~matched, idx] = 1
+        lock_gt[np.flatnonzero(matched), match_idx[matched]] = True
 
     tp_cumsum = np.cumsum(tp, axis=1).astype(np.float64)
     fp_cumsum = np.cumsum(fp, axis=1).astype(np.float64)
@@ -139,17 +143,41 @@ def compute_average_precision_detection(ground_truth,
 
     return ap
 
-def get_predictions_with_label(prediction_by_label, label_name, cidx):
-    """Get all predicitons of the given label. Return empty DataFrame if there
-        is no predcitions with the given label.
-        """
-    try:
-        return prediction_by_label.get_group(label_name).reset_index(drop=True)
-    except:
-        return pd.DataFrame()
+# ref: https://github.com/activitynet/ActivityNet/blob/master/Evaluation/eval_detection.py
+def compute_average_precision_detection(ground_truth,
+                                        prediction,
+                                        tiou_thresholds=np.linspace(
+                                            0.5, 0.95, 10)):
+    """Compute average precision (detection task) between ground truth and
+    predictions data frames. If multiple predictions occurs for the same
+    predicted segment, only the one with highest score is matches as
+    true positive. This code is greatly inspired by Pascal VOC devkit.
+
+    Parameters
+    ----------
+    ground_truth : df
+        Data frame containing the ground truth instances.
+        Required fields: ['video-id', 't_start', 't_end']
+    prediction : df
+        Data frame containing the prediction instances.
+        Required fields: ['video-id, 't_start', 't_end', 'score']
+    tiou_thresholds : 1darray, optional
+        Temporal intersection over union threshold.
+
+    Outputs
+    -------
+    ap : float
+        Average precision score.
+    """
+    if prediction.empty or ground_truth.empty:
+        return np.zeros(len(tiou_thresholds))
+    return average_precision_detection(
+        ground_truth['video-id'].values, ground_truth[['t_start', 't_end']].values,
+        prediction['video-id'].values, prediction[['t_start', 't_end']].values,
+        prediction['score'].values, tiou_thresholds)
 
 def wrapper_compute_average_precision(prediction, ground_truth, tiou_thresholds,
-                                      activity_index):
+                                      activity_index, n_jobs=4):
     """Computes average precision for each class in the subset.
         """
     activity_dict = activity_index.copy()
@@ -160,20 +188,28 @@ def wrapper_compute_average_precision(prediction, ground_truth, tiou_thresholds,
 
     ap = np.zeros((len(tiou_thresholds), len(activity_dict)))
 
-    # Adaptation to query faster
-    ground_truth_by_label = ground_truth.groupby('label')
-    prediction_by_label = prediction.groupby('label')
-
-    results = Parallel(n_jobs=4)(
-        delayed(compute_average_precision_detection)(
-            ground_truth=get_predictions_with_label(ground_truth_by_label,
-                                                    label_name, cidx),
-            prediction=get_predictions_with_label(prediction_by_label,
-                                                  label_name, cidx),
+    # split instances of every class into arrays once
+    gt_label = ground_truth['label'].values
+    gt_video_ids = ground_truth['video-id'].values
+    gt_segments = ground_truth[['t_start', 't_end']].values
+    pred_label = prediction['label'].values
+    pred_video_ids = prediction['video-id'].values
+    pred_segments = prediction[['t_start', 't_end']].values
+    pred_scores = prediction['score'].values
+
+    def class_args(label_name):
+        gt_mask = gt_label == label_name
+        pred_mask = pred_label == label_name
+        return (gt_video_ids[gt_mask], gt_segments[gt_mask], pred_video_ids[pred_mask],
+                pred_segments[pred_mask], pred_scores[pred_mask])
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(average_precision_detection)(
+            *class_args(label_name),
             tiou_thresholds=tiou_thresholds,
         ) for label_name, cidx in activity_dict.items())
 
     for i, cidx in enumerate(activity_dict.values()):
         ap[:, cidx] = results[i]
 
-    return ap
\ No newline at end of file
+    return ap
@@ -12,7 +12,7 @@ from ...utils.logger import get_logger
 from ..base_metric import BaseMetric
 from ..builder import METRIC
 from ..tas.tas_metric_utils import get_labels_scores_start_end_time
-from .utils import boundary_AR
+from .utils import batch_boundary_AR
 
 @METRIC.register()
 class TAProposalMetric(BaseMetric):
@@ -55,11 +55,14 @@ class TAProposalMetric(BaseMetric):
         self.actions_dict = dict()
         for a in actions:
             self.actions_dict[a.split()[1]] = int(a.split()[0])
+        self.id2class_map = dict((v, k) for k, v in self.actions_dict.items())
 
         self.logger = get_logger("SVTAS")
         # boundary score
         self.max_proposal = max_proposal
-        self.AR_at_AN = [[] for _ in range(max_proposal)]
+        # proposals of all videos are scored at once in accumulate
+        self.pred_detection_list = []
+        self.gt_detection_list = []
     
     def _write_seg_file(self, input_data, write_name, write_path):
         if self.output_format in ['txt']:
@@ -81,21 +84,8 @@ class TAProposalMetric(BaseMetric):
         f.close()
 
     def _transform_model_result(self, vid, outputs_np, gt_np, outputs_arr):
-        recognition = []
-        for i in range(outputs_np.shape[0]):
-            recognition = np.concatenate((recognition, [
-                list(self.actions_dict.keys())[list(
-                    self.actions_dict.values()).index(outputs_np[i])]
-            ]))
-        recog_content = list(recognition)
-       
-        gt_content = []
-        for i in range(gt_np.shape[0]):
-            gt_content = np.concatenate((gt_content, [
-                list(self.actions_dict.keys())[list(
-                    self.actions_dict.values()).index(gt_np[i])]
-            ]))
-        gt_content = list(gt_content)
+        recog_content = [self.id2class_map[label] for label in np.asarray(outputs_np).reshape([-1]).tolist()]
+        gt_content = [self.id2class_map[label] for label in np.asarray(gt_np).reshape([-1]).tolist()]
 
         pred_detection = get_labels_scores_start_end_time(
             outputs_arr, recog_content, self.actions_dict)
@@ -110,14 +100,8 @@ class TAProposalMetric(BaseMetric):
     
     def _update_score(self, pred_detection, gt_detection):
         # proposal score
-        for AN in range(self.max_proposal):
-            AR = boundary_AR(pred_detection,
-                             gt_detection,
-                             list(self.tiou_thresholds),
-                             max_proposal=(AN + 1))
-            self.AR_at_AN[AN].append(AR)
-
-        return AR
+        self.pred_detection_list.append(pred_detection)
+        self.gt_detection_list.append(gt_detection)
     
     def update(self, vid, ground_truth_batch, outputs):
         """update metrics during each iter
@@ -152,24 +136,19 @@ class TAProposalMetric(BaseMetric):
 
             result = self._transform_model_result(vid[bs], outputs_np, gt_np, outputs_arr)
             recog_content, gt_content, pred_detection, gt_detection = result
-            ar = self._update_score(pred_detection, gt_detection)
+            self._update_score(pred_detection, gt_detection)
             
             # count acc
-            acc = 0.
-            total = 1
-            for p, t in zip(recog_content, gt_content):
-                if p != t:
-                    total += 1
-                elif p == t:
-                    total += 1
-                    acc += 1
-            acc = acc / total
+            acc = float(np.sum(np.asarray(outputs_np) == np.asarray(gt_np))) / (len(gt_content) + 1)
             single_batch_acc += acc
         return single_batch_acc / len(predicted_batch)
     
     def _compute_metrics(self):
         # proposal metric
-        proposal_AUC = np.array(self.AR_at_AN) * 100
+        # [num_videos, AN]
+        AR_at_AN = batch_boundary_AR(self.pred_detection_list, self.gt_detection_list,
+                                     list(self.tiou_thresholds), self.max_proposal)
+        proposal_AUC = np.ascontiguousarray(AR_at_AN.T) * 100
         AUC = np.mean(proposal_AUC)
         AR_at_AN1 = np.mean(proposal_AUC[0, :])
         AR_at_AN5 = np.mean(proposal_AUC[4, :])
@@ -199,7 +178,8 @@ class TAProposalMetric(BaseMetric):
     def _clear_for_next_epoch(self):
         # clear for next epoch
         # proposal
-        self.AR_at_AN = [[] for _ in range(self.max_proposal)]
+        self.pred_detection_list = []
+        self.gt_detection_list = []
     
     def accumulate(self):
         """accumulate metrics when finished all iters.
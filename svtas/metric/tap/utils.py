@@ -7,78 +7,80 @@ Description  : file content
 FilePath     : /SVTAS/svtas/metric/temporal_action_proposal/utils.py
 '''
 import numpy as np
-import pandas as pd
 
-def boundary_AR(pred_boundary, gt_boundary, overlap_list, max_proposal):
+def _sort_by_score(scores):
+    """
+    Indexes of decreasing score, ties keep the same order as
+    `pd.DataFrame.sort_values(ascending=False)`.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    reverse_idx = np.arange(len(scores))[::-1]
+    return reverse_idx[scores[::-1].argsort(kind='quicksort')][::-1]
+
+def boundary_AR_curve(pred_boundary, gt_boundary, overlap_list, max_proposal):
+    """
+    Average recall of one video at every AN in `[1, max_proposal]`, the
+    proposal-by-gt IoU matrix is computed once and every AN reads a prefix of it.
 
+    Return:
+        AR: 1darray [max_proposal]
+    """
     p_label, p_start, p_end, p_scores = pred_boundary
     y_label, y_start, y_end, _ = gt_boundary
 
-    # sort proposal
-    pred_dict = {
-        "label": p_label,
-        "start": p_start,
-        "end": p_end,
-        "scores": p_scores
-    }
-    pdf = pd.DataFrame(pred_dict)
-    pdf = pdf.sort_values(by="scores", ascending=False)
-    p_label = list(pdf["label"])
-    p_start = list(pdf["start"])
-    p_end = list(pdf["end"])
-    p_scores = list(pdf["scores"])
-
-    t_AR = np.zeros(len(overlap_list))
-
-    # refine AN
-    if len(p_label) < max_proposal and len(p_label) > 0:
-        p_label = p_label + [p_label[-1]] * (max_proposal - len(p_label))
-        p_start = p_start + [p_start[-1]] * (max_proposal - len(p_start))
-        p_start = p_start + p_start[len(p_start) -
-                                    (max_proposal - len(p_start)):]
-        p_end = p_end + [p_end[-1]] * (max_proposal - len(p_end))
-        p_scores = p_scores + [p_scores[-1]] * (max_proposal - len(p_scores))
-    elif len(p_label) > max_proposal:
-        p_label[max_proposal:] = []
-        p_start[max_proposal:] = []
-        p_end[max_proposal:] = []
-        p_scores[max_proposal:] = []
-    else:
-        return np.mean(t_AR)
+    AR = np.zeros(max_proposal)
+    num_proposal = len(p_label)
+    if num_proposal < 1:
+        return AR
 
-    for i in range(len(overlap_list)):
-        overlap = overlap_list[i]
+    # sort proposal
+    sort_idx = _sort_by_score(p_scores)[:max_proposal]
+    p_start = np.asarray(p_start)[sort_idx]
+    p_end = np.asarray(p_end)[sort_idx]
 
-        tp = 0
-        fp = 0
+    t_AR = np.zeros((max_proposal, len(overlap_list)))
+    if len(y_label) > 0:
+        y_start = np.asarray(y_start)
+        y_end = np.asarray(y_end)
+        # IoU matrix [P, Y]
+        intersection = np.minimum(p_end[:, None], y_end[None, :]) - np.maximum(
+            p_start[:, None], y_start[None, :])
+        union = np.maximum(p_end[:, None], y_end[None, :]) - np.minimum(
+            p_start[:, None], y_start[None, :])
+        IoU = (1.0 * intersection / union)
+        # Get the best scoring segment
+        idx = IoU.argmax(axis=1)
+        best_IoU = IoU[np.arange(len(idx)), idx]
 
-        if len(y_label) > 0:
-            hits = np.zeros(len(y_label))
+        for i in range(len(overlap_list)):
+            # a ground truth is only hit by the first proposal over overlap
+            hit_rows = np.flatnonzero(best_IoU >= overlap_list[i])
+            _, first_hit = np.unique(idx[hit_rows], return_index=True)
+            new_hits = np.zeros(len(idx))
+            new_hits[hit_rows[first_hit]] = 1
+            tp = np.cumsum(new_hits)
+            # proposals less than AN are padded by the last one, which hits nothing new
+            tp_at_AN = tp[np.minimum(np.arange(max_proposal), len(tp) - 1)]
+            fn_at_AN = len(y_label) - tp_at_AN
+            t_AR[:, i] = tp_at_AN / (tp_at_AN + fn_at_AN)
 
-            for j in range(len(p_label)):
-                intersection = np.minimum(p_end[j], y_end) - np.maximum(
-                    p_start[j], y_start)
-                union = np.maximum(p_end[j], y_end) - np.minimum(
-                    p_start[j], y_start)
-                IoU = (1.0 * intersection / union)
-                # Get the best scoring segment
-                idx = np.array(IoU).argmax()
+    AR = np.mean(t_AR, axis=1)
+    # AN equals to the number of proposals is not refined
+    if num_proposal <= max_proposal:
+        AR[num_proposal - 1] = 0.
+    return AR
 
-                if IoU[idx] >= overlap and not hits[idx]:
-                    tp += 1
-                    hits[idx] = 1
-                else:
-                    fp += 1
-            fn = len(y_label) - sum(hits)
+def batch_boundary_AR(pred_boundary_list, gt_boundary_list, overlap_list, max_proposal):
+    """
+    Average recall of a batch of videos at every AN.
 
-            recall = float(tp) / (float(tp) + float(fn))
-        else:
-            if len(p_label) < 1:
-                recall = float(1.0)
-            else:
-                recall = float(0.0)
-        t_AR[i] = recall
-
-    AR = np.mean(t_AR)
-    return AR
+    Return:
+        AR: 2darray [num_videos, max_proposal]
+    """
+    if len(pred_boundary_list) < 1:
+        return np.zeros((0, max_proposal))
+    return np.stack([boundary_AR_curve(pred_boundary, gt_boundary, overlap_list, max_proposal)
+                     for pred_boundary, gt_boundary in zip(pred_boundary_list, gt_boundary_list)], axis=0)
 
+def boundary_AR(pred_boundary, gt_boundary, overlap_list, max_proposal):
+    return boundary_AR_curve(pred_boundary, gt_boundary, overlap_list, max_proposal)[max_proposal - 1]
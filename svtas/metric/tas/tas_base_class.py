@@ -13,7 +13,8 @@ from ...utils.config import get_logger
 from ..builder import METRIC
 
 from .tas_metric_utils import get_labels_scores_start_end_time
-from .tas_metric_utils import levenstein, edit_score, f_score
+from .tas_metric_utils import levenstein
+from .tas_metric_utils import get_run_length_segments, segments_f_score, ignore_bg_class
 
 @METRIC.register()
 class BaseTASegmentationMetric(BaseMetric):
@@ -38,6 +39,8 @@ class BaseTASegmentationMetric(BaseMetric):
         self.elps = 1e-10
         self.file_output = file_output
         self.score_output = score_output
+        # only score output file needs `output_np`
+        self.need_score = score_output
         self.gt_file_need = gt_file_need
         self.output_format = output_format
         self.output_dir = output_dir
@@ -63,6 +66,9 @@ class BaseTASegmentationMetric(BaseMetric):
         self.actions_dict = dict()
         for a in actions:
             self.actions_dict[a.split()[1]] = int(a.split()[0])
+        # integer label engine, class names are only used for file output
+        self.id2class_map = dict((v, k) for k, v in self.actions_dict.items())
+        self.bg_class_ids = [self.actions_dict[name] for name in ignore_bg_class if name in self.actions_dict]
 
         # cls score
         self.overlap = overlap
@@ -77,25 +83,22 @@ class BaseTASegmentationMetric(BaseMetric):
         self.total_video = 0
 
     def _update_score(self, recog_content, gt_content):
+        # recog_content, gt_content: integer labels ndarray [T]
         # cls score
-        correct = 0
-        total = 0
+        correct = int(np.sum(gt_content == recog_content))
+        total = len(gt_content)
+        #accumulate
+        self.total_frame += total
+        self.total_correct += correct
 
-        for i in range(len(gt_content)):
-            total += 1
-            #accumulate
-            self.total_frame += 1
+        p_segments = get_run_length_segments(recog_content, self.bg_class_ids)
+        y_segments = get_run_length_segments(gt_content, self.bg_class_ids)
 
-            if gt_content[i] == recog_content[i]:
-                correct += 1
-                #accumulate
-                self.total_correct += 1
-
-        edit_num = edit_score(recog_content, gt_content)
+        edit_num = levenstein(p_segments[0], y_segments[0], norm=True)
         self.total_edit += edit_num
 
         for s in range(self.overlap_len):
-            tp1, fp1, fn1 = f_score(recog_content, gt_content, self.overlap[s])
+            tp1, fp1, fn1 = segments_f_score(p_segments, y_segments, self.overlap[s])
 
             # accumulate
             self.cls_tp[s] += tp1
@@ -134,32 +137,24 @@ class BaseTASegmentationMetric(BaseMetric):
         f.writelines(recog_content)
         f.close()
 
+    def _labels_to_names(self, labels):
+        return [self.id2class_map[label] for label in labels.tolist()]
+
     def _transform_model_result(self, vid, outputs_np, gt_np, outputs_arr):
-        recognition = []
-        for i in range(outputs_np.shape[0]):
-            recognition = np.concatenate((recognition, [
-                list(self.actions_dict.keys())[list(
-                    self.actions_dict.values()).index(outputs_np[i])]
-            ]))
-        recog_content = list(recognition)
-       
-        gt_content = []
-        for i in range(gt_np.shape[0]):
-            gt_content = np.concatenate((gt_content, [
-                list(self.actions_dict.keys())[list(
-                    self.actions_dict.values()).index(gt_np[i])]
-            ]))
-        gt_content = list(gt_content)
+        recog_content = np.asarray(outputs_np).astype(np.int64).reshape([-1])
+        gt_content = np.asarray(gt_np).astype(np.int64).reshape([-1])
 
         if self.file_output is True and self.train_mode is False:
             if self.gt_file_need is True:
-                self._write_seg_file(gt_content, vid + '-gt', self.output_dir)
-            self._write_seg_file(recog_content, vid + '-pred', self.output_dir)
-
-        pred_detection = get_labels_scores_start_end_time(
-            outputs_arr, recog_content, self.actions_dict)
-        gt_detection = get_labels_scores_start_end_time(
-            np.ones(outputs_arr.shape), gt_content, self.actions_dict)
+                self._write_seg_file(self._labels_to_names(gt_content), vid + '-gt', self.output_dir)
+            self._write_seg_file(self._labels_to_names(recog_content), vid + '-pred', self.output_dir)
+
+        pred_detection, gt_detection = None, None
+        if outputs_arr is not None:
+            pred_detection = get_labels_scores_start_end_time(
+                outputs_arr, recog_content, None, self.bg_class_ids)
+            gt_detection = get_labels_scores_start_end_time(
+                np.ones(outputs_arr.shape), gt_content, None, self.bg_class_ids)
         return [recog_content, gt_content, pred_detection, gt_detection]
 
     def update(self, outputs):
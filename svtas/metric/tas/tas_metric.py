@@ -48,12 +48,13 @@ class TASegmentationMetric(BaseTASegmentationMetric):
             vid = [val for val in vid for i in range(repet_rate)]
         for bs in range(len(predicted_batch)):
             predicted = predicted_batch[bs]
-            output_np = output_np_batch[bs]
+            # scores are not gathered across ranks if not needed
+            output_np = output_np_batch[bs] if output_np_batch is not None else None
             groundTruth = ground_truth_batch[bs]
 
             if type(predicted) is not np.ndarray:
                 outputs_np = predicted.numpy()
-                outputs_arr = output_np.numpy()
+                outputs_arr = output_np.numpy() if output_np is not None else None
                 gt_np = groundTruth.numpy()
             else:
                 outputs_np = predicted
@@ -10,124 +10,97 @@ import numpy as np
 
 ignore_bg_class = ["background", "None"]
 
+def get_run_length_segments(frame_wise_labels, bg_class=ignore_bg_class):
+    """
+    Run-length segmentation of frame-wise labels by `np.diff` of change points,
+    labels can be class names or integer class ids.
+
+    Return:
+        labels, starts, ends: np.ndarray, background segments are excluded
+    """
+    frame_wise_labels = np.asarray(frame_wise_labels)
+    change_idx = np.flatnonzero(frame_wise_labels[1:] != frame_wise_labels[:-1]) + 1
+    starts = np.concatenate([[0], change_idx])
+    ends = np.concatenate([change_idx, [len(frame_wise_labels)]])
+    labels = frame_wise_labels[starts]
+    fg_mask = ~np.isin(labels, list(bg_class))
+    return labels[fg_mask], starts[fg_mask], ends[fg_mask]
+
 def get_labels_scores_start_end_time(input_np,
                                      frame_wise_labels,
                                      actions_dict,
                                      bg_class=ignore_bg_class):
-    labels = []
-    starts = []
-    ends = []
+    """
+    `actions_dict` maps label to score row, use None for integer labels.
+    """
+    labels, starts, ends = get_run_length_segments(frame_wise_labels, bg_class)
+    labels, starts, ends = labels.tolist(), starts.tolist(), ends.tolist()
     scores = []
-
-    boundary_score_ptr = 0
-
-    last_label = frame_wise_labels[0]
-    if frame_wise_labels[0] not in bg_class:
-        labels.append(frame_wise_labels[0])
-        starts.append(0)
-    for i in range(len(frame_wise_labels)):
-        if frame_wise_labels[i] != last_label:
-            if frame_wise_labels[i] not in bg_class:
-                labels.append(frame_wise_labels[i])
-                starts.append(i)
-            if last_label not in bg_class:
-                ends.append(i)
-                score = np.mean(
-                        input_np[actions_dict[labels[boundary_score_ptr]], \
-                            starts[boundary_score_ptr]:(ends[boundary_score_ptr] + 1)]
-                        )
-                scores.append(score)
-                boundary_score_ptr = boundary_score_ptr + 1
-            last_label = frame_wise_labels[i]
-    if last_label not in bg_class:
-        ends.append(i + 1)
-        score = np.mean(
-                    input_np[actions_dict[labels[boundary_score_ptr]], \
-                        starts[boundary_score_ptr]:(ends[boundary_score_ptr] + 1)]
-                    )
-        scores.append(score)
-        boundary_score_ptr = boundary_score_ptr + 1
+    for label, start, end in zip(labels, starts, ends):
+        score_idx = label if actions_dict is None else actions_dict[label]
+        scores.append(np.mean(input_np[score_idx, start:(end + 1)]))
 
     return labels, starts, ends, scores
 
 
 def get_labels_start_end_time(frame_wise_labels, bg_class=ignore_bg_class):
-    labels = []
-    starts = []
-    ends = []
-    last_label = frame_wise_labels[0]
-    if frame_wise_labels[0] not in bg_class:
-        labels.append(frame_wise_labels[0])
-        starts.append(0)
-    for i in range(len(frame_wise_labels)):
-        if frame_wise_labels[i] != last_label:
-            if frame_wise_labels[i] not in bg_class:
-                labels.append(frame_wise_labels[i])
-                starts.append(i)
-            if last_label not in bg_class:
-                ends.append(i)
-            last_label = frame_wise_labels[i]
-    if last_label not in bg_class:
-        ends.append(i + 1)
-    return labels, starts, ends
+    labels, starts, ends = get_run_length_segments(frame_wise_labels, bg_class)
+    return labels.tolist(), starts.tolist(), ends.tolist()
 
 
 def levenstein(p, y, norm=False):
     m_row = len(p)
     n_col = len(y)
-    D = np.zeros([m_row + 1, n_col + 1])
-    for i in range(m_row + 1):
-        D[i, 0] = i
-    for i in range(n_col + 1):
-        D[0, i] = i
-
-    for j in range(1, n_col + 1):
-        for i in range(1, m_row + 1):
-            if y[j - 1] == p[i - 1]:
-                D[i, j] = D[i - 1, j - 1]
-            else:
-                D[i, j] = min(D[i - 1, j] + 1, D[i, j - 1] + 1,
-                              D[i - 1, j - 1] + 1)
+    p = np.asarray(p)
+    y = np.asarray(y)
+    col_idx = np.arange(n_col + 1)
+    # one row of the distance matrix at a time
+    D = col_idx.copy()
+    for i in range(1, m_row + 1):
+        row = np.empty_like(D)
+        row[0] = i
+        row[1:] = np.minimum(D[1:] + 1, D[:-1] + (y != p[i - 1]))
+        # insertion D[i, j - 1] + 1 is a running minimum along the row
+        D = np.minimum.accumulate(row - col_idx) + col_idx
 
     if norm:
-        score = (1 - D[-1, -1] / (max(m_row, n_col) + 1e-6)) * 100
+        score = (1 - np.float64(D[-1]) / (max(m_row, n_col) + 1e-6)) * 100
     else:
-        score = D[-1, -1]
+        score = np.float64(D[-1])
 
     return score
 
 
 def edit_score(recognized, ground_truth, norm=True, bg_class=ignore_bg_class):
-    P, _, _ = get_labels_start_end_time(recognized, bg_class)
-    Y, _, _ = get_labels_start_end_time(ground_truth, bg_class)
+    P, _, _ = get_run_length_segments(recognized, bg_class)
+    Y, _, _ = get_run_length_segments(ground_truth, bg_class)
     return levenstein(P, Y, norm)
 
 
-def f_score(recognized, ground_truth, overlap, bg_class=ignore_bg_class):
-    p_label, p_start, p_end = get_labels_start_end_time(recognized, bg_class)
-    y_label, y_start, y_end = get_labels_start_end_time(ground_truth, bg_class)
+def segments_f_score(p_segments, y_segments, overlap):
+    """
+    F1 counts from segments `(labels, starts, ends)` of prediction and ground truth.
+    """
+    p_label, p_start, p_end = p_segments
+    y_label, y_start, y_end = y_segments
 
     tp = 0
     fp = 0
     if len(y_label) > 0:
-        hits = np.zeros(len(y_label))
-
-        for j in range(len(p_label)):
-            intersection = np.minimum(p_end[j], y_end) - np.maximum(
-                p_start[j], y_start)
-            union = np.maximum(p_end[j], y_end) - np.minimum(
-                p_start[j], y_start)
-            IoU = (1.0 * intersection / union) * (
-                [p_label[j] == y_label[x] for x in range(len(y_label))])
+        if len(p_label) > 0:
+            # IoU matrix [P, Y]
+            intersection = np.minimum(p_end[:, None], y_end[None, :]) - np.maximum(
+                p_start[:, None], y_start[None, :])
+            union = np.maximum(p_end[:, None], y_end[None, :]) - np.minimum(
+                p_start[:, None], y_start[None, :])
+            IoU = (1.0 * intersection / union) * (p_label[:, None] == y_label[None, :])
             # Get the best scoring segment
-            idx = np.array(IoU).argmax()
-
-            if IoU[idx] >= overlap and not hits[idx]:
-                tp += 1
-                hits[idx] = 1
-            else:
-                fp += 1
-        fn = len(y_label) - sum(hits)
+            idx = IoU.argmax(axis=1)
+            best_IoU = IoU[np.arange(len(p_label)), idx]
+            # a ground truth segment is only hit by the first prediction over overlap
+            tp = len(np.unique(idx[best_IoU >= overlap]))
+            fp = len(p_label) - tp
+        fn = len(y_label) - tp
     else:
         if len(p_label) < 1:
             tp = 1
@@ -137,3 +110,7 @@ def f_score(recognized, ground_truth, overlap, bg_class=ignore_bg_class):
     return float(tp), float(fp), float(fn)
 
 
+def f_score(recognized, ground_truth, overlap, bg_class=ignore_bg_class):
+    p_segments = get_run_length_segments(recognized, bg_class)
+    y_segments = get_run_length_segments(ground_truth, bg_class)
+    return segments_f_score(p_segments, y_segments, overlap)
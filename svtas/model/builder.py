@@ -56,8 +56,12 @@ def build_architecture(cfg):
 def build_model(cfg):
     """Build model."""
     args = cfg.copy()
+    # import here, heads import registries of this module
+    from .heads.utils.attention_helper.attention_backend import set_attention_backend
+    # backend is process global, reset it to defaults when the config does not set it
+    set_attention_backend(**args.pop('attention_backend', {}))
     obj_type = args.get('architecture')
     if obj_type in ARCHITECTURE:
-        return build_architecture(cfg)
+        return build_architecture(args)
     raise ValueError(f'{obj_type} is not registered in '
                      'ARCHITECTURE')
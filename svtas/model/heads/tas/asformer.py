@@ -18,6 +18,7 @@ import copy
 import numpy as np
 import math
 from ...builder import HEADS
+from ..utils.attention_helper.attention_backend import get_attention_backend, scaled_dot_product_attention
 
 def exponential_descrease(idx_decoder, p=3):
     return math.exp(-p*idx_decoder)
@@ -41,6 +42,9 @@ class AttentionHelper(nn.Module):
         m, c2, l2 = proj_key.shape
         
         assert c1 == c2
+
+        if get_attention_backend() != 'math' and padding_mask.shape[1] == 1:
+            return self.backend_scalar_dot_att(proj_query, proj_key, proj_val, padding_mask)
         
         energy = torch.bmm(proj_query.permute(0, 2, 1), proj_key)  # out of shape (B, L1, L2)
         attention = energy / np.sqrt(c1)
@@ -51,6 +55,18 @@ class AttentionHelper(nn.Module):
         out = torch.bmm(proj_val, attention)
         return out, attention
 
+    def backend_scalar_dot_att(self, proj_query, proj_key, proj_val, padding_mask):
+        """
+        `scalar_dot_att` by attention backend without `[B, L1, L2]` scores, for
+        padding mask of shape (B, 1, L2) shared by all queries. Masking the
+        attention after softmax equals masking the values, attention is not returned.
+        """
+        query = proj_query.permute(0, 2, 1)
+        key = proj_key.permute(0, 2, 1)
+        value = (proj_val * padding_mask).permute(0, 2, 1)
+        out = scaled_dot_product_attention(query, key, value, attn_mask=torch.log(padding_mask + 1e-6))
+        return out.permute(0, 2, 1), None
+
 class AttLayer(nn.Module):
     def __init__(self, q_dim, k_dim, v_dim, r1, r2, r3, bl, stage, att_type): # r1 = r2
         super(AttLayer, self).__init__()
@@ -70,6 +86,7 @@ class AttLayer(nn.Module):
         
         self.att_helper = AttentionHelper()
         self.window_mask = self.construct_window_mask()
+        self._window_mask_cache = dict()
         
     
     def construct_window_mask(self):
@@ -138,37 +155,37 @@ class AttLayer(nn.Module):
         output = output[:, :, 0:L]
         return output * mask[:, 0:1, :]  
     
+    def get_window_mask(self, device):
+        # window mask is constant, keep one copy per device and broadcast it over windows
+        if device not in self._window_mask_cache:
+            self._window_mask_cache[device] = self.window_mask.to(device)
+        return self._window_mask_cache[device]
+
     def _sliding_window_self_att(self, q, k, v, mask):
         m_batchsize, c1, L = q.size()
         _, c2, _ = k.size()
         _, c3, _ = v.size()
         
-        # assert m_batchsize == 1  # currently, we only accept input with batch size 1
         # padding zeros for the last segment
-        nb = L // self.bl
-        if L % self.bl != 0:
-            q = torch.cat([q, torch.zeros((m_batchsize, c1, self.bl - L % self.bl)).to(q.device)], dim=-1)
-            k = torch.cat([k, torch.zeros((m_batchsize, c2, self.bl - L % self.bl)).to(q.device)], dim=-1)
-            v = torch.cat([v, torch.zeros((m_batchsize, c3, self.bl - L % self.bl)).to(q.device)], dim=-1)
-            nb += 1
-        padding_mask = torch.cat([torch.ones((m_batchsize, 1, L)).to(q.device) * mask[:,0:1,:], torch.zeros((m_batchsize, 1, self.bl * nb - L)).to(q.device)],dim=-1)
+        nb = (L + self.bl - 1) // self.bl
+        pad_len = self.bl * nb - L
+        half_bl = self.bl // 2
+        window_len = self.bl + 2 * half_bl
         
         # sliding window approach, by splitting query_proj and key_proj into shape (c1, l) x (c1, 2l)
         # sliding window for query_proj: reshape
-        q = q.reshape(m_batchsize, c1, nb, self.bl).permute(0, 2, 1, 3).reshape(m_batchsize * nb, c1, self.bl)
-        
-        # sliding window approach for key_proj
-        # 1. add paddings at the start and end
-        k = torch.cat([torch.zeros(m_batchsize, c2, self.bl // 2).to(q.device), k, torch.zeros(m_batchsize, c2, self.bl // 2).to(q.device)], dim=-1)
-        v = torch.cat([torch.zeros(m_batchsize, c3, self.bl // 2).to(q.device), v, torch.zeros(m_batchsize, c3, self.bl // 2).to(q.device)], dim=-1)
-        padding_mask = torch.cat([torch.zeros(m_batchsize, 1, self.bl // 2).to(q.device), padding_mask, torch.zeros(m_batchsize, 1, self.bl // 2).to(q.device)], dim=-1)
+        q = F.pad(q, (0, pad_len)).reshape(m_batchsize, c1, nb, self.bl).permute(0, 2, 1, 3).reshape(m_batchsize * nb, c1, self.bl)
         
-        # 2. reshape key_proj of shape (m_batchsize*nb, c1, 2*self.bl)
-        k = torch.cat([k[:,:, i*self.bl:(i+1)*self.bl+(self.bl//2)*2] for i in range(nb)], dim=0) # special case when self.bl = 1
-        v = torch.cat([v[:,:, i*self.bl:(i+1)*self.bl+(self.bl//2)*2] for i in range(nb)], dim=0) 
-        # 3. construct window mask of shape (1, l, 2l), and use it to generate final mask
-        padding_mask = torch.cat([padding_mask[:,:, i*self.bl:(i+1)*self.bl+(self.bl//2)*2] for i in range(nb)], dim=0) # of shape (m*nb, 1, 2l)
-        final_mask = self.window_mask.repeat(m_batchsize * nb, 1, 1).to(q.device) * padding_mask 
+        # sliding window approach for key_proj, add paddings at the start and end,
+        # then take windows of length l + 2 * (l // 2) with stride l by unfold, of shape (m_batchsize*nb, c, 2l)
+        k = F.pad(k, (half_bl, pad_len + half_bl)).unfold(-1, window_len, self.bl)
+        k = k.permute(0, 2, 1, 3).reshape(m_batchsize * nb, c2, window_len)
+        v = F.pad(v, (half_bl, pad_len + half_bl)).unfold(-1, window_len, self.bl)
+        v = v.permute(0, 2, 1, 3).reshape(m_batchsize * nb, c3, window_len)
+        padding_mask = F.pad(mask[:, 0:1, :].to(q.dtype), (half_bl, pad_len + half_bl)).unfold(-1, window_len, self.bl)
+        padding_mask = padding_mask.permute(0, 2, 1, 3).reshape(m_batchsize * nb, 1, window_len)
+        # window mask of shape (1, l, 2l) is broadcast to final mask of shape (m*nb, l, 2l)
+        final_mask = self.get_window_mask(q.device) * padding_mask
         
         output, attention = self.att_helper.scalar_dot_att(q, k, v, final_mask)
         output = self.conv_out(F.relu(output))
@@ -46,7 +46,8 @@ class Attention(nn.Module):
         heads = 8,
         causal = False,
         dropout = 0.,
-        null_kv = False
+        null_kv = False,
+        kv_proj = True
     ):
         super().__init__()
         self.heads = heads
@@ -58,24 +59,35 @@ class Attention(nn.Module):
         self.dropout = nn.Dropout(dropout)
 
         self.to_q = nn.Linear(dim, inner_dim, bias = False)
-        self.to_kv = nn.Linear(dim, inner_dim * 2, bias = False)
+        # without kv_proj keys and values are given by `kv` of forward
+        self.to_kv = nn.Linear(dim, inner_dim * 2, bias = False) if kv_proj else None
         self.to_out = nn.Linear(inner_dim, dim)
 
         # allowing for attending to nothing (null function)
         # and to save attention from breaking if all retrieved chunks are padded out
         self.null_kv = nn.Parameter(torch.randn(2, inner_dim)) if null_kv else None
 
-    def forward(self, x, mask = None, context = None, pos_emb = None):
+    def project_kv(self, x):
+        """
+        Project normed `x` to keys and values of shape `[b h n d]`, they can be
+        passed as `kv` to this module and to other modules with the same heads.
+        """
+        k, v = self.to_kv(self.norm(x)).chunk(2, dim = -1)
+        return tuple(rearrange(t, 'b n (h d) -> b h n d', h = self.heads) for t in (k, v))
+
+    def forward(self, x, mask = None, context = None, pos_emb = None, kv = None):
         b, device, h, scale = x.shape[0], x.device, self.heads, self.scale
 
         x = self.norm(x)
-        kv_input = default(context, x)
-
-        q = self.to_q(x)
-        k, v = self.to_kv(kv_input).chunk(2, dim = -1)
 
-        # split heads
-        q, k, v = map(lambda t: rearrange(t, 'b n (h d) -> b h n d', h = h), (q, k, v))
+        q = rearrange(self.to_q(x), 'b n (h d) -> b h n d', h = h)
+        if exists(kv):
+            k, v = kv
+        else:
+            kv_input = default(context, x)
+            k, v = self.to_kv(kv_input).chunk(2, dim = -1)
+            # split heads
+            k, v = map(lambda t: rearrange(t, 'b n (h d) -> b h n d', h = h), (k, v))
 
         # scale
         q = q * scale
@@ -135,6 +147,7 @@ class RecurrentAttentionBlock(nn.Module):
         state_len: int = 512,
         heads: int = 8,
         causal: bool = False,
+        share_kv: bool = False,
     ):
         super().__init__()
         self.scale = dim_head ** -0.5
@@ -147,14 +160,16 @@ class RecurrentAttentionBlock(nn.Module):
         self.heads = heads
         self.causal = causal
         self.state_len = state_len
+        self.share_kv = share_kv
         rotary_emb_dim = max(dim_head // 2, 32)
         self.rotary_pos_emb = RotaryEmbedding(rotary_emb_dim)
         
         self.input_self_attn = Attention(dim, heads = heads, causal = causal, **attn_kwargs)
         self.state_self_attn = Attention(dim_state, heads = heads, causal = causal, **attn_kwargs)
 
-        self.input_state_cross_attn = Attention(dim, heads = heads, causal = causal, **attn_kwargs)
-        self.state_input_cross_attn = Attention(dim_state, heads = heads, causal = causal, **attn_kwargs)
+        # with share_kv cross attention reuses keys and values of self attention, as in paper
+        self.input_state_cross_attn = Attention(dim, heads = heads, causal = causal, kv_proj = not share_kv, **attn_kwargs)
+        self.state_input_cross_attn = Attention(dim_state, heads = heads, causal = causal, kv_proj = not share_kv, **attn_kwargs)
 
         self.proj_gate = RecurrentStateGate(dim)
         self.ff_gate = RecurrentStateGate(dim)
@@ -178,13 +193,21 @@ class RecurrentAttentionBlock(nn.Module):
             state = torch.zeros((batch, self.state_len, self.dim_state), device=device)
         self_attn_pos_emb = self.rotary_pos_emb(seq_len, device = device)
         state_pos_emb = self.rotary_pos_emb(self.state_len, device = device)
-        input_attn = self.input_self_attn(x, mask = mask, pos_emb = self_attn_pos_emb)
-        state_attn = self.state_self_attn(state, mask = state_mask, pos_emb = state_pos_emb)
+        if self.share_kv:
+            input_kv = self.input_self_attn.project_kv(x)
+            state_kv = self.state_self_attn.project_kv(state)
+            input_attn = self.input_self_attn(x, mask = mask, pos_emb = self_attn_pos_emb, kv = input_kv)
+            state_attn = self.state_self_attn(state, mask = state_mask, pos_emb = state_pos_emb, kv = state_kv)
+
+            input_as_q_cross_attn = self.input_state_cross_attn(x, mask = mask, kv = state_kv)
+            state_as_q_cross_attn = self.state_input_cross_attn(state, mask = state_mask, kv = input_kv)
+        else:
+            input_attn = self.input_self_attn(x, mask = mask, pos_emb = self_attn_pos_emb)
+            state_attn = self.state_self_attn(state, mask = state_mask, pos_emb = state_pos_emb)
 
-        # TODO: This is different from how it is implemented in the paper, because the Keys and Values aren't shared
-        # between the cross attention and self-attention. I'll implement that later, this is faster for now.
-        input_as_q_cross_attn = self.input_state_cross_attn(x, context = state, mask = mask)
-        state_as_q_cross_attn = self.state_input_cross_attn(state, context = x, mask = state_mask)
+            # keys and values aren't shared between the cross attention and self-attention, see share_kv
+            input_as_q_cross_attn = self.input_state_cross_attn(x, context = state, mask = mask)
+            state_as_q_cross_attn = self.state_input_cross_attn(state, context = x, mask = state_mask)
 
         projected_input = self.input_proj(torch.concat((input_as_q_cross_attn, input_attn), dim=2))
         projected_state = self.state_proj(torch.concat((state_as_q_cross_attn, state_attn), dim=2))
@@ -205,11 +228,13 @@ class RecurrentAttentionEncoder(nn.Module):
                  state_len: int = 512,
                  num_head: int = 8,
                  causal: bool = False,
-                 num_layers:int = 5) -> None:
+                 num_layers:int = 5,
+                 share_kv: bool = False) -> None:
         super().__init__()
         self.num_layers = num_layers
         self.att_blocks = nn.ModuleList([RecurrentAttentionBlock(dim, dim_state, dim_head=dim_head,
-                                                                  state_len=state_len, heads=num_head, causal=causal)
+                                                                  state_len=state_len, heads=num_head, causal=causal,
+                                                                  share_kv=share_kv)
                                                                   for _ in range(num_layers)])
         self.state = []
     
@@ -244,13 +269,14 @@ class BRTClassificationHead(nn.Module):
                  state_len=512,
                  num_layers=5,
                  causal=False,
+                 share_kv=False,
                  out_feature=False):
         super(BRTClassificationHead, self).__init__()
         self.sample_rate = sample_rate
         self.out_feature = out_feature
         self.encoder = RecurrentAttentionEncoder(hidden_channels, hidden_channels, dim_head=dim_head,
                                                  state_len=state_len, num_head=num_head, causal=causal,
-                                                 num_layers=num_layers)
+                                                 num_layers=num_layers, share_kv=share_kv)
         if in_channels != hidden_channels:
             self.embedding = nn.Conv1d(in_channels, hidden_channels, 1)
         else:
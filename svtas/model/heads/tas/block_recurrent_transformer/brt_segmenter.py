@@ -26,6 +26,7 @@ class RecurrentAttentionBlock(nn.Module):
         state_len: int = 512,
         heads: int = 8,
         causal: bool = False,
+        share_kv: bool = False,
     ):
         super().__init__()
         self.scale = dim ** -0.5
@@ -36,12 +37,14 @@ class RecurrentAttentionBlock(nn.Module):
         self.heads = heads
         self.causal = causal
         self.state_len = state_len
+        self.share_kv = share_kv
         
         self.input_self_attn = MultiHeadAttention(embed_dim=dim, num_heads=heads, additional_mask_cfg={'type':'dilated_windows', 'window_size': kernel_size, 'dilation': dilation})
         self.state_self_attn = MultiHeadAttention(embed_dim=dim, num_heads=heads)
 
-        self.input_state_cross_attn = MultiHeadAttention(embed_dim=dim, num_heads=heads, additional_mask_cfg={'type':'dilated_windows', 'window_size': state_len, 'dilation': dilation})
-        self.state_input_cross_attn = MultiHeadAttention(embed_dim=dim, num_heads=heads)
+        # with share_kv cross attention reuses keys and values projected by self attention
+        self.input_state_cross_attn = MultiHeadAttention(embed_dim=dim, num_heads=heads, additional_mask_cfg={'type':'dilated_windows', 'window_size': state_len, 'dilation': dilation}, kv_proj=not share_kv)
+        self.state_input_cross_attn = MultiHeadAttention(embed_dim=dim, num_heads=heads, kv_proj=not share_kv)
 
         self.proj_gate = RecurrentStateGate(dim)
         self.ff_gate = RecurrentStateGate(dim)
@@ -71,11 +74,17 @@ class RecurrentAttentionBlock(nn.Module):
             state = torch.zeros((batch, self.state_len, self.dim_state), device=device)
         key_padding_mask = self.gen_key_padding_mask(masks=masks)
 
-        input_attn, _ = self.input_self_attn(x, x, x, key_padding_mask)
-        state_attn, _ = self.state_self_attn(state, state, state)
+        if self.share_kv:
+            input_kv = self.input_self_attn.project_kv(x, x)
+            state_kv = self.state_self_attn.project_kv(state, state)
+        else:
+            input_kv, state_kv = None, None
 
-        input_as_q_cross_attn, _ = self.input_state_cross_attn(x, state, state, key_padding_mask)
-        state_as_q_cross_attn, _ = self.state_input_cross_attn(state, x, x)
+        input_attn, _ = self.input_self_attn(x, x, x, key_padding_mask, kv=input_kv)
+        state_attn, _ = self.state_self_attn(state, state, state, kv=state_kv)
+
+        input_as_q_cross_attn, _ = self.input_state_cross_attn(x, state, state, key_padding_mask, kv=state_kv)
+        state_as_q_cross_attn, _ = self.state_input_cross_attn(state, x, x, kv=input_kv)
 
         projected_input = self.input_proj(torch.concat((input_as_q_cross_attn, input_attn), dim=2))
         projected_state = self.state_proj(torch.concat((state_as_q_cross_attn, state_attn), dim=2))
@@ -149,10 +158,11 @@ class RecurrentHierarchicalAttentionLayer(nn.Module):
                  dilation: int = 8,
                  causal: bool = False,
                  dropout=0.0,
-                 need_pass=True):
+                 need_pass=True,
+                 share_kv=False):
         super().__init__()
         if need_pass:
-            self.att = RecurrentAttentionBlock(dim, dim_state, kernel_size=dilation, dilation=1, state_len=state_len, heads=num_head, causal=causal)
+            self.att = RecurrentAttentionBlock(dim, dim_state, kernel_size=dilation, dilation=1, state_len=state_len, heads=num_head, causal=causal, share_kv=share_kv)
         else:
             self.att = AttentionBlock(dim, dim_state, kernel_size=dilation, dilation=1, heads=num_head, causal=causal)
         if dropout > 0.0:
@@ -186,7 +196,7 @@ class RecurrentHierarchicalAttentionLayer(nn.Module):
         return x.transpose(1, 2) * masks[:, 0:1, :]
 
 class AttModule(nn.Module):
-    def __init__(self, dilation, in_channels, out_channels, state_len=512, num_head=1, stage='encoder', causal=False, dropout=0.0, need_pass=True):
+    def __init__(self, dilation, in_channels, out_channels, state_len=512, num_head=1, stage='encoder', causal=False, dropout=0.0, need_pass=True, share_kv=False):
         super(AttModule, self).__init__()
         self.stage = stage
         self.feed_forward = ConvFeedForward(dilation, in_channels, out_channels)
@@ -199,7 +209,8 @@ class AttModule(nn.Module):
                                                                 dilation= dilation,
                                                                 causal = causal,
                                                                 dropout=dropout,
-                                                                need_pass=need_pass)
+                                                                need_pass=need_pass,
+                                                                share_kv=share_kv)
         self.conv_1x1 = nn.Conv1d(out_channels, in_channels, 1)
         self.dropout = nn.Dropout()
     
@@ -217,12 +228,12 @@ class AttModule(nn.Module):
 
 class Encoder(nn.Module):
     def __init__(self, num_layers, num_f_maps, input_dim, num_classes, channel_masking_rate,
-                 num_head=1, state_len=512, causal=False, dropout=0.0):
+                 num_head=1, state_len=512, causal=False, dropout=0.0, share_kv=False):
         super(Encoder, self).__init__()
         self.conv_1x1 = nn.Conv1d(input_dim, num_f_maps, 1) # fc layer
         self.layers = nn.ModuleList(
             [AttModule(2 ** i, num_f_maps, num_f_maps, state_len=state_len,
-                       num_head=num_head, stage='encoder', causal=causal, dropout=dropout, need_pass=True)
+                       num_head=num_head, stage='encoder', causal=causal, dropout=dropout, need_pass=True, share_kv=share_kv)
                        for i in range(num_layers)])
         self.conv_out = nn.Conv1d(num_f_maps, num_classes, 1)
         self.dropout = nn.Dropout2d(p=channel_masking_rate)
@@ -295,13 +306,15 @@ class BRTSegmentationHead(nn.Module):
                  dropout=0.5,
                  channel_masking_rate=0.5,
                  sample_rate=1,
+                 share_kv=False,
                  out_feature=False):
         super(BRTSegmentationHead, self).__init__()
 
         self.sample_rate = sample_rate
         self.out_feature = out_feature
         self.encoder = Encoder(encoder_num_layers, num_f_maps, input_dim, num_classes, channel_masking_rate,
-                               num_head=num_head, state_len=state_len, causal=causal, dropout=dropout)
+                               num_head=num_head, state_len=state_len, causal=causal, dropout=dropout,
+                               share_kv=share_kv)
         self.decoders = nn.ModuleList([copy.deepcopy(Decoder(decoder_num_layers, num_f_maps, num_classes, num_classes,
                                                              num_head=num_head, state_len=state_len, causal=causal, dropout=dropout))
                                                              for s in range(num_decoders)]) # num_decoders
@@ -109,12 +109,20 @@ class RotaryEmbedding(nn.Module):
         super().__init__()
         inv_freq = 1. / (10000 ** (torch.arange(0, dim, 2).float() / dim))
         self.register_buffer('inv_freq', inv_freq)
+        # (max_seq_len, offset, device, dtype) -> rotary table, tables are constant so reuse them every forward
+        self.cache = dict()
 
     def forward(self, max_seq_len, *, device, offset = 0):
+        cache_key = (max_seq_len, offset, torch.device(device), self.inv_freq.dtype)
+        if cache_key in self.cache:
+            return self.cache[cache_key]
+
         seq = torch.arange(max_seq_len, device = device) + offset
-        freqs = einsum('i , j -> i j', seq.type_as(self.inv_freq), self.inv_freq)
+        freqs = einsum('i , j -> i j', seq.type_as(self.inv_freq), self.inv_freq.to(device))
         emb = torch.cat((freqs, freqs), dim = -1)
-        return rearrange(emb, 'n d -> 1 1 n d')
+        emb = rearrange(emb, 'n d -> 1 1 n d')
+        self.cache[cache_key] = emb
+        return emb
 
 def rotate_half(x):
     x = rearrange(x, '... (j d) -> ... j d', j = 2)
@@ -13,6 +13,7 @@ import torch.nn.functional as F
 from mmcv.cnn import constant_init, kaiming_init
 
 from ...builder import HEADS
+from ....utils.ring_buffer import RingBufferMemory
 
 @HEADS.register()
 class MemoryTCNHead(nn.Module):
@@ -46,6 +47,34 @@ class MemoryTCNHead(nn.Module):
     def forward(self, x, mask):
         mask = mask[:, :, ::self.sample_rate]
         
+        outputs = self._forward_stages(x, mask)
+        if self.out_feature is True:
+            feature, outputs = outputs
+
+        outputs = F.interpolate(
+            input=outputs,
+            scale_factor=[1, self.sample_rate],
+            mode="nearest")
+        
+        if self.out_feature is True:
+            return feature, outputs
+        return outputs
+
+    def step(self, x, mask=None):
+        """
+        Incremental inference, push `k` new sampled frames x [N, D, k] and
+        return scores of these frames [num_stages, N, C, k]. Every layer is
+        causal and keeps its receptive field tail in memory, so a step only
+        costs the new frames. Call `_clear_memory_buffer` at a new video.
+        """
+        if mask is None:
+            mask = x.new_ones(x.shape[0], 1, x.shape[-1])
+        outputs = self._forward_stages(x, mask)
+        if self.out_feature is True:
+            return outputs[1]
+        return outputs
+
+    def _forward_stages(self, x, mask):
         output = self.stage1(x, mask)
 
         if self.out_feature is True:
@@ -60,12 +89,7 @@ class MemoryTCNHead(nn.Module):
             else:
                 out = s(F.softmax(out, dim=1) * mask[:, 0:1, :], mask)
             outputs = torch.cat((outputs, out.unsqueeze(0)), dim=0)
-        
-        outputs = F.interpolate(
-            input=outputs,
-            scale_factor=[1, self.sample_rate],
-            mode="nearest")
-        
+
         if self.out_feature is True:
             return feature, outputs
         return outputs
@@ -78,22 +102,20 @@ class MemoryDilationResidualLyaer(nn.Module):
         # self.norm = nn.Dropout()
         self.norm = nn.BatchNorm1d(out_channels)
         self.dilation = dilation
-        self.memory = None
+        # last dilation * 2 frames of previous windows, zeros at start of videos
+        self.memory = RingBufferMemory(self.dilation * 2, dim=2, zero_init=True)
     
     def _resert_memory(self):
-        self.memory = None
+        self.memory.reset()
     
     def _memory(self, x):
-        self.memory = x[:, :, -(self.dilation * 2):].detach().clone()
+        self.memory.update(x.detach())
 
     def overlap_same_padding(self, x):
-        if self.memory is None:
-            self.memory = torch.zeros([x.shape[0], x.shape[1], self.dilation * 2]).to(x.device)
-        
         # overlap
-        x = torch.cat([self.memory, x], dim=2)
+        pad_x = torch.cat([self.memory.read(x), x], dim=2)
         self._memory(x)
-        return x
+        return pad_x
     
     def forward(self, x, mask):
         # padding
@@ -29,6 +29,10 @@ class MultiStageModel(nn.Module):
         self.out_feature = out_feature
         self.stage1 = SingleStageModel(num_layers, num_f_maps, dim, num_classes, out_feature=out_feature)
         self.stages = nn.ModuleList([copy.deepcopy(SingleStageModel(num_layers, num_f_maps, num_classes, num_classes)) for s in range(num_stages-1)])
+        # scores of stages waiting for the last stage in step mode
+        self.step_outputs = None
+        # batch size of the last step, for the empty output of `flush`
+        self.step_batch_size = 0
 
     def init_weights(self):
         # for m in self.modules():
@@ -39,7 +43,10 @@ class MultiStageModel(nn.Module):
         pass
 
     def _clear_memory_buffer(self):
-        pass
+        self.stage1._clear_step_cache()
+        for s in self.stages:
+            s._clear_step_cache()
+        self.step_outputs = None
 
     def forward(self, x, mask):
         mask = mask[:, :, ::self.sample_rate]
@@ -68,6 +75,49 @@ class MultiStageModel(nn.Module):
             return feature, outputs
         return outputs
 
+    def step(self, x, mask=None):
+        """
+        Incremental inference of valid sampled frames x [N, D, k]. Dilated
+        layers look ahead, so a frame is scored only after the frames of its
+        receptive field arrive, the output [num_stages, N, C, k'] holds scores
+        of frames which become final in this step, in order. Call `flush` at
+        the end of video for the rest frames. Concatenated outputs equal to
+        `forward` of the whole video before interpolate. `mask` [N, C, k] is
+        the same argument as `MemoryTCNHead.step`, padding frames are not
+        supported, so it must be all ones.
+        """
+        if mask is not None:
+            assert bool(mask.all()), "MultiStageModel step only takes valid frames, call flush at the end of video"
+        self.step_batch_size = x.shape[0]
+        stage_outs = [self.stage1.step(x)]
+        for s in self.stages:
+            stage_outs.append(s.step(F.softmax(stage_outs[-1], dim=1)))
+        return self._align_stage_outputs(stage_outs)
+
+    def flush(self):
+        """
+        Zero pad the end of video, return scores of all frames not output by `step`.
+        """
+        if self.stage1.layers[0].step_cache is None:
+            # no step since the last flush or clear
+            conv_out = self.stage1.conv_out
+            return conv_out.weight.new_zeros(len(self.stages) + 1, self.step_batch_size, conv_out.out_channels, 0)
+        stage_outs = [self.stage1.flush()]
+        for s in self.stages:
+            out = s.step(F.softmax(stage_outs[-1], dim=1))
+            stage_outs.append(torch.cat([out, s.flush()], dim=2))
+        outputs = self._align_stage_outputs(stage_outs)
+        self._clear_memory_buffer()
+        return outputs
+
+    def _align_stage_outputs(self, stage_outs):
+        # early stages score frames before the last stage, keep them until it catches up
+        if self.step_outputs is not None:
+            stage_outs = [torch.cat([prev, out], dim=2) for prev, out in zip(self.step_outputs, stage_outs)]
+        num_frames = stage_outs[-1].shape[2]
+        self.step_outputs = [out[:, :, num_frames:] for out in stage_outs]
+        return torch.stack([out[:, :, :num_frames] for out in stage_outs], dim=0)
+
 @HEADS.register()
 class SingleStageModel(nn.Module):
     def __init__(self, num_layers, num_f_maps, dim, num_classes, out_feature=False):
@@ -77,6 +127,32 @@ class SingleStageModel(nn.Module):
         self.layers = nn.ModuleList([copy.deepcopy(DilatedResidualLayer(2 ** i, num_f_maps, num_f_maps)) for i in range(num_layers)])
         self.conv_out = nn.Conv1d(num_f_maps, num_classes, 1)
 
+    def _clear_step_cache(self):
+        for layer in self.layers:
+            layer._clear_step_cache()
+
+    @staticmethod
+    def _pointwise_step(conv, x):
+        # conv1d does not take zero length input, steps may output no frames
+        if x.shape[2] == 0:
+            return x.new_zeros(x.shape[0], conv.out_channels, 0)
+        return conv(x)
+
+    def step(self, x):
+        feature = self._pointwise_step(self.conv_1x1, x)
+        for layer in self.layers:
+            feature = layer.step(feature)
+        return self._pointwise_step(self.conv_out, feature)
+
+    def flush(self):
+        feature = None
+        for layer in self.layers:
+            if feature is None:
+                feature = layer.flush()
+            else:
+                feature = torch.cat([layer.step(feature), layer.flush()], dim=2)
+        return self._pointwise_step(self.conv_out, feature)
+
     def forward(self, x, mask):
         feature_embedding = self.conv_1x1(x)
         feature = feature_embedding
@@ -96,6 +172,40 @@ class DilatedResidualLayer(nn.Module):
         self.conv_1x1 = nn.Conv1d(out_channels, out_channels, 1)
         # self.norm = nn.BatchNorm1d(out_channels)
         self.norm = nn.Dropout()
+        self.dilation = dilation
+        # input frames from `dilation` before the next output frame, for step mode
+        self.step_cache = None
+        # batch size of the last step, for the empty output of `flush`
+        self.step_batch_size = 0
+
+    def _clear_step_cache(self):
+        self.step_cache = None
+
+    def step(self, x):
+        self.step_batch_size = x.shape[0]
+        # left zero padding at start of video
+        if self.step_cache is None:
+            self.step_cache = x.new_zeros(x.shape[0], x.shape[1], self.dilation)
+        pad_x = torch.cat([self.step_cache, x], dim=2)
+        # output frame t needs input frames t - dilation to t + dilation
+        num_frames = max(pad_x.shape[2] - 2 * self.dilation, 0)
+        self.step_cache = pad_x[:, :, num_frames:]
+        if num_frames == 0:
+            return pad_x[:, :, :0]
+
+        out = F.relu(F.conv1d(pad_x, self.conv_dilated.weight, self.conv_dilated.bias, dilation=self.dilation))
+        out = self.conv_1x1(out)
+        out = self.norm(out)
+        return pad_x[:, :, self.dilation:self.dilation + num_frames] + out
+
+    def flush(self):
+        # right zero padding at end of video
+        if self.step_cache is None:
+            # no step since the last flush or clear
+            return self.conv_1x1.weight.new_zeros(self.step_batch_size, self.conv_1x1.out_channels, 0)
+        out = self.step(self.step_cache.new_zeros(*self.step_cache.shape[:2], self.dilation))
+        self.step_cache = None
+        return out
 
     def forward(self, x, mask):
         out = F.relu(self.conv_dilated(x))
@@ -10,6 +10,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from ....builder import HEADS
+from .....utils.ring_buffer import RingBufferMemory
 
 from .utils.position_encoding import PositionalEmbedding, PositionwiseFF
 from .utils.attention_layer import MultiHeadAttn, RelLearnableMultiHeadAttn, RelPartialLearnableMultiHeadAttn
@@ -194,6 +195,12 @@ class TransformerXL(nn.Module):
         self._create_params()
 
         self.mems = None
+        # hidden states of previous windows kept in place, absolute embeddings
+        # add position to mems in place and ext_len keeps not the latest steps, so they concatenate
+        if mem_len > 0 and ext_len == 0 and attn_type in [0, 1]:
+            self.mem_buffers = [RingBufferMemory(mem_len, dim=0) for _ in range(n_layer + 1)]
+        else:
+            self.mem_buffers = None
 
     def _clear_memory_buffer(self):
         self.mems = self.init_mems()
@@ -220,6 +227,9 @@ class TransformerXL(nn.Module):
                     self.n_layer, self.max_klen, self.n_head, self.d_head))
 
     def init_mems(self):
+        if self.mem_buffers is not None:
+            for buffer in self.mem_buffers:
+                buffer.reset()
         if self.mem_len > 0:
             mems = []
             param = next(self.parameters())
@@ -238,6 +248,13 @@ class TransformerXL(nn.Module):
         # mems is not None
         assert len(hids) == len(mems), 'len(hids) != len(mems)'
 
+        if self.mem_buffers is not None:
+            new_mems = []
+            for buffer, hid in zip(self.mem_buffers, hids):
+                buffer.update(hid.detach())
+                new_mems.append(buffer.read(hid))
+            return new_mems
+
         # There are `mlen + qlen` steps that can be cached into mems
         # For the next step, the last `ext_len` of the `qlen` tokens
         # will be used as the extended context. Hence, we only cache
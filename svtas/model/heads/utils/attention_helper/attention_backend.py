@@ -0,0 +1,85 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-14 09:48:21
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-14 09:48:21
+Description  : pluggable scaled dot product attention backend
+FilePath     : /SVTAS/svtas/model/heads/utils/attention_helper/attention_backend.py
+'''
+import math
+import warnings
+import torch
+import torch.nn.functional as F
+
+ATTENTION_BACKENDS = ['math', 'sdpa', 'chunked']
+
+# math: layers compute attention as they are written, materialize full [L, L] scores
+# sdpa: torch.nn.functional.scaled_dot_product_attention, need torch >= 2.0
+# chunked: pure pytorch, scores of `chunk_size` queries at once, peak memory O(L * chunk_size)
+_BACKEND_CFG = dict(name='math', chunk_size=1024)
+
+def set_attention_backend(name='math', chunk_size=1024):
+    """
+    Set attention backend of attention helper layers, config as
+    `MODEL.attention_backend = dict(name='sdpa')`.
+    """
+    assert name in ATTENTION_BACKENDS, f"attention backend must be one of {ATTENTION_BACKENDS}, but got {name}"
+    if name == 'sdpa' and not hasattr(F, 'scaled_dot_product_attention'):
+        warnings.warn("scaled_dot_product_attention need torch >= 2.0, use chunked attention backend instead.")
+        name = 'chunked'
+    _BACKEND_CFG.update(name=name, chunk_size=chunk_size)
+
+def get_attention_backend():
+    return _BACKEND_CFG['name']
+
+def chunked_scaled_dot_product_attention(query, key, value, attn_mask=None, dropout_p=0.0, is_causal=False, chunk_size=1024):
+    """
+    Same arguments as `torch.nn.functional.scaled_dot_product_attention`, bool
+    `attn_mask` is True for positions take part in attention, float `attn_mask`
+    is added to scores.
+    """
+    q_len, k_len = query.shape[-2], key.shape[-2]
+    scale = math.sqrt(query.shape[-1])
+    key_t = key.transpose(-2, -1)
+    mask_per_query = attn_mask is not None and attn_mask.dim() >= 2 and attn_mask.shape[-2] > 1
+
+    outputs = []
+    for start in range(0, q_len, chunk_size):
+        end = min(start + chunk_size, q_len)
+        scores = torch.matmul(query[..., start:end, :], key_t) / scale
+        if is_causal:
+            causal_mask = torch.ones((end - start, k_len), dtype=torch.bool, device=query.device).tril(diagonal=start)
+            scores = scores.masked_fill(~causal_mask, float("-inf"))
+        if attn_mask is not None:
+            mask = attn_mask[..., start:end, :] if mask_per_query else attn_mask
+            if mask.dtype == torch.bool:
+                scores = scores.masked_fill(~mask, float("-inf"))
+            else:
+                scores = scores + mask
+        attn = F.softmax(scores, dim=-1)
+        if dropout_p > 0.0:
+            attn = F.dropout(attn, p=dropout_p)
+        outputs.append(torch.matmul(attn, value))
+    return torch.cat(outputs, dim=-2)
+
+def scaled_dot_product_attention(query, key, value, attn_mask=None, dropout_p=0.0, is_causal=False):
+    """
+    Attention by the backend set with `set_attention_backend`.
+
+    Args:
+        query: Tensor[..., L, E]
+        key: Tensor[..., S, E]
+        value: Tensor[..., S, Ev]
+        attn_mask: bool or float Tensor broadcast to [..., L, S], bool is True for positions take part in attention
+        dropout_p: float
+        is_causal: bool
+    Return:
+        Tensor[..., L, Ev]
+    """
+    name = _BACKEND_CFG['name']
+    if name == 'sdpa':
+        return F.scaled_dot_product_attention(query, key, value, attn_mask=attn_mask,
+                                              dropout_p=dropout_p, is_causal=is_causal)
+    chunk_size = _BACKEND_CFG['chunk_size'] if name == 'chunked' else query.shape[-2]
+    return chunked_scaled_dot_product_attention(query, key, value, attn_mask=attn_mask, dropout_p=dropout_p,
+                                                is_causal=is_causal, chunk_size=max(chunk_size, 1))
@@ -13,6 +13,7 @@ import torch.nn.functional as F
 from torch import einsum
 from einops import rearrange
 from .position_encoding import T5RelativePositionBias, RelativePosition
+from .attention_backend import get_attention_backend, scaled_dot_product_attention
 from ...utils import RotaryEmbedding
 from timm.models.layers import DropPath, trunc_normal_
 
@@ -418,14 +419,16 @@ class MultiHeadAttention(nn.Module):
                  dropout=0.5,
                  num_heads=1,
                  position_encoding=True,
-                 additional_mask_cfg=None):
+                 additional_mask_cfg=None,
+                 kv_proj=True):
         "Take in model size and number of heads."
         super(MultiHeadAttention, self).__init__()
         assert embed_dim % num_heads == 0
         # We assume d_v always equals d_k
         self.d_k = embed_dim // num_heads
         self.num_heads = num_heads
-        self.embed_layers = nn.ModuleList([nn.Linear(embed_dim, embed_dim) for _ in range(3)])
+        # without kv_proj, projected keys and values are given by `kv` of forward
+        self.embed_layers = nn.ModuleList([nn.Linear(embed_dim, embed_dim) for _ in range(3 if kv_proj else 1)])
         if dropout > 0.0:
             self.dropout = nn.Dropout(p=dropout)
         else:
@@ -439,6 +442,8 @@ class MultiHeadAttention(nn.Module):
             self.pos_enc = None
         
         self.additional_mask_cfg = additional_mask_cfg
+        # (query_size, key_size, device) -> additional mask
+        self._additional_mask_cache = dict()
     
     @staticmethod
     def construct_window_mask(query_size, key_size, window_size):
@@ -476,6 +481,24 @@ class MultiHeadAttention(nn.Module):
             dilation = self.additional_mask_cfg['dilation']
             return self.construct_dilated_window_mask(query_size=query_size, key_size=key_size, window_size=window_size, dilation=dilation)
 
+    def get_addtional_mask(self, query_size, key_size, device):
+        cache_key = (query_size, key_size, device)
+        if cache_key not in self._additional_mask_cache:
+            self._additional_mask_cache[cache_key] = self.generate_addtional_mask(query_size, key_size).unsqueeze(0).unsqueeze(0).to(device)
+        return self._additional_mask_cache[cache_key]
+
+    def project_kv(self, key, value):
+        """
+        Project key and value to `[N, num_heads, T, d_k]` with position encoding,
+        they can be passed as `kv` to this module and modules with the same heads.
+        """
+        batch_size = key.shape[0]
+        key, value = [l(x).view(batch_size, -1, self.num_heads, self.d_k).transpose(1, 2)
+                      for l, x in zip(self.embed_layers[1:], (key, value))]
+        if self.position_encoding:
+            key = self.pos_enc.rotate_queries_or_keys(key)
+        return key, value
+
     @staticmethod
     def attention(query, key, value, mask=None, dropout=None):
         "Compute 'Scaled Dot Product Attention'"
@@ -490,37 +513,41 @@ class MultiHeadAttention(nn.Module):
             p_attn = dropout(p_attn)
         return torch.matmul(p_attn, value), p_attn
 
-    def forward(self, query, key, value, key_padding_mask=None, attn_mask=None):
+    def forward(self, query, key, value, key_padding_mask=None, attn_mask=None, kv=None):
         batch_size = query.shape[0]
         len_q = query.shape[1]
+        len_k = kv[0].shape[2] if kv is not None else key.shape[1]
 
-        # merge key padding and attention masks
+        # key padding mask zeros padded queries after attention,
+        # attention and additional masks are broadcast to [1, 1, len_q, len_k]
         mask = None
         post_mask = None
         if key_padding_mask is not None:
             post_mask = key_padding_mask.view(batch_size, 1, len_q, 1).expand(-1, self.num_heads, -1, -1)
-            mask = torch.zeros_like(post_mask)
 
-        # convert mask to float
         if attn_mask is not None:
-            attn_mask = attn_mask.unsqueeze(0).unsqueeze(0)
-            mask = mask | attn_mask
+            mask = attn_mask.unsqueeze(0).unsqueeze(0)
 
                 # additional mask
         if self.additional_mask_cfg is not None:
-            additional_mask = self.generate_addtional_mask(query.shape[1], key.shape[1]).unsqueeze(0).unsqueeze(0).to(key.device)
-            mask = mask | additional_mask
-
-        query, key, value = [l(x) for l, x in zip(self.embed_layers, (query, key, value))] # (batch_size, seq_length, d_model), use first 3 self.linears
-        query, key, value = [x.view(batch_size, -1, self.num_heads, self.d_k).transpose(1, 2)
-                             for x in (query, key, value)] # (batch_size, h, seq_length, d_k)
+            additional_mask = self.get_addtional_mask(len_q, len_k, query.device)
+            mask = additional_mask if mask is None else mask | additional_mask
 
+        query = self.embed_layers[0](query).view(batch_size, -1, self.num_heads, self.d_k).transpose(1, 2) # (batch_size, h, seq_length, d_k)
         if self.position_encoding:
             query = self.pos_enc.rotate_queries_or_keys(query)
-            key = self.pos_enc.rotate_queries_or_keys(key)
+        if kv is not None:
+            key, value = kv
+        else:
+            key, value = self.project_kv(key, value)
 
         # 2) Apply attention on all the projected vectors in batch.
-        x, attn = self.attention(query, key, value, mask=mask, dropout=self.dropout)
+        if get_attention_backend() == 'math':
+            x, attn = self.attention(query, key, value, mask=mask, dropout=self.dropout)
+        else:
+            dropout_p = self.dropout.p if self.dropout is not None and self.training else 0.0
+            x = scaled_dot_product_attention(query, key, value, attn_mask=~mask if mask is not None else None, dropout_p=dropout_p)
+            attn = None
         if post_mask is not None:
             x = x.masked_fill(post_mask, 0.0)
 
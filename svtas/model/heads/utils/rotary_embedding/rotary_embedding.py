@@ -53,6 +53,15 @@ def apply_rotary_emb(freqs, t, start_index = 0, scale = 1.):
     t = (t * freqs.cos() * scale) + (rotate_half(t) * freqs.sin() * scale)
     return torch.cat((t_left, t, t_right), dim = -1)
 
+def apply_rotary_emb_cos_sin(cos, sin, t, start_index = 0, scale = 1.):
+    # same as `apply_rotary_emb` with precomputed `freqs.cos()` and `freqs.sin()`
+    rot_dim = cos.shape[-1]
+    end_index = start_index + rot_dim
+    assert rot_dim <= t.shape[-1], f'feature dimension {t.shape[-1]} is not of sufficient size to rotate in all the positions {rot_dim}'
+    t_left, t, t_right = t[..., :start_index], t[..., start_index:end_index], t[..., end_index:]
+    t = (t * cos * scale) + (rotate_half(t) * sin * scale)
+    return torch.cat((t_left, t, t_right), dim = -1)
+
 # learned rotation helpers
 
 def apply_learned_rotations(rotations, t, start_index = 0, freq_ranges = None):
@@ -108,6 +117,8 @@ class RotaryEmbedding(nn.Module):
 
         self.cache = dict()
         self.cache_scale = dict()
+        # (seq_len, device, dtype) -> (cos, sin), only for fixed frequencies
+        self.cache_cos_sin = dict()
         self.freqs = nn.Parameter(freqs, requires_grad = learned_freq)
 
         self.use_xpos = use_xpos
@@ -122,8 +133,16 @@ class RotaryEmbedding(nn.Module):
     def rotate_queries_or_keys(self, t, seq_dim = -2):
         assert not self.use_xpos, 'you must use `.rotate_queries_and_keys` method instead and pass in both queries and keys, for length extrapolatable rotary embeddings'
         device, seq_len = t.device, t.shape[seq_dim]
-        freqs = self.forward(lambda: torch.arange(seq_len, device = device), cache_key = seq_len)
-        return apply_rotary_emb(freqs, t)
+        if self.freqs.requires_grad:
+            freqs = self.forward(lambda: torch.arange(seq_len, device = device), cache_key = seq_len)
+            return apply_rotary_emb(freqs, t)
+
+        cache_key = (seq_len, device, t.dtype)
+        if cache_key not in self.cache_cos_sin:
+            freqs = self.forward(lambda: torch.arange(seq_len, device = device), cache_key = seq_len).to(t)
+            self.cache_cos_sin[cache_key] = (freqs.cos(), freqs.sin())
+        cos, sin = self.cache_cos_sin[cache_key]
+        return apply_rotary_emb_cos_sin(cos, sin, t)
 
     def rotate_queries_and_keys(self, q, k, seq_dim = -2):
         assert self.use_xpos
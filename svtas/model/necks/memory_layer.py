@@ -49,16 +49,18 @@ class ConvLSTMResidualLayer(nn.Module):
 
     def forward(self, x, masks):
         if self.hidden_state is None:
-            hidden = torch.zeros_like(x[:, 0, :, :, :]).to(x.device)
-            cell = torch.zeros_like(x[:, 0, :, :, :]).to(x.device)
-            self.hidden_state = [(hidden.detach().clone(), cell.detach().clone()) for l in range(self.num_layers)]
+            # states are never written in place, layers can share the zeros
+            hidden = torch.zeros_like(x[:, 0, :, :, :])
+            cell = torch.zeros_like(x[:, 0, :, :, :])
+            self.hidden_state = [(hidden, cell) for l in range(self.num_layers)]
 
         # [N T C H W]
         # memory encoder
         layer_output_list, last_state_list = self.conv_lstm(x, self.hidden_state)
 
-        # memory
-        self.hidden_state = [[last_state_list[l][i].detach().clone() for i in range(len(last_state_list[l]))] for l in range(self.num_layers)]
+        # memory, last states are new tensors of this window, so detach without copy.
+        # they can not be written in place into a RingBufferMemory, autograd saves the cell state for backward
+        self.hidden_state = [[last_state_list[l][i].detach() for i in range(len(last_state_list[l]))] for l in range(self.num_layers)]
         
         neck_feature = layer_output_list[-1]
         
@@ -9,7 +9,7 @@ FilePath     : /SVTAS/svtas/model/post_precessings/cam_post_processing.py
 import numpy as np
 import torch
 from ..builder import POSTPRECESSING
-from ...utils.stream_writer import CAMVideoStreamWriter, CAMImageStreamWriter
+from ...utils.stream_writer import CAMVideoStreamWriter, CAMImageStreamWriter, window_valid_len
 
 @POSTPRECESSING.register()
 class CAMVideoPostProcessing():
@@ -18,7 +18,10 @@ class CAMVideoPostProcessing():
                  output_frame_size,
                  fps=15,
                  ignore_index=-100,
-                 need_label=True):
+                 need_label=True,
+                 actions_dict=None,
+                 palette=None,
+                 out_path=None):
         self.init_flag = False
         self.ignore_index = ignore_index
         self.sample_rate = sample_rate
@@ -26,6 +29,10 @@ class CAMVideoPostProcessing():
         self.frame_height = output_frame_size[1]
         self.frame_width = output_frame_size[0]
         self.need_label = need_label
+        # labels drawing info and dir of videos being written, set by visual runner
+        self.actions_dict = actions_dict
+        self.palette = palette
+        self.out_path = out_path
     
     def init_scores(self):
         self.imgs_list = []
@@ -41,10 +48,15 @@ class CAMVideoPostProcessing():
         with torch.no_grad():
             pred = np.argmax(score.detach().cpu().numpy(), axis=-1)
             self.score_lsit.append(pred)
+        # cam frames are sampled by sample_rate
+        labels_np = np.asarray(labels)
+        valid_len = window_valid_len(labels_np, self.ignore_index) // self.sample_rate
         for bs in range(cam_images.shape[0]):
             if len(self.imgs_list) < (bs + 1):
-                self.imgs_list.append(CAMVideoStreamWriter(self.fps, self.frame_height, self.frame_width, need_label=self.need_label))
-            self.imgs_list[bs].stream_write(cam_images[bs])
+                self.imgs_list.append(CAMVideoStreamWriter(self.fps, self.frame_height, self.frame_width, need_label=self.need_label,
+                                                           action_dict=self.actions_dict, palette=self.palette, out_dir=self.out_path))
+            self.imgs_list[bs].stream_write(cam_images[bs], preds=pred[bs, ::self.sample_rate],
+                                            labels=labels_np[bs, ::self.sample_rate], valid_len=valid_len[bs])
 
     def output(self):
         imags_list = []
@@ -8,10 +8,10 @@ FilePath     : /SVTAS/svtas/model/post_precessings/mvs_res_post_processing.py
 '''
 import numpy as np
 import torch
-from ...utils.flow_vis import make_colorwheel
+from ...utils.flow_vis import flow_window_to_colors
 from ..builder import POSTPRECESSING
 from ...loader.transform.transform import VideoTransform
-from ...utils.stream_writer import VideoStreamWriter
+from ...utils.stream_writer import VideoStreamWriter, window_valid_len
 
 @POSTPRECESSING.register()
 class MVsResPostProcessing():
@@ -23,14 +23,16 @@ class MVsResPostProcessing():
                                       dict(DtypeToUInt8 = None)]),
                  fps=15,
                  need_visualize=False,
-                 ignore_index=-100):
+                 ignore_index=-100,
+                 out_path=None):
         self.sliding_window = sliding_window
+        # dir of videos being written, set by extract runner
+        self.out_path = out_path
         self.fps = fps
         self.need_visualize = need_visualize
         self.mvs_post_transforms = VideoTransform(mvs_post_transforms)
         self.res_post_transforms = VideoTransform(res_post_transforms)
         self.init_flag = False
-        self.colorwheel = make_colorwheel()  # shape [55x3]
         self.ignore_index = ignore_index
     
     def init_scores(self, sliding_num, batch_size):
@@ -40,8 +42,11 @@ class MVsResPostProcessing():
         self.video_gt = []
         self.init_flag = True
     
-    def _update_mvs_imgs(self, mvs_imgs):
+    def _update_mvs_imgs(self, mvs_imgs, valid_len):
         # flow_imgs [N T C H W]
+        if self.need_visualize:
+            # whole window at once, [N T H W 3] BGR
+            flows_images = flow_window_to_colors(mvs_imgs.detach(), convert_to_bgr=True)
         for bs in range(mvs_imgs.shape[0]):
             results = {}
             results['imgs'] = mvs_imgs[bs, :]
@@ -49,62 +54,36 @@ class MVsResPostProcessing():
             flows = flows.cpu().permute(0, 2, 3, 1).numpy()
             flows = np.concatenate([flows, np.zeros_like(flows[:, :, :, 0:1])], axis=-1)
             if len(self.mvs_img_list) < (bs + 1):
-                self.mvs_img_list.append(VideoStreamWriter(self.fps))
-            self.mvs_img_list[bs].stream_write(flows)
+                self.mvs_img_list.append(VideoStreamWriter(self.fps, out_dir=self.out_path))
+            self.mvs_img_list[bs].stream_write(flows, valid_len[bs])
             
             if self.need_visualize:
-                u = mvs_imgs[bs, :].cpu().permute(0, 2, 3, 1).numpy()[:, :, :, 0]
-                v = mvs_imgs[bs, :].cpu().permute(0, 2, 3, 1).numpy()[:, :, :, 1]
-                rad = np.sqrt(np.square(u) + np.square(v))
-                rad_max = np.max(rad)
-                epsilon = 1e-5
-                u = u / (rad_max + epsilon)
-                v = v / (rad_max + epsilon)
-                
-                flows_image = np.zeros((u.shape[0], u.shape[1], u.shape[2], 3), np.uint8)
-
-                ncols = self.colorwheel.shape[0]
-                rad = np.sqrt(np.square(u) + np.square(v))
-                a = np.arctan2(-v, -u)/np.pi
-                fk = (a + 1) / 2 * (ncols - 1)
-                k0 = np.floor(fk).astype(np.int32)
-                k1 = k0 + 1
-                k1[k1 == ncols] = 0
-                f = fk - k0
-                for i in range(self.colorwheel.shape[1]):
-                    tmp = self.colorwheel[:, i]
-                    col0 = tmp[k0] / 255.0
-                    col1 = tmp[k1] / 255.0
-                    col = (1 - f) * col0 + f * col1
-                    idx = (rad <= 1)
-                    col[idx]  = 1 - rad[idx] * (1-col[idx])
-                    col[~idx] = col[~idx] * 0.75   # out of range
-                    # Note the 2-i => BGR instead of RGB
-                    ch_idx = 2 - i
-                    flows_image[:, :, :, ch_idx] = np.floor(255 * col)
                 if len(self.mvs_visual_list) < (bs + 1):
-                    self.mvs_visual_list.append(VideoStreamWriter(self.fps))
-                self.mvs_img_list[bs].stream_write(flows_image)
+                    self.mvs_visual_list.append(VideoStreamWriter(self.fps, out_dir=self.out_path))
+                self.mvs_visual_list[bs].stream_write(flows_images[bs], valid_len[bs])
 
-    def _update_res_imgs(self, res_imgs):
+    def _update_res_imgs(self, res_imgs, valid_len):
         for bs in range(res_imgs.shape[0]):
             results = {}
             results['imgs'] = res_imgs[bs, :]
             res = self.res_post_transforms(results)['imgs']
             res = res.cpu().permute(0, 2, 3, 1).numpy()
             if len(self.res_img_list) < (bs + 1):
-                self.res_img_list.append(VideoStreamWriter(self.fps))
-            self.res_img_list[bs].stream_write(res)
+                self.res_img_list.append(VideoStreamWriter(self.fps, out_dir=self.out_path))
+            self.res_img_list[bs].stream_write(res, valid_len[bs])
 
     def update(self, imgs_dict, gt, idx):
         # seg_scores [stage_num N C T]
         # gt [N T]
         self.video_gt.append(gt[:, 0:self.sliding_window].detach().cpu().numpy().copy())
+        valid_len = window_valid_len(self.video_gt[-1], self.ignore_index)
         for k ,v in imgs_dict.items():
+            # only the first sliding_window frames of a window are new frames
+            v = v[:, 0:self.sliding_window]
             if k == "flows":
-                self._update_mvs_imgs(v)
+                self._update_mvs_imgs(v, valid_len)
             if k == "res":
-                self._update_res_imgs(v)
+                self._update_res_imgs(v, valid_len)
 
 
     def output(self):
@@ -8,10 +8,10 @@ FilePath     : /SVTAS/svtas/model/post_precessings/optical_flow_post_processing.
 '''
 import numpy as np
 import torch
-from ...utils.flow_vis import make_colorwheel
+from ...utils.flow_vis import flow_window_to_colors
 from ..builder import POSTPRECESSING
 from ...loader.transform.transform import VideoTransform
-from ...utils.stream_writer import VideoStreamWriter
+from ...utils.stream_writer import VideoStreamWriter, window_valid_len
 
 @POSTPRECESSING.register()
 class OpticalFlowPostProcessing():
@@ -21,13 +21,15 @@ class OpticalFlowPostProcessing():
                                             dict(ToUInt8 = None)]),
                  fps=15,
                  need_visualize=False,
-                 ignore_index=-100):
+                 ignore_index=-100,
+                 out_path=None):
         self.sliding_window = sliding_window
+        # dir of videos being written, set by extract runner
+        self.out_path = out_path
         self.fps = fps
         self.need_visualize = need_visualize
         self.post_transforms = VideoTransform(post_transforms)
         self.init_flag = False
-        self.colorwheel = make_colorwheel()  # shape [55x3]
         self.ignore_index = ignore_index
     
     def init_scores(self, sliding_num, batch_size):
@@ -40,6 +42,12 @@ class OpticalFlowPostProcessing():
         # flow_imgs [N T C H W]
         # gt [N T]
         self.video_gt.append(gt[:, 0:self.sliding_window].detach().cpu().numpy().copy())
+        valid_len = window_valid_len(self.video_gt[-1], self.ignore_index)
+        # only the first sliding_window frames of a window are new frames
+        flow_imgs = flow_imgs[:, 0:self.sliding_window]
+        if self.need_visualize:
+            # whole window at once, [N T H W 3] BGR
+            flows_images = flow_window_to_colors(flow_imgs.detach(), convert_to_bgr=True)
         for bs in range(flow_imgs.shape[0]):
             results = {}
             results['imgs'] = flow_imgs[bs, :]
@@ -47,42 +55,13 @@ class OpticalFlowPostProcessing():
             flows = flows.cpu().permute(0, 2, 3, 1).numpy()
             flows = np.concatenate([flows, np.zeros_like(flows[:, :, :, 0:1])], axis=-1)
             if len(self.flow_img_list) < (bs + 1):
-                self.flow_img_list.append(VideoStreamWriter(self.fps))
-            self.flow_img_list[bs].stream_write(flows)
+                self.flow_img_list.append(VideoStreamWriter(self.fps, out_dir=self.out_path))
+            self.flow_img_list[bs].stream_write(flows, valid_len[bs])
 
             if self.need_visualize:
-                u = flow_imgs[bs, :].cpu().permute(0, 2, 3, 1).numpy()[:, :, :, 0]
-                v = flow_imgs[bs, :].cpu().permute(0, 2, 3, 1).numpy()[:, :, :, 1]
-                rad = np.sqrt(np.square(u) + np.square(v))
-                rad_max = np.max(rad)
-                epsilon = 1e-5
-                u = u / (rad_max + epsilon)
-                v = v / (rad_max + epsilon)
-                
-                flows_image = np.zeros((u.shape[0], u.shape[1], u.shape[2], 3), np.uint8)
-
-                ncols = self.colorwheel.shape[0]
-                rad = np.sqrt(np.square(u) + np.square(v))
-                a = np.arctan2(-v, -u)/np.pi
-                fk = (a + 1) / 2 * (ncols - 1)
-                k0 = np.floor(fk).astype(np.int32)
-                k1 = k0 + 1
-                k1[k1 == ncols] = 0
-                f = fk - k0
-                for i in range(self.colorwheel.shape[1]):
-                    tmp = self.colorwheel[:, i]
-                    col0 = tmp[k0] / 255.0
-                    col1 = tmp[k1] / 255.0
-                    col = (1 - f) * col0 + f * col1
-                    idx = (rad <= 1)
-                    col[idx]  = 1 - rad[idx] * (1-col[idx])
-                    col[~idx] = col[~idx] * 0.75   # out of range
-                    # Note the 2-i => BGR instead of RGB
-                    ch_idx = 2 - i
-                    flows_image[:, :, :, ch_idx] = np.floor(255 * col)                
                 if len(self.flow_visual_list) < (bs + 1):
-                    self.flow_visual_list.append(VideoStreamWriter(self.fps))
-                self.flow_visual_list[bs].stream_write(flows_image)
+                    self.flow_visual_list.append(VideoStreamWriter(self.fps, out_dir=self.out_path))
+                self.flow_visual_list[bs].stream_write(flows_images[bs], valid_len[bs])
 
 
     def output(self):
@@ -15,33 +15,36 @@ from ...utils.stream_writer import NPYStreamWriter
 class StreamFeaturePostProcessing():
     def __init__(self,
                  sliding_window,
-                 ignore_index=-100):
+                 ignore_index=-100,
+                 out_path=None):
         self.sliding_window = sliding_window
         self.ignore_index = ignore_index
+        # dir of features being written, set by extract runner
+        self.out_path = out_path
         self.init_flag = False
     
     def init_scores(self, sliding_num, batch_size):
+        self.capacity = max(sliding_num, 1) * self.sliding_window
         self.pred_feature = []
         self.video_gt = []
         self.init_flag = True
 
+    @staticmethod
+    def _to_numpy(data):
+        if torch.is_tensor(data):
+            return data.detach().cpu().numpy()
+        return np.asarray(data)
+
     def update(self, seg_scores, gt, idx):
         # seg_scores [stage_num N C T]
         # gt [N T]
         with torch.no_grad():
-            if torch.is_tensor(seg_scores):
-                for bs in range(seg_scores.shape[1]):
-                    if len(self.pred_feature) < (bs + 1):
-                        self.pred_feature.append(NPYStreamWriter())
-                    self.pred_feature[bs].stream_write(seg_scores[-1, bs, :, 0:self.sliding_window].detach().cpu().numpy().copy())
-                self.video_gt.append(gt[:, 0:self.sliding_window].detach().cpu().numpy().copy())
-            else:
-                for bs in range(seg_scores.shape[1]):
-                    if len(self.pred_feature) < (bs + 1):
-                        self.pred_feature.append(NPYStreamWriter())
-                    self.pred_feature[bs].stream_write(seg_scores[-1, bs, :, 0:self.sliding_window].detach().cpu().numpy().copy())
-                self.video_gt.append(gt[:, 0:self.sliding_window].copy())
-
+            feature = self._to_numpy(seg_scores[-1, :, :, 0:self.sliding_window])
+            for bs in range(feature.shape[0]):
+                if len(self.pred_feature) < (bs + 1):
+                    self.pred_feature.append(NPYStreamWriter(out_dir=self.out_path, capacity=self.capacity))
+                self.pred_feature[bs].stream_write(feature[bs])
+            self.video_gt.append(self._to_numpy(gt[:, 0:self.sliding_window]).copy())
 
     def output(self):
         pred_feature_list = []
@@ -13,6 +13,10 @@ from . import refine_method
 
 @POSTPRECESSING.register()
 class StreamScorePostProcessing():
+    """
+    Write scores, labels and predictions of every sliding window in place into
+    preallocated per-step buffers, so `output` only slices the buffers.
+    """
     def __init__(self,
                  sliding_window,
                  ignore_index=-100):
@@ -22,41 +26,82 @@ class StreamScorePostProcessing():
         self.epls = 1e-10
     
     def init_scores(self, sliding_num, batch_size):
-        self.pred_scores = []
-        self.video_gt = []
+        self.capacity = max(sliding_num, 1) * self.sliding_window
+        self.write_idx = 0
+        self.pred_scores = None
+        self.video_gt = None
+        self.pred_cls = None
+        self.ignore_start = None
         self.init_flag = True
 
+    @staticmethod
+    def _to_numpy(data):
+        # one device to host copy
+        if torch.is_tensor(data):
+            return data.detach().cpu().numpy()
+        return np.asarray(data)
+
+    def _alloc_buffers(self, scores, gt):
+        self.pred_scores = np.empty(scores.shape[:2] + (self.capacity, ), dtype=scores.dtype)
+        self.video_gt = np.full((gt.shape[0], self.capacity), self.ignore_index, dtype=gt.dtype)
+        self.pred_cls = np.empty((scores.shape[0], self.capacity), dtype=np.int64)
+        self.ignore_start = np.full((gt.shape[0], ), -1, dtype=np.int64)
+
+    def _grow_buffers(self, length):
+        self.capacity = max(length, 2 * self.capacity)
+        pred_scores, video_gt, pred_cls = self.pred_scores, self.video_gt, self.pred_cls
+        self._alloc_buffers(pred_scores, video_gt)
+        self.pred_scores[:, :, :self.write_idx] = pred_scores[:, :, :self.write_idx]
+        self.video_gt[:, :self.write_idx] = video_gt[:, :self.write_idx]
+        self.pred_cls[:, :self.write_idx] = pred_cls[:, :self.write_idx]
+
+    def _write_window(self, scores, gt, pred):
+        # scores [N C T], gt [N T], pred [N T]
+        start_idx = self.write_idx
+        end_idx = start_idx + scores.shape[-1]
+        if self.pred_scores is None:
+            ignore_start = None
+            self._alloc_buffers(scores, gt)
+        elif end_idx > self.capacity:
+            ignore_start = self.ignore_start
+            self._grow_buffers(end_idx)
+            self.ignore_start = ignore_start
+        self.pred_scores[:, :, start_idx:end_idx] = scores
+        self.video_gt[:, start_idx:start_idx + gt.shape[-1]] = gt
+        self.pred_cls[:, start_idx:end_idx] = pred
+        self.write_idx = end_idx
+
+        # first ignore frame of every video
+        ignore_mask = (gt == self.ignore_index)
+        new_ignore = (self.ignore_start < 0) & ignore_mask.any(axis=1)
+        self.ignore_start[new_ignore] = start_idx + ignore_mask.argmax(axis=1)[new_ignore]
+
+    def _window_acc(self, pred, gt):
+        return np.mean((np.sum(pred == gt[:, 0:self.sliding_window], axis=1) / (np.sum(gt != self.ignore_index, axis=1) + self.epls)))
+
     def update(self, seg_scores, gt, idx):
         # seg_scores [stage_num N C T]
         # gt [N T]
         with torch.no_grad():
-            if torch.is_tensor(seg_scores):
-                self.pred_scores.append(seg_scores[-1, :, :, 0:self.sliding_window].detach().cpu().numpy().copy())
-                self.video_gt.append(gt[:, 0:self.sliding_window].detach().cpu().numpy().copy())
-                pred = np.argmax(seg_scores[-1, :, :, 0:self.sliding_window].detach().cpu().numpy(), axis=-2)
-                acc = np.mean((np.sum(pred == gt[:, 0:self.sliding_window].detach().cpu().numpy(), axis=1) / (np.sum(gt.detach().cpu().numpy() != self.ignore_index, axis=1) + self.epls)))
-            else:
-                self.pred_scores.append(seg_scores[-1, :, :, 0:self.sliding_window].copy())
-                self.video_gt.append(gt[:, 0:self.sliding_window].copy())
-                pred = np.argmax(seg_scores[-1, :, :, 0:self.sliding_window].detach().cpu().numpy(), axis=-2)
-                acc = np.mean((np.sum(pred == gt[:, 0:self.sliding_window].detach().cpu().numpy(), axis=1) / (np.sum(gt.detach().cpu().numpy() != self.ignore_index, axis=1) + self.epls)))
+            scores = self._to_numpy(seg_scores[-1, :, :, 0:self.sliding_window])
+            gt = self._to_numpy(gt)
+            pred = np.argmax(scores, axis=-2)
+            self._write_window(scores, gt[:, 0:self.sliding_window], pred)
+            acc = self._window_acc(pred, gt)
         return acc
 
     def output(self):
         pred_score_list = []
         pred_cls_list = []
         ground_truth_list = []
-        video_gt = np.concatenate(self.video_gt, axis=1)
-        pred_scores = np.concatenate(self.pred_scores, axis=2)
+        if self.pred_scores is None:
+            return pred_score_list, pred_cls_list, ground_truth_list
 
-        for bs in range(pred_scores.shape[0]):
-            index = np.where(video_gt[bs, :] == self.ignore_index)
-            ignore_start = min(list(index[0]) + [video_gt.shape[-1]])
-            predicted = np.argmax(pred_scores[bs, :, :ignore_start], axis=0)
-            predicted = predicted.squeeze()
-            pred_cls_list.append(predicted.copy())
-            pred_score_list.append(pred_scores[bs, :, :ignore_start].copy())
-            ground_truth_list.append(video_gt[bs, :ignore_start].copy())
+        ignore_start = np.where(self.ignore_start < 0, self.write_idx, self.ignore_start)
+        for bs in range(self.pred_scores.shape[0]):
+            pred_cls_list.append(self.pred_cls[bs, :ignore_start[bs]])
+            pred_score_list.append(self.pred_scores[bs, :, :ignore_start[bs]])
+            ground_truth_list.append(self.video_gt[bs, :ignore_start[bs]])
 
         return pred_score_list, pred_cls_list, ground_truth_list
 
@@ -69,39 +114,15 @@ class StreamScorePostProcessingWithRefine(StreamScorePostProcessing):
         super().__init__(sliding_window, ignore_index)
         name = refine_method_cfg.pop("name")
         self.post_process_meth = getattr(refine_method, name)(**refine_method_cfg)
-        self.pred_cls = []
-    
-    def init_scores(self, sliding_num, batch_size):
-        self.pred_cls = []
-        return super().init_scores(sliding_num, batch_size)
 
     def update(self, seg_scores, gt, idx):
         cls_scores = seg_scores['cls']
         boundary_scores = seg_scores['boundary']
         with torch.no_grad():
-            self.pred_scores.append(cls_scores[-1, :, :, 0:self.sliding_window].detach().cpu().numpy().copy())
-            self.video_gt.append(gt[:, 0:self.sliding_window].detach().cpu().numpy().copy())
-            cls_scores_np = cls_scores[-1, :, :, 0:self.sliding_window].detach().cpu().numpy().copy()
-            boundary_np = boundary_scores[-1, :, :, 0:self.sliding_window].detach().cpu().numpy().copy()
-            pred_cls = self.post_process_meth(cls_scores_np, boundary_np).detach().cpu().numpy()
-            self.pred_cls.append(pred_cls)
-            acc = np.mean((np.sum(pred_cls == gt[:, 0:self.sliding_window].detach().cpu().numpy(), axis=1) / (np.sum(gt.detach().cpu().numpy() != self.ignore_index, axis=1) + self.epls)))
+            cls_scores_np = self._to_numpy(cls_scores[-1, :, :, 0:self.sliding_window])
+            boundary_np = self._to_numpy(boundary_scores[-1, :, :, 0:self.sliding_window])
+            gt = self._to_numpy(gt)
+            pred_cls = self._to_numpy(self.post_process_meth(cls_scores_np, boundary_np))
+            self._write_window(cls_scores_np, gt[:, 0:self.sliding_window], pred_cls)
+            acc = self._window_acc(pred_cls, gt)
         return acc
-    
-    def output(self):
-        pred_score_list = []
-        pred_cls_list = []
-        ground_truth_list = []
-        video_gt = np.concatenate(self.video_gt, axis=1)
-        pred_scores = np.concatenate(self.pred_scores, axis=2)
-        pred_cls = np.concatenate(self.pred_cls, axis=1)
-
-        for bs in range(pred_scores.shape[0]):
-            index = np.where(video_gt[bs, :] == self.ignore_index)
-            ignore_start = min(list(index[0]) + [video_gt.shape[-1]])
-            predicted = pred_cls[bs, :ignore_start]
-            pred_cls_list.append(predicted.copy())
-            pred_score_list.append(pred_scores[bs, :, :ignore_start].copy())
-            ground_truth_list.append(video_gt[bs, :ignore_start].copy())
-
-        return pred_score_list, pred_cls_list, ground_truth_list
\ No newline at end of file
@@ -220,7 +220,8 @@ class LossLandSpaceRunner(ExtractModelRunner):
 class ExtractFeatureRunner(ExtractModelRunner):
 
     def init_file_dir(self):
-        pass
+        # features are written into place in out_path, save only renames them
+        self.post_processing.out_path = self.out_path
 
     def duil_will_end_extract(self, extract_output, current_vid_list):
         for extract_feature, vid in zip(extract_output, current_vid_list):
@@ -231,6 +232,8 @@ class ExtractFeatureRunner(ExtractModelRunner):
 class ExtractOpticalFlowRunner(ExtractModelRunner):
 
     def init_file_dir(self):
+        # videos are encoded into out_path, save only renames them
+        self.post_processing.out_path = self.out_path
         self.flow_out_path = os.path.join(self.out_path, "flow")
         isExists = os.path.exists(self.flow_out_path)
         if not isExists:
@@ -276,6 +279,8 @@ class ExtractMVResRunner(ExtractRunner):
         self.res_extract = res_extract
     
     def init_file_dir(self):
+        # videos are encoded into out_path, save only renames them
+        self.post_processing.out_path = self.out_path
         if self.res_extract:
             res_out_path = os.path.join(self.out_path, "res_videos")
             isExists = os.path.exists(res_out_path)
@@ -13,6 +13,7 @@ from ..utils.logger import log_batch
 from ..utils.logger import get_logger
 import numpy as np
 from .runner import Runner
+from .stream_infer_engine import LatencyRecorder
 
 class InferONNXRunner(Runner):
     def __init__(self,
@@ -38,6 +39,7 @@ class InferONNXRunner(Runner):
                          nprocs=nprocs,
                          local_rank=local_rank)
         self.runner_mode = "infer"
+        self.latency = LatencyRecorder()
     
     def epoch_init(self):
         # batch videos sampler
@@ -46,6 +48,7 @@ class InferONNXRunner(Runner):
         self.current_step_vid_list = None
 
         self.b_tic = time.time()
+        self.latency.reset()
         # reset recoder
         for _, recod in self.record_dict.items():
             recod.reset()
@@ -121,6 +124,7 @@ class InferONNXRunner(Runner):
                 input_data[key] = value.numpy()
 
         outputs = self.model.run(None, input_data)
+        outputs = dict(zip([output.name for output in self.model.get_outputs()], outputs))
         
         score = outputs['output']
             
@@ -130,6 +134,7 @@ class InferONNXRunner(Runner):
         vid_list = data_dict['vid_list']
         sliding_num = data_dict['sliding_num']
         idx = data_dict['current_sliding_cnt']
+        tic = time.time()
         # train segment
         if self.nprocs > 1 and idx < sliding_num - 1:
             # Todos: distribution infer
@@ -144,7 +149,9 @@ class InferONNXRunner(Runner):
         if self.post_processing.init_flag is not True:
             self.post_processing.init_scores(sliding_num, len(vid_list))
             self.current_step_vid_list = vid_list
-        self.post_processing.update(score, np.zeros_like(score[0, 0, 0:1, :]).astype(np.int64), idx) / sliding_num
+        self.post_processing.update(score, np.zeros_like(score[0, :, 0, :]).astype(np.int64), idx) / sliding_num
+        # windows of all videos in the batch share one forward
+        self.latency.update(time.time() - tic, num_frames=score.shape[-1] * len(vid_list))
         
     def run_one_iter(self, data, r_tic=None, epoch=None):
         # videos sliding stream train
@@ -0,0 +1,77 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-10 10:21:36
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-10 10:21:36
+Description  : asynchronous host to device data prefetcher
+FilePath     : /SVTAS/svtas/runner/prefetcher.py
+'''
+import torch
+
+
+class DataPrefetcher(object):
+    """
+    Wrap a dataloader and copy tensors of the next batch to device on a side
+    stream from pinned memory, while the current batch computes. On CPU-only
+    machines it iterates the dataloader as it is.
+
+    Args:
+        dataloader: torch.utils.data.DataLoader
+    """
+    def __init__(self, dataloader):
+        self.dataloader = dataloader
+        self.use_cuda = torch.cuda.is_available()
+        self.stream = torch.cuda.Stream() if self.use_cuda else None
+
+    @property
+    def dataset(self):
+        return self.dataloader.dataset
+
+    def __len__(self):
+        return len(self.dataloader)
+
+    def _to_device(self, data):
+        if torch.is_tensor(data):
+            if not data.is_pinned():
+                data = data.pin_memory()
+            return data.cuda(non_blocking=True)
+        elif isinstance(data, dict):
+            return {key: self._to_device(value) for key, value in data.items()}
+        elif isinstance(data, (list, tuple)):
+            return type(data)(self._to_device(value) for value in data)
+        return data
+
+    def _record_stream(self, data):
+        # memory is allocated on the side stream but used on the current stream
+        if torch.is_tensor(data):
+            data.record_stream(torch.cuda.current_stream())
+        elif isinstance(data, dict):
+            for value in data.values():
+                self._record_stream(value)
+        elif isinstance(data, (list, tuple)):
+            for value in data:
+                self._record_stream(value)
+
+    def _preload(self, loader_iter):
+        try:
+            data = next(loader_iter)
+        except StopIteration:
+            return None
+        with torch.cuda.stream(self.stream):
+            data = self._to_device(data)
+        return data
+
+    def __iter__(self):
+        if not self.use_cuda:
+            yield from self.dataloader
+            return
+
+        loader_iter = iter(self.dataloader)
+        next_data = self._preload(loader_iter)
+        while next_data is not None:
+            torch.cuda.current_stream().wait_stream(self.stream)
+            data = next_data
+            self._record_stream(data)
+            # issue copy of next batch before the current batch computes
+            next_data = self._preload(loader_iter)
+            yield data
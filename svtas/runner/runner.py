@@ -8,6 +8,7 @@ FilePath     : /SVTAS/svtas/runner/runner.py
 '''
 import torch
 import time
+import numpy as np
 from ..utils.logger import log_batch, AverageMeter, get_logger
 import torch.distributed as dist
 
@@ -22,6 +23,21 @@ def reduce_mean(tensor, nprocs):
     rt /= nprocs # NOTE this is necessary, since all_reduce here do not perform average 
     return rt
 
+def compact_labels(labels):
+    """
+    Cast integer labels to int16 when they fit, before sending them across ranks.
+    """
+    labels = np.asarray(labels)
+    if labels.size > 0 and labels.min() >= np.iinfo(np.int16).min and labels.max() <= np.iinfo(np.int16).max:
+        return labels.astype(np.int16)
+    return labels
+
+def frame_acc(pred_list, gt_list):
+    acc_list = [np.mean(np.asarray(pred) == np.asarray(gt)) for pred, gt in zip(pred_list, gt_list)]
+    if len(acc_list) == 0:
+        return 0.
+    return float(np.mean(acc_list))
+
 class Runner():
     def __init__(self,
                  logger,
@@ -132,10 +148,12 @@ class Runner():
         if self.runner_mode in ['validation', 'test']:
             # distribution                
             if self.nprocs > 1:
+                # only send scores when some metric reads them
+                need_score = any(getattr(v, 'need_score', True) for v in self.Metric.values())
                 collect_dict = dict(
-                    predict=pred_cls_list,
-                    output_np=pred_score_list,
-                    ground_truth=ground_truth_list,
+                    predict=[compact_labels(pred) for pred in pred_cls_list],
+                    output_np=pred_score_list if need_score else None,
+                    ground_truth=[compact_labels(gt) for gt in ground_truth_list],
                     vid=self.current_step_vid_list
                 )
                 gather_objects = [collect_dict for _ in range(self.nprocs)] # any picklable object
@@ -147,17 +165,22 @@ class Runner():
                 ground_truth_list_i = []
                 vid_i = []
                 for output_dict in output_list:
-                    pred_cls_list_i = pred_cls_list_i + output_dict["predict"]
-                    pred_score_list_i = pred_score_list_i + output_dict["output_np"]
-                    ground_truth_list_i = ground_truth_list_i + output_dict["ground_truth"]
+                    pred_cls_list_i = pred_cls_list_i + [pred.astype(np.int64) for pred in output_dict["predict"]]
+                    if need_score:
+                        pred_score_list_i = pred_score_list_i + output_dict["output_np"]
+                    ground_truth_list_i = ground_truth_list_i + [gt.astype(np.int64) for gt in output_dict["ground_truth"]]
                     vid_i = vid_i + output_dict["vid"]
                 outputs = dict(predict=pred_cls_list_i,
-                                output_np=pred_score_list_i)
+                                output_np=pred_score_list_i if need_score else None)
                 ground_truth_list = ground_truth_list_i
                 vid = vid_i
         
+        acc = None
         for k, v in self.Metric.items():
             acc = v.update(vid, ground_truth_list, outputs)
+        if acc is None:
+            # metrics are updated in background
+            acc = frame_acc(outputs['predict'], ground_truth_list)
 
         self.current_step_vid_list = vid_list
         if len(self.current_step_vid_list) > 0:
@@ -200,7 +223,8 @@ class Runner():
         for key, value in data_dict.items():
             if torch.is_tensor(value):
                 if torch.cuda.is_available():
-                    input_data[key] = value.cuda()
+                    # no-op when the prefetcher has moved it
+                    input_data[key] = value.cuda(non_blocking=True)
                 else:
                     input_data[key] = value
         if not self.need_grad_accumulate:
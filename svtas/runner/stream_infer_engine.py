@@ -0,0 +1,151 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-16 15:42:10
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-16 15:42:10
+Description  : multi stream batched inference engine
+FilePath     : /SVTAS/svtas/runner/stream_infer_engine.py
+'''
+import time
+import collections
+import numpy as np
+
+
+class LatencyRecorder(object):
+    """
+    Record latency of every window and report throughput and latency percentiles.
+    """
+    def __init__(self, percentiles=(50, 90, 99)):
+        self.percentiles = percentiles
+        self.reset()
+
+    def reset(self):
+        self.latency_list = []
+        self.num_frames = 0
+        self.start_time = None
+        self.end_time = None
+
+    def update(self, latency, num_frames=0):
+        now = time.time()
+        if self.start_time is None:
+            self.start_time = now - latency
+        self.end_time = now
+        self.latency_list.append(latency)
+        self.num_frames += num_frames
+
+    def summary(self):
+        info = dict(num_windows=len(self.latency_list), num_frames=self.num_frames)
+        if len(self.latency_list) <= 0:
+            return info
+        wall_time = max(self.end_time - self.start_time, 1e-10)
+        latency = np.array(self.latency_list) * 1000
+        info['windows_per_sec'] = len(self.latency_list) / wall_time
+        info['frames_per_sec'] = self.num_frames / wall_time
+        info['latency_mean_ms'] = float(latency.mean())
+        for p in self.percentiles:
+            info[f'latency_p{p}_ms'] = float(np.percentile(latency, p))
+        return info
+
+    def format(self):
+        return ", ".join([f"{k}: {v:.2f}" if isinstance(v, float) else f"{k}: {v}" for k, v in self.summary().items()])
+
+
+class StreamSlot(object):
+    def __init__(self, stream_id, windows, post_processing):
+        self.stream_id = stream_id
+        self.windows = windows
+        self.post_processing = post_processing
+
+
+class MultiStreamInferEngine(object):
+    """
+    Gather the next window of many concurrent streams into one batched
+    forward and scatter scores back to per stream post processing. Every
+    active stream holds a slot, which is its row in the batch.
+
+    A stream is an iterator of windows, a window is a dict of input ndarray
+    without batch dim, keys in `input_names`, live feeds may block in `next`.
+    Post processing of a stream is an object with `update(window, scores)`,
+    scores [num_stages, 1, C, T], and `finish()`, whose return is kept in
+    `results[stream_id]`.
+
+    Only stateless models are supported (e.g. exported ONNX models), the
+    `_clear_memory_buffer` state of memory models is shared by all batch rows
+    and can not be kept per stream. A finished stream frees its slot and a
+    waiting stream takes it in the same step.
+
+    Args:
+        forward_fn: callable, dict of batched input ndarray -> scores ndarray [num_stages, N, C, T]
+        num_slots: int, max number of streams in one batch
+        input_names: list, keys of window dict fed to `forward_fn`
+    """
+    def __init__(self,
+                 forward_fn,
+                 num_slots,
+                 input_names):
+        assert num_slots > 0, "num_slots must be positive"
+        self.forward_fn = forward_fn
+        self.num_slots = num_slots
+        self.input_names = input_names
+        self.slots = [None] * num_slots
+        self.pending = collections.deque()
+        self.results = dict()
+        self.latency = LatencyRecorder()
+
+    def add_stream(self, stream_id, windows, post_processing):
+        self.pending.append(StreamSlot(stream_id, iter(windows), post_processing))
+
+    @property
+    def num_active(self):
+        return sum([slot is not None for slot in self.slots])
+
+    def _finish_slot(self, slot_idx):
+        slot = self.slots[slot_idx]
+        self.results[slot.stream_id] = slot.post_processing.finish()
+        self.slots[slot_idx] = None
+
+    def _next_window(self, slot_idx):
+        # a finished stream frees its slot to a waiting stream at once
+        while True:
+            if self.slots[slot_idx] is None:
+                if len(self.pending) <= 0:
+                    return None
+                self.slots[slot_idx] = self.pending.popleft()
+            window = next(self.slots[slot_idx].windows, None)
+            if window is not None:
+                return window
+            self._finish_slot(slot_idx)
+
+    def _gather(self):
+        rows, windows, ready_time = [], [], []
+        for slot_idx in range(self.num_slots):
+            window = self._next_window(slot_idx)
+            if window is None:
+                continue
+            rows.append(slot_idx)
+            windows.append(window)
+            ready_time.append(time.time())
+        return rows, windows, ready_time
+
+    def step(self):
+        """
+        Run one batched forward of the next windows of all active streams,
+        return False when no stream is left.
+        """
+        rows, windows, ready_time = self._gather()
+        if len(rows) <= 0:
+            return len(self.pending) > 0 or self.num_active > 0
+
+        input_data = {key: np.stack([window[key] for window in windows], axis=0) for key in self.input_names}
+        scores = self.forward_fn(input_data)
+
+        # scatter
+        for batch_idx, (slot_idx, window) in enumerate(zip(rows, windows)):
+            self.slots[slot_idx].post_processing.update(window, scores[:, batch_idx:batch_idx + 1])
+            self.latency.update(time.time() - ready_time[batch_idx], num_frames=scores.shape[-1])
+        return True
+
+    def run(self):
+        while self.step():
+            pass
+        return self.results
@@ -120,6 +120,11 @@ class VisualRunner():
             actions_dict[int(a.split()[0])] = a.split()[1]
         self.palette = make_palette(len(actions_dict))
         self.actions_dict = actions_dict
+        # video post processing draws labels while windows arrive
+        if hasattr(self.post_processing, 'palette'):
+            self.post_processing.actions_dict = self.actions_dict
+            self.post_processing.palette = self.palette
+            self.post_processing.out_path = self.cam_imgs_out_path
     
         self.model.eval()
     
@@ -66,8 +66,8 @@ def infer(cfg,
     num_workers = cfg.DATASET.get('num_workers', 0)
     infer_num_workers = cfg.DATASET.get('infer_num_workers', num_workers)
     temporal_clip_batch_size = cfg.DATASET.get('temporal_clip_batch_size', 3)
-    video_batch_size = cfg.DATASET.get('video_batch_size', 8)
-    assert video_batch_size == 1, "Only Support video_batch_size equal to 1!"
+    # windows of `video_batch_size` videos are gathered into one batched forward
+    video_batch_size = cfg.DATASET.get('video_batch_size', 1)
     sliding_concate_fn = build_pipline(cfg.COLLATE.infer)
     infer_Pipeline = build_pipline(cfg.PIPELINE.infer)
     infer_dataset_config = cfg.DATASET.infer
@@ -141,6 +141,10 @@ def infer(cfg,
             logger.info(f'debuging {model_name} weather precision align ...')
             model.forward = MethodType(infer_forward, model)
 
+        # dynamic batch, scores are [num_stages, N, C, T]
+        dynamic_axes = {name: {0: 'batch_size'} for name in cfg.INFER.input_names}
+        dynamic_axes.update({name: {1: 'batch_size'} for name in cfg.INFER.output_names})
+
         logger.info("Start exporting ONNX model!")
         torch.onnx.export(
             model,
@@ -148,7 +152,8 @@ def infer(cfg,
             export_path,
             opset_version=cfg.INFER.infer_engine.opset_version,
             input_names=cfg.INFER.input_names,
-            output_names=cfg.INFER.output_names)
+            output_names=cfg.INFER.output_names,
+            dynamic_axes=dynamic_axes)
         logger.info("Finish exporting ONNX model to " + export_path + " !")
 
         # Debug Model
@@ -193,4 +198,5 @@ def infer(cfg,
             runner.run_one_iter(data=data, r_tic=r_tic)
         r_tic = time.time()
 
+    logger.info(f'infer throughput and latency: {runner.latency.format()}')
     logger.info(f'infering {model_name} finished')
\ No newline at end of file
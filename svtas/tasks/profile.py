@@ -22,6 +22,7 @@ from mmcv.cnn.utils.flops_counter import get_model_complexity_info
 from fvcore.nn import FlopCountAnalysis, flop_count_table
 from thop import clever_format
 from ..utils.collect_env import collect_env
+from ..utils.ring_buffer import ring_buffer_memory_nbytes
 
 @torch.no_grad()
 def profile(cfg,
@@ -175,6 +176,8 @@ def profile(cfg,
                     model_forward(batch_data)
                     prof.step()  # Need to call this at the end of each step to notify profiler of steps' boundary.
 
+    # memory of stream state kept across windows
+    logger.info("Stream memory ring buffers: {:.4f} MB".format(ring_buffer_memory_nbytes(device) / 1024 ** 2))
     model.eval()
     # mmcv caculate param and flops
     logger.info("="*20)
@@ -9,6 +9,7 @@ FilePath     : /SVTAS/svtas/tasks/test.py
 import torch
 from ..utils.logger import get_logger
 from ..runner.runner import Runner
+from ..runner.prefetcher import DataPrefetcher
 from ..utils.recorder import build_recod
 import time
 import numpy as np
@@ -18,6 +19,7 @@ from ..model.builder import build_loss
 from ..loader.builder import build_dataset
 from ..loader.builder import build_pipline
 from ..metric.builder import build_metric
+from ..metric.metric_worker import AsyncMetricWorker
 from ..model.builder import build_post_precessing
 from mmcv.cnn.utils.flops_counter import get_model_complexity_info
 from fvcore.nn import FlopCountAnalysis, flop_count_table
@@ -102,6 +104,7 @@ def test(cfg,
         build_dataset(test_dataset_config),
         batch_size=temporal_clip_batch_size,
         num_workers=test_num_workers,
+        pin_memory=torch.cuda.is_available(),
         collate_fn=sliding_concate_fn)
 
     if local_rank < 0:
@@ -126,6 +129,9 @@ def test(cfg,
     Metric = dict()
     for k, v in metric_cfg.items():
         Metric[k] = build_metric(v)
+        if cfg.get("async_metric", True):
+            # update metric in background, accumulate waits for it
+            Metric[k] = AsyncMetricWorker(Metric[k])
     
     record_dict = build_recod(cfg.MODEL.architecture, mode="validation")
 
@@ -147,7 +153,7 @@ def test(cfg,
 
     runner.epoch_init()
     r_tic = time.time()
-    for i, data in enumerate(test_dataloader):
+    for i, data in enumerate(DataPrefetcher(test_dataloader)):
         if batch_test is True:
             runner.run_one_batch(data=data, r_tic=r_tic)
         elif len(data) == temporal_clip_batch_size or len(data[0]['labels'].shape) != 0:
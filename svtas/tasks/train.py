@@ -19,11 +19,13 @@ from ..model.builder import build_loss
 from ..loader.builder import build_dataset
 from ..loader.builder import build_pipline
 from ..metric.builder import build_metric
+from ..metric.metric_worker import AsyncMetricWorker
 from ..model.builder import build_post_precessing
 from ..optimizer.builder import build_optimizer
 from ..optimizer.builder import build_lr_scheduler
 
 from ..runner.runner import Runner
+from ..runner.prefetcher import DataPrefetcher
 import warnings
 try:
     from apex import amp
@@ -108,6 +110,9 @@ def train(cfg,
     for k, v in metric_cfg.items():
         v['train_mode'] = True
         Metric[k] = build_metric(v)
+        if cfg.get("async_metric", True):
+            # update metric in background, accumulate waits for it
+            Metric[k] = AsyncMetricWorker(Metric[k])
 
     # Resume
     resume_epoch = cfg.get("resume_epoch", 0)
@@ -164,6 +169,7 @@ def train(cfg,
         build_dataset(train_dataset_config),
         batch_size=temporal_clip_batch_size,
         num_workers=num_workers,
+        pin_memory=torch.cuda.is_available(),
         collate_fn=build_pipline(cfg.COLLATE.train))
     
     if validate:
@@ -177,6 +183,7 @@ def train(cfg,
             build_dataset(val_dataset_config),
             batch_size=temporal_clip_batch_size,
             num_workers=num_workers,
+            pin_memory=torch.cuda.is_available(),
             collate_fn=build_pipline(cfg.COLLATE.test))
 
     # 6. Train Model
@@ -214,7 +221,7 @@ def train(cfg,
         # shuffle video data
         train_dataloader.dataset._viodeo_sample_shuffle()
         r_tic = time.time()
-        for i, data in enumerate(train_dataloader):
+        for i, data in enumerate(DataPrefetcher(train_dataloader)):
             if batch_train is True:
                 runner.run_one_batch(data=data, r_tic=r_tic, epoch=epoch)
             elif len(data) == temporal_clip_batch_size or len(data[0]['labels'].shape) != 0:
@@ -261,7 +268,7 @@ def train(cfg,
             # model logger init
             runner.epoch_init()
             r_tic = time.time()
-            for i, data in enumerate(val_dataloader):
+            for i, data in enumerate(DataPrefetcher(val_dataloader)):
                 if batch_test is True:
                     runner.run_one_batch(data=data, r_tic=r_tic, epoch=epoch)
                 elif len(data) == temporal_clip_batch_size or len(data[0]['labels'].shape) != 0:
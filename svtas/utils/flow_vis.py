@@ -7,6 +7,7 @@ Description  : flow visulization ref:https://github.com/ltkong218/FastFlowNet/bl
 FilePath     : /SVTAS/svtas/utils/flow_vis.py
 '''
 import numpy as np
+import torch
 
 def make_palette(num_classes):
     """
@@ -81,6 +82,8 @@ def make_colorwheel():
     colorwheel[col:col+MR, 0] = 255
     return colorwheel
 
+_COLORWHEEL = make_colorwheel()
+
 
 def flow_uv_to_colors(u, v, convert_to_bgr=False):
     """
@@ -90,15 +93,14 @@ def flow_uv_to_colors(u, v, convert_to_bgr=False):
     According to the Matlab source code of Deqing Sun
 
     Args:
-        u (np.ndarray): Input horizontal flow of shape [H,W]flo
-        v (np.ndarray): Input vertical flow of shape [H,W]
+        u (np.ndarray): Input horizontal flow of shape [...,H,W]
+        v (np.ndarray): Input vertical flow of shape [...,H,W]
         convert_to_bgr (bool, optional): Convert output image to BGR. Defaults to False.
 
     Returns:
-        np.ndarray: Flow visualization image of shape [H,W,3]
+        np.ndarray: Flow visualization image of shape [...,H,W,3]
     """
-    flow_image = np.zeros((u.shape[0], u.shape[1], 3), np.uint8)
-    colorwheel = make_colorwheel()  # shape [55x3]
+    colorwheel = _COLORWHEEL / 255.0  # shape [55x3]
     ncols = colorwheel.shape[0]
     rad = np.sqrt(np.square(u) + np.square(v))
     a = np.arctan2(-v, -u)/np.pi
@@ -107,19 +109,61 @@ def flow_uv_to_colors(u, v, convert_to_bgr=False):
     k1 = k0 + 1
     k1[k1 == ncols] = 0
     f = fk - k0
+    in_range = (rad <= 1)
+    flow_image = np.empty(u.shape + (3, ), np.uint8)
+    # shared wheel index and radius, only the gather is per channel, which
+    # is faster than one [...,H,W,3] gather on cpu
     for i in range(colorwheel.shape[1]):
-        tmp = colorwheel[:,i]
-        col0 = tmp[k0] / 255.0
-        col1 = tmp[k1] / 255.0
-        col = (1-f)*col0 + f*col1
-        idx = (rad <= 1)
-        col[idx]  = 1 - rad[idx] * (1-col[idx])
-        col[~idx] = col[~idx] * 0.75   # out of range
+        col = (1-f)*np.take(colorwheel[:, i], k0) + f*np.take(colorwheel[:, i], k1)
+        col = np.where(in_range, 1 - rad * (1-col), col * 0.75)   # out of range
         # Note the 2-i => BGR instead of RGB
         ch_idx = 2-i if convert_to_bgr else i
-        flow_image[:,:,ch_idx] = np.floor(255 * col)
+        flow_image[..., ch_idx] = np.floor(255 * col)
     return flow_image
 
+def flow_uv_to_colors_torch(u, v, convert_to_bgr=False):
+    """
+    Same as `flow_uv_to_colors` for torch.Tensor u and v on their device.
+    """
+    colorwheel = torch.as_tensor(_COLORWHEEL, dtype=u.dtype, device=u.device) / 255.0
+    ncols = colorwheel.shape[0]
+    rad = torch.sqrt(torch.square(u) + torch.square(v)).unsqueeze(-1)
+    a = torch.atan2(-v, -u)/np.pi
+    fk = (a+1) / 2*(ncols-1)
+    k0 = torch.floor(fk).long()
+    k1 = k0 + 1
+    k1[k1 == ncols] = 0
+    f = (fk - k0).unsqueeze(-1)
+    col = (1-f)*colorwheel[k0] + f*colorwheel[k1]
+    col = torch.where(rad <= 1, 1 - rad * (1-col), col * 0.75)   # out of range
+    flow_image = torch.floor(255 * col).to(torch.uint8)
+    if convert_to_bgr:
+        flow_image = flow_image.flip(-1)
+    return flow_image
+
+def flow_window_to_colors(flows, convert_to_bgr=True, epsilon=1e-5):
+    """
+    Visualize flows of a window in one call, every video is normalized by max
+    flow radius of its window. Cuda tensors are computed on their device and
+    copied to host as uint8 once, others by numpy.
+
+    Args:
+        flows (np.ndarray or torch.Tensor): shape [N,T,2,H,W]
+        convert_to_bgr (bool, optional): Convert output image to BGR. Defaults to True.
+
+    Returns:
+        np.ndarray: Flow visualization images of shape [N,T,H,W,3]
+    """
+    if torch.is_tensor(flows) and not flows.is_cuda:
+        flows = flows.detach().numpy()
+    u, v = flows[:, :, 0], flows[:, :, 1]
+    if torch.is_tensor(flows):
+        u, v = u.float(), v.float()
+        rad_max = torch.sqrt(torch.square(u) + torch.square(v)).flatten(1).max(dim=1)[0].reshape(-1, 1, 1, 1)
+        return flow_uv_to_colors_torch(u / (rad_max + epsilon), v / (rad_max + epsilon), convert_to_bgr).cpu().numpy()
+    rad_max = np.sqrt(np.square(u) + np.square(v)).reshape(u.shape[0], -1).max(axis=1).reshape(-1, 1, 1, 1)
+    return flow_uv_to_colors(u / (rad_max + epsilon), v / (rad_max + epsilon), convert_to_bgr)
+
 
 def flow_to_color(flow_uv, clip_flow=None, convert_to_bgr=False):
     """
@@ -433,4 +433,76 @@ def label_arr2img(label_queue, palette):
     img = Image.fromarray(arr)
     img = img.convert("P")
     img.putpalette(palette)
-    return img
\ No newline at end of file
+    return img
+
+
+# legend glyphs of `draw_action_label`, (text, color) -> (alpha, pixel color)
+_LEGEND_GLYPH_CACHE = dict()
+
+class LabelBarRenderer(object):
+    """
+    Render label bars of the last `label_log_len` frames and the action legend
+    on video frames as `label_arr2img` and `draw_action_label` do.
+    Colours of the whole video are looked up once, a frame only resizes its
+    slice of the colour strip, and legend glyphs are rendered once per class.
+
+    Args:
+        palette: np.ndarray [num_classes, 3] RGB palette
+        action_dict: dict, class index to action name
+        label_log_len: int, frames shown in a bar
+        bar_height: int
+    """
+    def __init__(self, palette, action_dict, label_log_len=32, bar_height=20):
+        self.action_dict = action_dict
+        self.label_log_len = label_log_len
+        self.bar_height = bar_height
+        # uint8 labels index a 256 entries palette image, missing entries are black
+        palette = np.asarray(palette, dtype=np.uint8).reshape(-1, 3)[:256]
+        self.palette = palette
+        self.bgr_palette = np.zeros((256, 3), dtype=np.uint8)
+        self.bgr_palette[:palette.shape[0]] = palette[:, ::-1]
+
+    def color_strip(self, labels):
+        """
+        BGR colours of labels of a video, [T, 3].
+        """
+        return self.bgr_palette[np.asarray(labels).astype(np.uint8)]
+
+    def bar(self, strip, count, width):
+        """
+        Bar image [bar_height, width, 3] of frames up to `count` of a colour strip.
+        """
+        window = strip[max(count + 1 - self.label_log_len, 0):(count + 1)]
+        # every row of the bar is the same, resize one row
+        row = cv2.resize(window[None], (width, 1))
+        return np.broadcast_to(row, (self.bar_height, width, 3))
+
+    def bar_width(self, count, full_width):
+        num_frames = min(count + 1, self.label_log_len)
+        return int((num_frames / self.label_log_len) * full_width)
+
+    def _legend_glyph(self, k):
+        text = self.action_dict[k]
+        color = (int(self.palette[k][2]), int(self.palette[k][1]), int(self.palette[k][0]))
+        key = (text, color)
+        if key not in _LEGEND_GLYPH_CACHE:
+            (text_width, _), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_COMPLEX, 0.25, 1)
+            canvas = np.zeros((32, 30 + text_width + 8), dtype=np.uint8)
+            canvas = cv2.rectangle(canvas, (5, 15), (25, 5), 255, thickness=-1)
+            cv2.putText(canvas, text, (30, 12), cv2.FONT_HERSHEY_COMPLEX, 0.25, 255, 1)
+            # small text may be antialiased, keep coverage as alpha
+            _LEGEND_GLYPH_CACHE[key] = (canvas[..., None].astype(np.float32) / 255, np.array(color, dtype=np.float32))
+        return _LEGEND_GLYPH_CACHE[key]
+
+    def draw_legend(self, img, label, fix_buffer=12):
+        for i, k in enumerate(label):
+            alpha, color = self._legend_glyph(k)
+            top = fix_buffer * i
+            if top >= img.shape[0]:
+                break
+            height = min(alpha.shape[0], img.shape[0] - top)
+            width = min(alpha.shape[1], img.shape[1])
+            region = img[top:(top + height), 0:width]
+            alpha = alpha[:height, :width]
+            region[:] = np.rint(region + (color - region) * alpha).astype(np.uint8)
+        return img
@@ -0,0 +1,113 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-15 10:06:33
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-15 10:06:33
+Description  : fixed capacity ring buffer memory for cross window stream state
+FilePath     : /SVTAS/svtas/utils/ring_buffer.py
+'''
+import weakref
+import torch
+
+# all alive ring buffers, for memory report
+_RING_BUFFERS = weakref.WeakSet()
+
+def ring_buffer_memory_nbytes(device=None):
+    """
+    Total bytes of allocated ring buffer memories, only on `device` if given.
+    """
+    nbytes = 0
+    for buffer in list(_RING_BUFFERS):
+        if buffer.storage is not None and (device is None or buffer.storage.device == torch.device(device)):
+            nbytes += buffer.nbytes
+    return nbytes
+
+class RingBufferMemory(object):
+    """
+    Keep the latest `capacity` steps along `dim` of a stream in preallocated
+    storage, written in place without grad. Every step is stored twice, at
+    `p` and `p + capacity`, so `read` is always one contiguous view in time
+    order. Storage is allocated by the first `read` or `update` and only again
+    when the shape of other dims, dtype or device changes.
+
+    Args:
+        capacity: int, max steps to keep
+        dim: int, time dim
+        zero_init: bool, memory is `capacity` zero steps after reset, else empty
+    """
+    def __init__(self, capacity, dim=0, zero_init=False):
+        assert capacity > 0, "capacity of ring buffer memory must be positive"
+        self.capacity = capacity
+        self.dim = dim
+        self.zero_init = zero_init
+        self.storage = None
+        self.head = 0
+        self.length = 0
+        self._need_zero = zero_init
+        _RING_BUFFERS.add(self)
+
+    @property
+    def nbytes(self):
+        if self.storage is None:
+            return 0
+        return self.storage.numel() * self.storage.element_size()
+
+    def reset(self):
+        self.head = 0
+        self.length = 0
+        self._need_zero = self.zero_init
+
+    def release(self):
+        self.storage = None
+        self.reset()
+
+    def _prepare(self, x):
+        dim = self.dim % x.dim()
+        shape = list(x.shape)
+        shape[dim] = 2 * self.capacity
+        if self.storage is None or list(self.storage.shape) != shape \
+            or self.storage.dtype != x.dtype or self.storage.device != x.device:
+            self.storage = torch.zeros(shape, dtype=x.dtype, device=x.device)
+            self.head = 0
+            self.length = 0
+            self._need_zero = self.zero_init
+            if self.zero_init:
+                self.length = self.capacity
+                self._need_zero = False
+        elif self._need_zero:
+            self.storage.zero_()
+            self.length = self.capacity
+            self._need_zero = False
+        return dim
+
+    def read(self, x):
+        """
+        Return the kept steps as a view of storage, `x` gives the shape of
+        other dims, dtype and device.
+        """
+        dim = self._prepare(x)
+        start = self.head + self.capacity - self.length
+        return self.storage.narrow(dim, start, self.length)
+
+    @torch.no_grad()
+    def update(self, x):
+        """
+        Write steps of `x` after the kept steps, the oldest steps are dropped.
+        """
+        dim = self._prepare(x)
+        steps = x.shape[dim]
+        if steps >= self.capacity:
+            x = x.narrow(dim, steps - self.capacity, self.capacity)
+            self.storage.narrow(dim, 0, self.capacity).copy_(x)
+            self.storage.narrow(dim, self.capacity, self.capacity).copy_(x)
+            self.head = 0
+            self.length = self.capacity
+            return
+
+        first_steps = min(steps, self.capacity - self.head)
+        for offset in [0, self.capacity]:
+            self.storage.narrow(dim, self.head + offset, first_steps).copy_(x.narrow(dim, 0, first_steps))
+            if steps > first_steps:
+                self.storage.narrow(dim, offset, steps - first_steps).copy_(x.narrow(dim, first_steps, steps - first_steps))
+        self.head = (self.head + steps) % self.capacity
+        self.length = min(self.length + steps, self.capacity)
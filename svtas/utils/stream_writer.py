@@ -8,12 +8,17 @@ FilePath     : /SVTAS/svtas/utils/stream_writer.py
 '''
 import tempfile
 import os
+import shutil
 import cv2
-import ffmpy
-import queue
-from .misc import label_arr2img, draw_action_label
+from .misc import label_arr2img, draw_action_label, LabelBarRenderer
 import numpy as np
-import copy
+
+def window_valid_len(gt, ignore_index=-100):
+    """
+    Number of frames before the first ignore label of every video in a window, gt [N T].
+    """
+    ignore_mask = (gt == ignore_index)
+    return np.where(ignore_mask.any(axis=1), ignore_mask.argmax(axis=1), gt.shape[1])
 
 class StreamWriter(object):
     def __init__(self):
@@ -33,151 +38,222 @@ class StreamWriter(object):
     def dump(self, path):
         pass
 
+    def _finalize(self, path):
+        """
+        Move the finished partial file `self.file_path` to `path`, it is a rename
+        when the partial file is on the same file system as `path`.
+        """
+        try:
+            os.replace(self.file_path, path)
+        except OSError:
+            # other file system
+            shutil.move(self.file_path, path)
+        self.file_path = None
+
 class NPYStreamWriter(StreamWriter):
-    def __init__(self):
-        super().__init__()
-        self.cnt = 0
-    
+    """
+    Write windows [C, T] of a stream straight into place of a preallocated
+    npy memmap, grown in chunks when `capacity` is exceeded. The array is
+    saved in fortran order, frames are contiguous, so `save` only cuts the
+    tail and renames the file, data is written once without temp files.
+
+    Args:
+        out_dir: str, dir of the partial file, system temp dir if None
+        capacity: int, preallocated frames
+    """
+    # fixed header size, so the shape can be rewritten in place
+    HEADER_SIZE = 128
+
+    def __init__(self, out_dir=None, capacity=0):
+        self.out_dir = out_dir if out_dir is not None else tempfile.gettempdir()
+        self.capacity = capacity
+        self.file_path = None
+        self.memmap = None
+        self.write_idx = 0
+
+    def _write_header(self, shape):
+        header = repr({'descr': np.lib.format.dtype_to_descr(self.dtype), 'fortran_order': True, 'shape': tuple(shape)})
+        header_len = self.HEADER_SIZE - 10
+        assert len(header) < header_len, "npy header is too long"
+        with open(self.file_path, 'r+b') as f:
+            f.write(np.lib.format.magic(1, 0))
+            f.write(header_len.to_bytes(2, 'little'))
+            f.write((header.ljust(header_len - 1) + '\n').encode('latin1'))
+            f.truncate(self.HEADER_SIZE + int(np.prod(shape)) * self.dtype.itemsize)
+
+    def _open(self, channels, capacity):
+        if self.memmap is not None:
+            self.memmap.flush()
+            self.memmap = None
+        self.capacity = capacity
+        self._write_header((channels, capacity))
+        self.memmap = np.memmap(self.file_path, dtype=self.dtype, mode='r+', offset=self.HEADER_SIZE,
+                                shape=(channels, capacity), order='F')
+
     def stream_write(self, data):
-        npy_path = os.path.join(self.tempdir.name, str(self.cnt) + '.npy')
-        self.cnt = self.cnt + 1
-        np.save(npy_path, data)
-        self.concat_file_list.append(npy_path)
-    
-    def save(self, path, len):
-        temp_npy = np.load(self.dump_tem_file)
-        temp_npy = temp_npy[:, :len]
-        np.save(path, temp_npy)
+        data = np.asarray(data)
+        start_idx = self.write_idx
+        end_idx = start_idx + data.shape[-1]
+        if self.memmap is None:
+            self.dtype = data.dtype
+            fd, self.file_path = tempfile.mkstemp(suffix='.npy.part', dir=self.out_dir)
+            os.close(fd)
+            self._open(data.shape[0], max(self.capacity, end_idx))
+        elif end_idx > self.capacity:
+            self._open(data.shape[0], max(end_idx, 2 * self.capacity))
+        self.memmap[:, start_idx:end_idx] = data
+        self.write_idx = end_idx
 
-        self.cnt = 0
-        self.tempdir.cleanup()
+    def save(self, path, len):
+        self.memmap.flush()
+        channels = self.memmap.shape[0]
+        self.memmap = None
+        self._write_header((channels, min(len, self.write_idx)))
+        self._finalize(path)
+        self.write_idx = 0
 
-    def dump(self):        
-        self.dump_tem_file = os.path.join(self.tempdir.name, 'temp.npy')
-        
-        temp = []
-        for file_npy in self.concat_file_list:
-            temp_data = np.load(file_npy, allow_pickle=True)
-            temp.append(temp_data)
-        temp = np.concatenate(temp, axis=-1)
-        np.save(self.dump_tem_file, temp)
+    def dump(self):
+        if self.memmap is not None:
+            self.memmap.flush()
 
 class VideoStreamWriter(StreamWriter):
-    def __init__(self,
-                 fps):
-        super().__init__()
+    """
+    Keep one encoder open per video, append frames of every window as they
+    arrive and stop at the end of video, so the video is encoded once without
+    temp files. The encoder writes a partial file and `save` renames it.
+
+    Args:
+        fps: int
+        out_dir: str, dir of the partial file, system temp dir if None
+    """
+    def __init__(self, fps, out_dir=None):
         self.fps = fps
+        self.out_dir = out_dir if out_dir is not None else tempfile.gettempdir()
+        self.file_path = None
+        self.video_writer = None
         self.cnt = 0
-    
-    def stream_write(self, imgs):
-        video_path = os.path.join(self.tempdir.name, str(self.cnt) + '.mp4')
-        self.cnt = self.cnt + 1
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        videoWrite = cv2.VideoWriter(video_path, fourcc, self.fps, (imgs.shape[-2], imgs.shape[-3]))
+        self.ended = False
 
+    def stream_write(self, imgs, valid_len=None):
+        """
+        Write imgs [T H W C] uint8 BGR, only the first `valid_len` frames are in
+        the video, a window with padding frames is the last one.
+        """
+        if self.ended:
+            return
+        if valid_len is not None and valid_len < imgs.shape[0]:
+            imgs = imgs[:valid_len]
+            self.ended = True
+        if imgs.shape[0] <= 0:
+            return
+        if self.video_writer is None:
+            fd, self.file_path = tempfile.mkstemp(suffix='.part.mp4', dir=self.out_dir)
+            os.close(fd)
+            fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+            self.video_writer = cv2.VideoWriter(self.file_path, fourcc, self.fps, (imgs.shape[-2], imgs.shape[-3]))
         for img in imgs:
-            videoWrite.write(img)
-        self.concat_file_list.append("file " + video_path)
-    
-    def save(self, path, len):
-        raw_video = cv2.VideoCapture(self.dump_tem_file)
-        frame_height = int(raw_video.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        frame_width = int(raw_video.get(cv2.CAP_PROP_FRAME_WIDTH))
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        videoWrite = cv2.VideoWriter(path, fourcc, self.fps, (frame_width, frame_height))
-
-        count = 0
-        while True:
-            ret, img = raw_video.read()
-            if ret:
-                videoWrite.write(img)
-                count = count + 1
-            else:
-                break
-            if count >= len:
-                break
-        videoWrite.release()
+            self.video_writer.write(img)
+        self.cnt = self.cnt + imgs.shape[0]
 
+    def save(self, path, len):
+        # frames after the end of video are never written, so `len` frames are in the file
+        assert self.cnt == len, f"VideoStreamWriter wrote {self.cnt} frames, but video has {len} frames, windows must be sliced to sliding_window frames."
+        if self.video_writer is not None:
+            self.video_writer.release()
+            self._finalize(path)
+        self.video_writer = None
         self.cnt = 0
-        self.tempdir.cleanup()
+        self.ended = False
 
     def dump(self):
-        concat_file = os.path.join(self.tempdir.name, 'concat_list.txt')
-        with open(concat_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(self.concat_file_list))
-        
-        self.dump_tem_file = os.path.join(self.tempdir.name, 'temp.mp4')
-        
-        ff = ffmpy.FFmpeg(
-            global_options=['-f', 'concat', '-safe', '0'],
-            inputs={concat_file: None},
-            outputs={self.dump_tem_file: ['-c', 'copy']}
-        )
-
-        ff.run()
+        pass
 
 class CAMVideoStreamWriter(VideoStreamWriter):
-    def __init__(self, fps, frame_height, frame_width, label_log_len=32, need_label=True):
-        super().__init__(fps)
+    """
+    Draw prediction and groundtruth label bars on CAM frames as windows arrive
+    and encode them in one pass by `VideoStreamWriter`. A bar only needs labels
+    of the last `label_log_len` frames, so only those are kept across windows.
+
+    Args:
+        fps: int
+        frame_height: int
+        frame_width: int
+        label_log_len: int, frames shown in label bars
+        need_label: bool
+        action_dict: dict, class index to action name, need by labels
+        palette: np.ndarray [num_classes, 3] RGB palette, need by labels
+        out_dir: str, dir of the partial file, system temp dir if None
+    """
+    def __init__(self, fps, frame_height, frame_width, label_log_len=32, need_label=True,
+                 action_dict=None, palette=None, out_dir=None):
+        super().__init__(fps, out_dir=out_dir)
         self.label_log_len = label_log_len
         self.frame_height = frame_height
         self.frame_width = frame_width
         self.need_label = need_label
-        
-    def save(self, path, len, labels, preds, action_dict, palette):
-        raw_video = cv2.VideoCapture(self.dump_tem_file)
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        videoWrite = cv2.VideoWriter(path, fourcc, self.fps, (self.frame_width, self.frame_height))
-        
-        pred_queue = queue.Queue(maxsize=self.label_log_len)
-        label_queue = queue.Queue(maxsize=self.label_log_len)
-        count = 0
-        while True:
-            ret, img = raw_video.read()
-            if ret:
-                img = cv2.resize(img, (self.frame_width, self.frame_height))
-                if self.need_label:
-                    # add pred and gt info
-                    cv2.putText(img, "Prediction: " + action_dict[preds[count]], (0, self.frame_height - 100), cv2.FONT_HERSHEY_COMPLEX, 0.75, (0, 255, 0), 2)
-                    cv2.putText(img, "Groundtruth: " + action_dict[labels[count]], (0, self.frame_height - 80), cv2.FONT_HERSHEY_COMPLEX, 0.75, (0, 255, 0), 2)
-                    if pred_queue.full():
-                        pred_queue.get()
-                        label_queue.get()
-                    pred_queue.put([preds[count]])
-                    label_queue.put([labels[count]])
-                    pred_img = label_arr2img(pred_queue, palette).convert('RGB')
-                    label_img = label_arr2img(label_queue, palette).convert('RGB')
-                    past_width = int((label_img.size[0] / self.label_log_len) * (self.frame_width - 40))
-                    pred_img = cv2.cvtColor(np.asarray(pred_img),cv2.COLOR_RGB2BGR)
-                    label_img = cv2.cvtColor(np.asarray(label_img),cv2.COLOR_RGB2BGR)
-                    pred_img = cv2.resize(pred_img, (past_width, 20))
-                    label_img = cv2.resize(label_img, (past_width, 20))
-                    cv2.putText(img, "Pr: ", (0, self.frame_height - 35), cv2.FONT_HERSHEY_COMPLEX, 0.5, (0, 255, 0), 1)
-                    img[(self.frame_height - 50):(self.frame_height - 30), 30:(30 + past_width), :] = pred_img
-                    cv2.putText(img, "GT: ", (0, self.frame_height - 15), cv2.FONT_HERSHEY_COMPLEX, 0.5, (0, 255, 0), 1)
-                    img[(self.frame_height - 30):(self.frame_height - 10), 30:(30 + past_width), :] = label_img
-                    # Line 1 prediction Line 2 groundtruth
-                    img = cv2.rectangle(img, (20 + past_width, self.frame_height - 10), (30 + past_width, self.frame_height - 50), (255, 255, 255), thickness=-1)
-                    cv2.line(img, (30, self.frame_height - 30), (30 + past_width, self.frame_height - 30), (255,255,255), 1)
-                    cv2.putText(img, "Current Frame", (max(past_width - 110, 0), self.frame_height - 55), cv2.FONT_HERSHEY_COMPLEX, 0.5, (0, 255, 0), 1)
+        self.action_dict = action_dict
+        if self.need_label:
+            assert action_dict is not None and palette is not None, "CAMVideoStreamWriter need action_dict and palette to draw labels"
+            self.renderer = LabelBarRenderer(palette, action_dict, label_log_len=label_log_len)
+        self.preds_tail = np.zeros([0], dtype=np.int64)
+        self.labels_tail = np.zeros([0], dtype=np.int64)
 
-                    data_pred = list(copy.deepcopy(pred_queue.queue))
-                    data_label = list(copy.deepcopy(label_queue.queue))
-                    array_pred = np.array(data_pred).transpose()
-                    array_label = np.array(data_label).transpose()
-                    label = list(set(array_pred[0, :].tolist()) | set(array_label[0, :].tolist()))
-                    img = draw_action_label(img, palette, action_dict, label)
-                
-                videoWrite.write(img)
-                count = count + 1
-            else:
-                break
-            if count >= len:
-                break
-        videoWrite.release()
+    def _draw_labels(self, img, count, idx, preds, labels, pred_strip, label_strip):
+        # count is frame index in video, idx is index of the same frame in preds and labels
+        cv2.putText(img, "Prediction: " + self.action_dict[preds[idx]], (0, self.frame_height - 100), cv2.FONT_HERSHEY_COMPLEX, 0.75, (0, 255, 0), 2)
+        cv2.putText(img, "Groundtruth: " + self.action_dict[labels[idx]], (0, self.frame_height - 80), cv2.FONT_HERSHEY_COMPLEX, 0.75, (0, 255, 0), 2)
+        past_width = self.renderer.bar_width(count, self.frame_width - 40)
+        cv2.putText(img, "Pr: ", (0, self.frame_height - 35), cv2.FONT_HERSHEY_COMPLEX, 0.5, (0, 255, 0), 1)
+        img[(self.frame_height - 50):(self.frame_height - 30), 30:(30 + past_width), :] = self.renderer.bar(pred_strip, idx, past_width)
+        cv2.putText(img, "GT: ", (0, self.frame_height - 15), cv2.FONT_HERSHEY_COMPLEX, 0.5, (0, 255, 0), 1)
+        img[(self.frame_height - 30):(self.frame_height - 10), 30:(30 + past_width), :] = self.renderer.bar(label_strip, idx, past_width)
+        # Line 1 prediction Line 2 groundtruth
+        img = cv2.rectangle(img, (20 + past_width, self.frame_height - 10), (30 + past_width, self.frame_height - 50), (255, 255, 255), thickness=-1)
+        cv2.line(img, (30, self.frame_height - 30), (30 + past_width, self.frame_height - 30), (255,255,255), 1)
+        cv2.putText(img, "Current Frame", (max(past_width - 110, 0), self.frame_height - 55), cv2.FONT_HERSHEY_COMPLEX, 0.5, (0, 255, 0), 1)
 
-        self.cnt = 0
-        self.tempdir.cleanup()
+        start = max(idx + 1 - self.label_log_len, 0)
+        label = list(set(list(preds[start:(idx + 1)])) | set(list(labels[start:(idx + 1)])))
+        return self.renderer.draw_legend(img, label)
+
+    def stream_write(self, imgs, preds=None, labels=None, valid_len=None):
+        """
+        Write CAM imgs [T H W C] uint8 BGR with preds and labels [T] of the same
+        frames, only the first `valid_len` frames are in the video.
+        """
+        if self.ended:
+            return
+        # a window with padding frames is the last one
+        last_window = valid_len is not None and valid_len < imgs.shape[0]
+        if last_window:
+            imgs = imgs[:valid_len]
+        if imgs.shape[0] > 0 and self.need_label:
+            # labels of the last label_log_len - 1 frames before this window
+            preds = np.concatenate([self.preds_tail, np.asarray(preds)[:imgs.shape[0]]])
+            labels = np.concatenate([self.labels_tail, np.asarray(labels)[:imgs.shape[0]]])
+            pred_strip = self.renderer.color_strip(preds)
+            label_strip = self.renderer.color_strip(labels)
+            offset = self.cnt - self.preds_tail.shape[0]
+            keep_len = min(self.label_log_len - 1, preds.shape[0])
+            self.preds_tail = preds[(preds.shape[0] - keep_len):]
+            self.labels_tail = labels[(labels.shape[0] - keep_len):]
+
+        frames = []
+        for i, img in enumerate(imgs):
+            img = cv2.resize(img, (self.frame_width, self.frame_height))
+            if self.need_label:
+                count = self.cnt + i
+                img = self._draw_labels(img, count, count - offset, preds, labels, pred_strip, label_strip)
+            frames.append(img)
+        if len(frames) > 0:
+            super().stream_write(np.stack(frames, axis=0))
+        self.ended = last_window
+
+    def save(self, path, len, labels=None, preds=None, action_dict=None, palette=None):
+        # labels are drawn in `stream_write`, same arguments as `CAMImageStreamWriter.save`
+        super().save(path, len)
+        self.preds_tail = np.zeros([0], dtype=np.int64)
+        self.labels_tail = np.zeros([0], dtype=np.int64)
 
 class ImageStreamWriter(StreamWriter):
     def __init__(self, need_split=False):
@@ -0,0 +1,75 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-17 14:26:05
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-17 14:26:05
+Description  : Test scatter order and slot reuse of multi stream inference engine
+FilePath     : /SVTAS/tests/test_cases/test_stream_infer_engine.py
+'''
+import numpy as np
+from svtas.runner.stream_infer_engine import MultiStreamInferEngine
+
+class RecordPostProcessing:
+    def __init__(self):
+        self.scores = []
+
+    def update(self, window, scores):
+        self.scores.append(scores)
+
+    def finish(self):
+        return self.scores
+
+class TestStreamInferEngine:
+    num_classes = 3
+    window_len = 4
+
+    def build_windows(self, stream_id, num_windows):
+        # every frame of a window is stream_id * 100 + window_idx
+        return [dict(input_data=np.full((self.window_len, ), stream_id * 100 + i, dtype=np.float32),
+                     masks=np.ones((self.window_len, ), dtype=np.float32)) for i in range(num_windows)]
+
+    def build_engine(self, num_slots):
+        self.batch_sizes = []
+        def forward_fn(input_data):
+            # scores [num_stages, N, C, T], every class is the input of its row
+            x = input_data['input_data']
+            self.batch_sizes.append(x.shape[0])
+            return np.broadcast_to(x[None, :, None, :], (2, x.shape[0], self.num_classes, x.shape[1])).copy()
+        return MultiStreamInferEngine(forward_fn, num_slots, input_names=['input_data', 'masks'])
+
+    def test_scatter_order(self):
+        engine = self.build_engine(num_slots=3)
+        num_windows = {0: 2, 1: 5, 2: 3}
+        for stream_id, n in num_windows.items():
+            engine.add_stream(stream_id, self.build_windows(stream_id, n), RecordPostProcessing())
+        results = engine.run()
+
+        assert set(results.keys()) == set(num_windows.keys())
+        for stream_id, n in num_windows.items():
+            assert len(results[stream_id]) == n
+            for i, scores in enumerate(results[stream_id]):
+                assert scores.shape == (2, 1, self.num_classes, self.window_len)
+                assert np.all(scores == stream_id * 100 + i)
+        # finished streams do not take part in later batches
+        assert self.batch_sizes == [3, 3, 2, 1, 1]
+
+    def test_slot_reuse(self):
+        engine = self.build_engine(num_slots=2)
+        num_windows = {0: 1, 1: 4, 2: 2, 3: 1}
+        for stream_id, n in num_windows.items():
+            engine.add_stream(stream_id, self.build_windows(stream_id, n), RecordPostProcessing())
+
+        slots_trace = []
+        while engine.step():
+            slots_trace.append([None if slot is None else slot.stream_id for slot in engine.slots])
+        results = engine.results
+
+        # stream 2 takes the slot of stream 0 while stream 1 is still running
+        assert slots_trace[0] == [0, 1]
+        assert slots_trace[1] == [2, 1]
+        assert [2, 1] in slots_trace and [3, 1] in slots_trace
+        for stream_id, n in num_windows.items():
+            assert len(results[stream_id]) == n
+            for i, scores in enumerate(results[stream_id]):
+                assert np.all(scores == stream_id * 100 + i)
+        assert engine.num_active == 0 and len(engine.pending) == 0
@@ -0,0 +1,230 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-11 10:32:17
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-11 10:32:17
+Description  : Regression test of vectorized TAS metric against the loop implementation
+FilePath     : /SVTAS/tests/test_cases/test_tas_metric.py
+'''
+import os
+import tempfile
+import numpy as np
+from svtas.metric.tas import tas_metric_utils
+from svtas.metric.tas import TASegmentationMetric
+
+ignore_bg_class = ["background", "None"]
+
+# reference loop implementation
+def ref_get_labels_scores_start_end_time(input_np,
+                                         frame_wise_labels,
+                                         actions_dict,
+                                         bg_class=ignore_bg_class):
+    labels = []
+    starts = []
+    ends = []
+    scores = []
+
+    boundary_score_ptr = 0
+
+    last_label = frame_wise_labels[0]
+    if frame_wise_labels[0] not in bg_class:
+        labels.append(frame_wise_labels[0])
+        starts.append(0)
+    for i in range(len(frame_wise_labels)):
+        if frame_wise_labels[i] != last_label:
+            if frame_wise_labels[i] not in bg_class:
+                labels.append(frame_wise_labels[i])
+                starts.append(i)
+            if last_label not in bg_class:
+                ends.append(i)
+                score = np.mean(
+                        input_np[actions_dict[labels[boundary_score_ptr]], \
+                            starts[boundary_score_ptr]:(ends[boundary_score_ptr] + 1)]
+                        )
+                scores.append(score)
+                boundary_score_ptr = boundary_score_ptr + 1
+            last_label = frame_wise_labels[i]
+    if last_label not in bg_class:
+        ends.append(i + 1)
+        score = np.mean(
+                    input_np[actions_dict[labels[boundary_score_ptr]], \
+                        starts[boundary_score_ptr]:(ends[boundary_score_ptr] + 1)]
+                    )
+        scores.append(score)
+        boundary_score_ptr = boundary_score_ptr + 1
+
+    return labels, starts, ends, scores
+
+def ref_get_labels_start_end_time(frame_wise_labels, bg_class=ignore_bg_class):
+    labels = []
+    starts = []
+    ends = []
+    last_label = frame_wise_labels[0]
+    if frame_wise_labels[0] not in bg_class:
+        labels.append(frame_wise_labels[0])
+        starts.append(0)
+    for i in range(len(frame_wise_labels)):
+        if frame_wise_labels[i] != last_label:
+            if frame_wise_labels[i] not in bg_class:
+                labels.append(frame_wise_labels[i])
+                starts.append(i)
+            if last_label not in bg_class:
+                ends.append(i)
+            last_label = frame_wise_labels[i]
+    if last_label not in bg_class:
+        ends.append(i + 1)
+    return labels, starts, ends
+
+def ref_levenstein(p, y, norm=False):
+    m_row = len(p)
+    n_col = len(y)
+    D = np.zeros([m_row + 1, n_col + 1])
+    for i in range(m_row + 1):
+        D[i, 0] = i
+    for i in range(n_col + 1):
+        D[0, i] = i
+
+    for j in range(1, n_col + 1):
+        for i in range(1, m_row + 1):
+            if y[j - 1] == p[i - 1]:
+                D[i, j] = D[i - 1, j - 1]
+            else:
+                D[i, j] = min(D[i - 1, j] + 1, D[i, j - 1] + 1,
+                              D[i - 1, j - 1] + 1)
+
+    if norm:
+        score = (1 - D[-1, -1] / (max(m_row, n_col) + 1e-6)) * 100
+    else:
+        score = D[-1, -1]
+
+    return score
+
+def ref_edit_score(recognized, ground_truth, norm=True, bg_class=ignore_bg_class):
+    P, _, _ = ref_get_labels_start_end_time(recognized, bg_class)
+    Y, _, _ = ref_get_labels_start_end_time(ground_truth, bg_class)
+    return ref_levenstein(P, Y, norm)
+
+def ref_f_score(recognized, ground_truth, overlap, bg_class=ignore_bg_class):
+    p_label, p_start, p_end = ref_get_labels_start_end_time(recognized, bg_class)
+    y_label, y_start, y_end = ref_get_labels_start_end_time(ground_truth, bg_class)
+
+    tp = 0
+    fp = 0
+    if len(y_label) > 0:
+        hits = np.zeros(len(y_label))
+
+        for j in range(len(p_label)):
+            intersection = np.minimum(p_end[j], y_end) - np.maximum(
+                p_start[j], y_start)
+            union = np.maximum(p_end[j], y_end) - np.minimum(
+                p_start[j], y_start)
+            IoU = (1.0 * intersection / union) * (
+                [p_label[j] == y_label[x] for x in range(len(y_label))])
+            # Get the best scoring segment
+            idx = np.array(IoU).argmax()
+
+            if IoU[idx] >= overlap and not hits[idx]:
+                tp += 1
+                hits[idx] = 1
+            else:
+                fp += 1
+        fn = len(y_label) - sum(hits)
+    else:
+        if len(p_label) < 1:
+            tp = 1
+            fn = 0
+        else:
+            fn = 0
+    return float(tp), float(fp), float(fn)
+
+class TestTASMetric:
+    class_names = ["background", "take", "open", "pour", "close", "None"]
+    overlap = [.1, .25, .5]
+
+    def genrate_labels(self, rng, num_frames, num_segments):
+        # piecewise constant labels with some noisy short segments
+        bounds = np.sort(rng.choice(np.arange(1, num_frames), size=num_segments - 1, replace=False))
+        labels = np.zeros(num_frames, dtype=np.int64)
+        for seg_idx, (start, end) in enumerate(zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [num_frames]]))):
+            labels[start:end] = rng.integers(0, len(self.class_names))
+        return labels
+
+    def genrate_pair(self, seed, num_frames=300):
+        rng = np.random.default_rng(seed)
+        gt = self.genrate_labels(rng, num_frames, int(rng.integers(1, 12)))
+        pred = gt.copy()
+        noise = rng.random(num_frames) < rng.random() * 0.2
+        pred[noise] = rng.integers(0, len(self.class_names), size=int(noise.sum()))
+        return pred, gt
+
+    def test_segments(self):
+        names = np.array(self.class_names)
+        for seed in range(100):
+            pred, gt = self.genrate_pair(seed)
+            for labels in [pred, gt]:
+                str_labels = list(names[labels])
+                assert tas_metric_utils.get_labels_start_end_time(str_labels) == \
+                    ref_get_labels_start_end_time(str_labels)
+                scores = np.random.default_rng(seed).random((len(self.class_names), len(labels)))
+                actions_dict = dict((name, idx) for idx, name in enumerate(self.class_names))
+                assert tas_metric_utils.get_labels_scores_start_end_time(scores, str_labels, actions_dict) == \
+                    ref_get_labels_scores_start_end_time(scores, str_labels, actions_dict)
+
+    def test_edit_and_f_score(self):
+        names = np.array(self.class_names)
+        for seed in range(100):
+            pred, gt = self.genrate_pair(seed)
+            pred, gt = list(names[pred]), list(names[gt])
+            for norm in [True, False]:
+                assert tas_metric_utils.edit_score(pred, gt, norm=norm) == ref_edit_score(pred, gt, norm=norm)
+            for overlap in self.overlap:
+                assert tas_metric_utils.f_score(pred, gt, overlap) == ref_f_score(pred, gt, overlap)
+
+    def test_levenstein(self):
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            p = list(rng.integers(0, 4, size=int(rng.integers(0, 20))))
+            y = list(rng.integers(0, 4, size=int(rng.integers(0, 20))))
+            assert tas_metric_utils.levenstein(p, y, norm=True) == ref_levenstein(p, y, norm=True)
+            assert tas_metric_utils.levenstein(p, y, norm=False) == ref_levenstein(p, y, norm=False)
+
+    def test_metric(self):
+        tempdir = tempfile.TemporaryDirectory()
+        actions_map_file_path = os.path.join(tempdir.name, 'mapping.txt')
+        with open(actions_map_file_path, 'w') as f:
+            f.writelines(["{:d} {}\n".format(idx, name) for idx, name in enumerate(self.class_names)])
+        metric = TASegmentationMetric(overlap=self.overlap,
+                                      actions_map_file_path=actions_map_file_path,
+                                      train_mode=True)
+
+        names = np.array(self.class_names)
+        ref_tp, ref_fp, ref_fn = np.zeros(3), np.zeros(3), np.zeros(3)
+        ref_correct, ref_frame, ref_edit = 0, 0, 0
+        for seed in range(20):
+            pred_batch, gt_batch, score_batch = [], [], []
+            for bs in range(2):
+                pred, gt = self.genrate_pair(seed * 2 + bs)
+                pred_batch.append(pred)
+                gt_batch.append(gt)
+                score_batch.append(np.random.default_rng(seed).random((len(self.class_names), len(gt))))
+
+                str_pred, str_gt = list(names[pred]), list(names[gt])
+                ref_correct += sum([p == g for p, g in zip(str_pred, str_gt)])
+                ref_frame += len(str_gt)
+                ref_edit += ref_edit_score(str_pred, str_gt)
+                for s, overlap in enumerate(self.overlap):
+                    tp, fp, fn = ref_f_score(str_pred, str_gt, overlap)
+                    ref_tp[s] += tp
+                    ref_fp[s] += fp
+                    ref_fn[s] += fn
+            metric.update(["vid_{:d}".format(bs) for bs in range(2)], gt_batch,
+                          dict(predict=pred_batch, output_np=score_batch))
+
+        metric_dict = metric._compute_metrics()
+        assert metric_dict['Acc'] == 100 * float(ref_correct) / (ref_frame + metric.elps)
+        assert metric_dict['Edit'] == (1.0 * ref_edit) / (40 + metric.elps)
+        for s, overlap in enumerate(self.overlap):
+            precision = ref_tp[s] / float(ref_tp[s] + ref_fp[s] + metric.elps)
+            recall = ref_tp[s] / float(ref_tp[s] + ref_fn[s] + metric.elps)
+            f1 = np.nan_to_num(2.0 * (precision * recall) / (precision + recall + metric.elps)) * 100
+            assert metric_dict['F1@{:0.2f}'.format(overlap)] == f1
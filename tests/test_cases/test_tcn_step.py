@@ -0,0 +1,85 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-16 10:21:37
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-16 10:21:37
+Description  : Regression test of incremental step inference against full window forward of TCN heads
+FilePath     : /SVTAS/tests/test_cases/test_tcn_step.py
+'''
+import torch
+from svtas.model.heads.tas.mstcn import MultiStageModel
+from svtas.model.heads.tas.memory_tcn import MemoryTCNHead
+
+class TestTCNStep:
+    num_frames = 100
+    step_sizes = [1, 3, 7, 16, 100]
+
+    def build_input(self, dim, seed=0):
+        generator = torch.Generator().manual_seed(seed)
+        return torch.randn(2, dim, self.num_frames, generator=generator)
+
+    def split(self, x, step_size):
+        return torch.split(x, step_size, dim=2)
+
+    @torch.no_grad()
+    def test_mstcn_step(self):
+        torch.manual_seed(0)
+        model = MultiStageModel(num_stages=3, num_layers=4, num_f_maps=16, dim=32, num_classes=5).eval()
+        x = self.build_input(32)
+        mask = torch.ones(2, 5, self.num_frames)
+        ref = model(x, mask)
+
+        for step_size in self.step_sizes:
+            model._clear_memory_buffer()
+            outputs = [model.step(x_step) for x_step in self.split(x, step_size)]
+            outputs.append(model.flush())
+            outputs = torch.cat(outputs, dim=-1)
+            assert outputs.shape == ref.shape
+            assert torch.allclose(outputs, ref, atol=1e-5)
+
+    @torch.no_grad()
+    def test_mstcn_step_latency(self):
+        torch.manual_seed(0)
+        num_layers = 4
+        model = MultiStageModel(num_stages=2, num_layers=num_layers, num_f_maps=16, dim=32, num_classes=5).eval()
+        x = self.build_input(32)
+        # frame t of a stage is final after its receptive field t + 2 ** num_layers - 1 arrives
+        latency = 2 * (2 ** num_layers - 1)
+        num_outputs = 0
+        for i, x_step in enumerate(self.split(x, 1)):
+            num_outputs += model.step(x_step).shape[-1]
+            assert num_outputs == max(i + 1 - latency, 0)
+        assert model.flush().shape[-1] == min(latency, self.num_frames)
+
+    @torch.no_grad()
+    def test_mstcn_empty_flush(self):
+        torch.manual_seed(0)
+        model = MultiStageModel(num_stages=3, num_layers=4, num_f_maps=16, dim=32, num_classes=5).eval()
+        # empty stream
+        model._clear_memory_buffer()
+        assert model.flush().shape == (3, 0, 5, 0)
+
+        x = self.build_input(32)
+        mask = torch.ones(2, 5, self.num_frames)
+        outputs = torch.cat([model.step(x, mask), model.flush()], dim=-1)
+        assert torch.allclose(outputs, model(x, mask), atol=1e-5)
+        # second flush of the same stream
+        assert model.flush().shape == (3, 2, 5, 0)
+
+    @torch.no_grad()
+    def test_memory_tcn_step(self):
+        torch.manual_seed(0)
+        model = MemoryTCNHead(num_stages=3, num_layers=4, num_f_maps=16, dim=32, num_classes=5).eval()
+        x = self.build_input(32)
+        mask = torch.ones(2, 5, self.num_frames)
+        model._clear_memory_buffer()
+        ref = model(x, mask)
+
+        for step_size in self.step_sizes:
+            model._clear_memory_buffer()
+            outputs = [model.step(x_step) for x_step in self.split(x, step_size)]
+            for out, x_step in zip(outputs, self.split(x, step_size)):
+                assert out.shape[-1] == x_step.shape[-1]
+            outputs = torch.cat(outputs, dim=-1)
+            assert outputs.shape == ref.shape
+            assert torch.allclose(outputs, ref, atol=1e-5)
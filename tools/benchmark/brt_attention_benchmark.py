@@ -0,0 +1,96 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-13 10:12:45
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-13 10:12:45
+Description  : benchmark recurrent attention of block recurrent transformer segmentation head
+FilePath     : /SVTAS/tools/benchmark/brt_attention_benchmark.py
+'''
+import os
+import sys
+path = os.path.join(os.getcwd())
+sys.path.append(path)
+import time
+import argparse
+import numpy as np
+import torch
+from svtas.model.heads.tas.block_recurrent_transformer.brt_segmenter import BRTSegmentationHead
+
+def clear_cache(model):
+    # drop rotary tables and window masks, so every forward builds them as before caching
+    for module in model.modules():
+        for name in ['_additional_mask_cache', 'cache', 'cache_cos_sin']:
+            cache = getattr(module, name, None)
+            if isinstance(cache, dict):
+                cache.clear()
+
+def forward_time(model, x, mask, device, no_cache=False):
+    if no_cache:
+        clear_cache(model)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    model(x, mask)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    return time.perf_counter() - start
+
+def main():
+    args = get_arguments()
+    device = torch.device(args.device)
+    model_cfg = dict(num_head=1,
+                     state_len=args.state_len,
+                     num_decoders=3,
+                     encoder_num_layers=10,
+                     decoder_num_layers=10,
+                     num_f_maps=64,
+                     input_dim=args.input_dim,
+                     num_classes=args.num_classes,
+                     dropout=0.5,
+                     channel_masking_rate=0.5)
+
+    torch.manual_seed(0)
+    model = BRTSegmentationHead(**model_cfg).to(device).eval()
+    shared_model = BRTSegmentationHead(share_kv=True, **model_cfg).to(device).eval()
+    cases = [
+        ["separate kv, no cache", model, True],
+        ["separate kv, cached", model, False],
+        ["shared kv, cached", shared_model, False]
+    ]
+
+    x = torch.randn(args.batch_size, args.input_dim, args.clip_seg_num, device=device)
+    mask = torch.ones(args.batch_size, args.num_classes, args.clip_seg_num, device=device)
+    cost_time = [[] for _ in cases]
+    with torch.no_grad():
+        for i in range(args.warmup + args.repeat):
+            # interleave cases, so they see the same machine load
+            for case_idx, (_, m, no_cache) in enumerate(cases):
+                t = forward_time(m, x, mask, device, no_cache=no_cache)
+                if i >= args.warmup:
+                    cost_time[case_idx].append(t)
+
+    print("BRTSegmentationHead state_len: {:d}, clip_seg_num: {:d}, batch_size: {:d}, device: {}".format(
+        args.state_len, args.clip_seg_num, args.batch_size, device))
+    for (name, m, _), t in zip(cases, cost_time):
+        params = sum(p.numel() for p in m.parameters())
+        print("{:24s}: {:8.2f} ms per step (median), {:.2f} M params".format(name, float(np.median(t)) * 1000, params / 1e6))
+
+def get_arguments():
+    """
+    parse all the arguments from command line inteface
+    return a list of parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="benchmark recurrent attention of BRTSegmentationHead")
+    parser.add_argument("--state_len", type=int, default=512)
+    parser.add_argument("--clip_seg_num", type=int, default=128)
+    parser.add_argument("--batch_size", type=int, default=1)
+    parser.add_argument("--input_dim", type=int, default=2048)
+    parser.add_argument("--num_classes", type=int, default=11)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-10 16:42:18
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-10 16:42:18
+Description  : benchmark bytes copied and time of stream dataset clip assembly
+FilePath     : /SVTAS/tools/benchmark/clip_assembly_benchmark.py
+'''
+import os
+import sys
+path = os.path.join(os.getcwd())
+sys.path.append(path)
+import copy
+import time
+import argparse
+import numpy as np
+import torch
+from svtas.loader.dataset.stream_base_dataset.raw_frame_stream_segmentation_dataset import RawFrameStreamSegmentationDataset
+
+class RandomClipPipeline(object):
+    def __init__(self, clip_seg_num, sliding_window, height, width):
+        self.clip_seg_num = clip_seg_num
+        self.sliding_window = sliding_window
+        self.height = height
+        self.width = width
+
+    def __call__(self, results):
+        results['imgs'] = torch.randn(self.clip_seg_num, 3, self.height, self.width)
+        results['labels'] = np.zeros(self.sliding_window, dtype=np.int64)
+        results['masks'] = np.ones(self.sliding_window, dtype=np.float32)
+        return results
+
+def old_videos_clip(pipeline, idx, info):
+    # clip assembly before preallocated batch buffer, return bytes copied
+    copied_bytes = 0
+    imgs_list = []
+    labels_list = []
+    masks_list = []
+    vid_list = []
+    precise_sliding_num_list = []
+    for single_info in info:
+        sample_segment = single_info.copy()
+        sample_segment['sample_sliding_idx'] = idx
+        sample_segment = pipeline(sample_segment)
+        imgs_list.append(copy.deepcopy(sample_segment['imgs'].unsqueeze(0)))
+        copied_bytes += sample_segment['imgs'].numel() * sample_segment['imgs'].element_size()
+        labels_list.append(np.expand_dims(sample_segment['labels'], axis=0).copy())
+        masks_list.append(np.expand_dims(sample_segment['masks'], axis=0).copy())
+        vid_list.append(copy.deepcopy(sample_segment['video_name']))
+        precise_sliding_num_list.append(np.expand_dims(sample_segment['precise_sliding_num'], axis=0).copy())
+
+    imgs = copy.deepcopy(torch.concat(imgs_list, dim=0))
+    # concat and deepcopy
+    copied_bytes += 2 * imgs.numel() * imgs.element_size()
+    labels = copy.deepcopy(np.concatenate(labels_list, axis=0).astype(np.int64))
+    masks = copy.deepcopy(np.concatenate(masks_list, axis=0).astype(np.float32))
+    precise_sliding_num = copy.deepcopy(np.concatenate(precise_sliding_num_list, axis=0).astype(np.float32))
+    # tensor out of shared memory is copied when sent from dataloader worker
+    copied_bytes += imgs.numel() * imgs.element_size()
+    return dict(imgs=imgs, labels=labels, masks=masks, precise_sliding_num=precise_sliding_num, vid_list=vid_list), copied_bytes
+
+def new_videos_clip(dataset, idx, info):
+    data_dict = dataset._compose_videos_clip(idx, info, tensor_keys=['imgs'])
+    # every sample is written once into batch buffer
+    imgs = data_dict['imgs']
+    copied_bytes = imgs.numel() * imgs.element_size()
+    if not imgs.is_shared():
+        copied_bytes += imgs.numel() * imgs.element_size()
+    return data_dict, copied_bytes
+
+def benchmark(fn, repeat):
+    copied_bytes = 0
+    start = time.perf_counter()
+    for i in range(repeat):
+        _, copied_bytes = fn(i)
+    return (time.perf_counter() - start) / repeat, copied_bytes
+
+def main():
+    args = get_arguments()
+    pipeline = RandomClipPipeline(args.clip_seg_num, args.sliding_window, args.height, args.width)
+    info = [dict(video_name="video_{:d}".format(i), precise_sliding_num=1) for i in range(args.video_batch_size)]
+
+    dataset = RawFrameStreamSegmentationDataset.__new__(RawFrameStreamSegmentationDataset)
+    dataset.pipeline = pipeline
+    # every window is sampled from the pipeline, no padding window is reused
+    dataset._padding_sample_dict = {}
+    dataset.skip_padding_window = False
+
+    old_time, old_bytes = benchmark(lambda i: old_videos_clip(pipeline, i, info), args.repeat)
+    new_time, new_bytes = benchmark(lambda i: new_videos_clip(dataset, i, info), args.repeat)
+
+    clip_shape = [args.video_batch_size, args.clip_seg_num, 3, args.height, args.width]
+    print("clip shape: {}".format(clip_shape))
+    print("before: {:.2f} MB copied per clip, {:.2f} ms per clip".format(old_bytes / 1024 ** 2, old_time * 1000))
+    print("after : {:.2f} MB copied per clip, {:.2f} ms per clip".format(new_bytes / 1024 ** 2, new_time * 1000))
+    print("note: in dataloader workers the batch buffer is allocated in shared memory, "
+          "run here in main process it is counted as one more copy.")
+
+def get_arguments():
+    """
+    parse all the arguments from command line inteface
+    return a list of parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="benchmark stream dataset clip assembly")
+    parser.add_argument("--video_batch_size", type=int, default=2)
+    parser.add_argument("--clip_seg_num", type=int, default=32)
+    parser.add_argument("--sliding_window", type=int, default=64)
+    parser.add_argument("--height", type=int, default=224)
+    parser.add_argument("--width", type=int, default=224)
+    parser.add_argument("--repeat", type=int, default=10)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+'''
+Author       : Thyssen Wen
+Date         : 2023-05-08 15:20:41
+LastEditors  : Thyssen Wen
+LastEditTime : 2023-05-08 15:20:41
+Description  : convert videos to pre-decoded memory-mappable frame shards
+FilePath     : /SVTAS/tools/dataset_transform/convert_video_to_frame_shards.py
+'''
+import os
+import sys
+path = os.path.join(os.getcwd())
+sys.path.append(path)
+import json
+import argparse
+import numpy as np
+import decord as de
+from PIL import Image
+from tqdm import tqdm
+from svtas.loader.transform.transform_fn.transform_fn import resize
+
+def parse_file_paths(input_path, dataset_type):
+    if dataset_type in ['gtea', '50salads', 'thumos14', 'egtea']:
+        file_ptr = open(input_path, 'r')
+        info = file_ptr.read().split('\n')[:-1]
+        file_ptr.close()
+    elif dataset_type in ['breakfast']:
+        file_ptr = open(input_path, 'r')
+        info = file_ptr.read().split('\n')[:-1]
+        file_ptr.close()
+        refine_info = []
+        for info_name in info:
+            video_ptr = info_name.split('.')[0].split('_')
+            file_name = ''
+            for j in range(2):
+                if video_ptr[j] == 'stereo01':
+                    video_ptr[j] = 'stereo'
+                file_name = file_name + video_ptr[j] + '/'
+            file_name = file_name + video_ptr[2] + '_' + video_ptr[3]
+            if 'stereo' in file_name:
+                file_name = file_name + '_ch0'
+            refine_info.append([info_name, file_name])
+        info = refine_info
+    return info
+
+def load_file(videos_path, file_path, dataset_type):
+    """Load index file to get video information."""
+    video_path_list = []
+    video_segment_lists = parse_file_paths(file_path, dataset_type)
+    for video_segment in video_segment_lists:
+        if dataset_type in ['gtea', '50salads', 'thumos14', 'egtea']:
+            video_segment_path = video_segment.split('.')[0]
+        elif dataset_type in ['breakfast']:
+            video_segment_path = video_segment[1]
+
+        video_path = os.path.join(videos_path, video_segment_path + '.mp4')
+        if not os.path.isfile(video_path):
+            video_path = os.path.join(videos_path, video_segment_path + '.avi')
+        video_path_list.append([video_segment_path, video_path])
+    return video_path_list
+
+def resize_frames(frames, short_side):
+    if short_side <= 0:
+        return frames
+    # same resize as `ResizeImproved`, so online resize becomes identity
+    return np.stack([np.asarray(resize(Image.fromarray(frame, mode="RGB"), short_side)) for frame in frames])
+
+def write_video_shards(video_path, shard_path, short_side, chunk_size):
+    video = de.VideoReader(video_path)
+    num_frames = len(video)
+    os.makedirs(shard_path, exist_ok=True)
+    shards = []
+    frame_shape = None
+    for shard_idx, start_idx in enumerate(range(0, num_frames, chunk_size)):
+        end_idx = min(start_idx + chunk_size, num_frames)
+        frames = resize_frames(video.get_batch(list(range(start_idx, end_idx))).asnumpy(), short_side)
+        shard_name = "shard_{:05d}.npy".format(shard_idx)
+        shard = np.lib.format.open_memmap(os.path.join(shard_path, shard_name), mode='w+',
+                                          dtype=np.uint8, shape=frames.shape)
+        shard[:] = frames
+        shard.flush()
+        del shard
+        shards.append(shard_name)
+        frame_shape = list(frames.shape[1:])
+
+    # index is written at last, so a half-done video is converted again when resume
+    with open(os.path.join(shard_path, 'index.json'), 'w') as f:
+        json.dump(dict(num_frames=num_frames,
+                       chunk_size=chunk_size,
+                       frame_shape=frame_shape,
+                       shards=shards), f)
+
+def main():
+    args = get_arguments()
+    video_path_list = load_file(args.videos_path, args.label_path, args.data_type)
+
+    for video_segment_path, video_path in tqdm(video_path_list, desc="Convert video to frame shards: "):
+        shard_path = os.path.join(args.out_path, video_segment_path)
+        if args.resume and os.path.isfile(os.path.join(shard_path, 'index.json')):
+            continue
+        write_video_shards(video_path, shard_path, args.short_side, args.chunk_size)
+
+def get_arguments():
+    """
+    parse all the arguments from command line inteface
+    return a list of parsed arguments
+    """
+
+    parser = argparse.ArgumentParser(
+        description="convert videos to pre-decoded frame shards for ShardContainer")
+    parser.add_argument("label_path", type=str, help="path of a split file")
+    parser.add_argument("videos_path", type=str, help="path of a video files")
+    parser.add_argument("out_path", type=str, help="path of output frame shards, e.g. ./data/gtea/frame_shards")
+    parser.add_argument(
+        "--data_type",
+        type=str,
+        help="dataset type.",
+        default="gtea"
+    )
+    parser.add_argument(
+        "--short_side",
+        type=int,
+        help="resize short side of frames to this size, <= 0 means not resize.",
+        default=256
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        help="number of frames per shard file.",
+        default=512
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='skip videos which have been converted')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    main()
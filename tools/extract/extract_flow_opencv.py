@@ -11,38 +11,175 @@ import os
 import sys
 path = os.path.join(os.getcwd())
 sys.path.append(path)
+import json
+import time
+import queue
 import argparse
+import threading
+import multiprocessing
 import cv2
 import numpy as np
 
-def extract_optical_flow(video, out_path, video_name, bound=15):
+# flow engine of this worker process, created once by `init_worker`
+_FLOW_ENGINE = None
+
+def init_worker(cv_threads=1):
+    global _FLOW_ENGINE
+    # parallel over videos, not inside one flow
+    cv2.setNumThreads(cv_threads)
+    _FLOW_ENGINE = cv2.optflow.createOptFlow_DeepFlow()
+
+def get_flow_engine():
+    if _FLOW_ENGINE is None:
+        init_worker()
+    return _FLOW_ENGINE
+
+def quantize_flow(flow, bound=15):
+    # [H, W, 2] float flow -> [H, W, 3] uint8 image, third channel is zero
+    flow = np.clip(np.round((flow + bound) * (255.0 / (2 * bound))), 0, 255).astype(np.uint8)
+    zero = np.zeros(flow.shape[:2] + (1, ), dtype=np.uint8)
+    return np.concatenate([flow, zero], axis=-1)
+
+def read_gray_frames(video_path, frame_queue, stop_event):
+    """
+    Decode frames to grayscale into a bounded queue, None is the end of video.
+    """
+    video = cv2.VideoCapture(video_path)
+    try:
+        while not stop_event.is_set():
+            success, frame = video.read()
+            if not success:
+                break
+            frame_queue.put(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    finally:
+        video.release()
+        frame_queue.put(None)
+
+class MP4FlowWriter(object):
+    """
+    uint8 flow video, frame 0 is zeros. Written to a partial file and renamed
+    when finished, so resume skips only complete videos.
+    """
+    def __init__(self, out_path, video_name, fps, width, height, bound=15):
+        self.out_file = os.path.join(out_path, video_name + '.mp4')
+        self.part_file = os.path.join(out_path, video_name + '.part.mp4')
+        self.bound = bound
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        self.flow_video = cv2.VideoWriter(self.part_file, fourcc, fps, (width, height))
+        self.flow_video.write(np.zeros((height, width, 3), dtype=np.uint8))
+
+    @staticmethod
+    def is_done(out_path, video_name):
+        return os.path.isfile(os.path.join(out_path, video_name + '.mp4'))
+
+    def write(self, flow):
+        self.flow_video.write(quantize_flow(flow, self.bound))
+
+    def close(self):
+        self.flow_video.release()
+        os.replace(self.part_file, self.out_file)
+
+class ShardFlowWriter(object):
+    """
+    Raw flow shards in the layout of `ShardContainer`, `[chunk_size, H, W, 2]`
+    float16 npy, frame 0 is zeros. `index.json` is written at last, so resume
+    skips only complete videos.
+    """
+    def __init__(self, out_path, video_name, fps, width, height, chunk_size=512, dtype='float16'):
+        self.shard_path = os.path.join(out_path, video_name)
+        os.makedirs(self.shard_path, exist_ok=True)
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+        self.fps = fps
+        self.frame_shape = [height, width, 2]
+        self.buffer = np.empty([chunk_size] + self.frame_shape, dtype=dtype)
+        self.buffer_len = 0
+        self.num_frames = 0
+        self.shards = []
+        self.write(np.zeros(self.frame_shape, dtype=dtype))
+
+    @staticmethod
+    def is_done(out_path, video_name):
+        return os.path.isfile(os.path.join(out_path, video_name, 'index.json'))
+
+    def _write_shard(self):
+        if self.buffer_len <= 0:
+            return
+        shard_name = "shard_{:05d}.npy".format(len(self.shards))
+        np.save(os.path.join(self.shard_path, shard_name), self.buffer[:self.buffer_len])
+        self.shards.append(shard_name)
+        self.buffer_len = 0
+
+    def write(self, flow):
+        self.buffer[self.buffer_len] = flow
+        self.buffer_len += 1
+        self.num_frames += 1
+        if self.buffer_len >= self.chunk_size:
+            self._write_shard()
+
+    def close(self):
+        self._write_shard()
+        with open(os.path.join(self.shard_path, 'index.json'), 'w') as f:
+            json.dump(dict(num_frames=self.num_frames,
+                           chunk_size=self.chunk_size,
+                           frame_shape=self.frame_shape,
+                           dtype=self.dtype,
+                           fps=self.fps,
+                           shards=self.shards), f)
+
+FLOW_WRITERS = dict(mp4=MP4FlowWriter, shard=ShardFlowWriter)
+
+def extract_optical_flow(video_path, out_path, video_name, output_format='mp4', bound=15, queue_size=64, chunk_size=512):
+    """
+    Extract DeepFlow of one video with the flow engine of this worker, frames
+    are decoded by a reader thread. Return number of frames and cost time.
+    """
+    tic = time.time()
+    video = cv2.VideoCapture(video_path)
     width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = video.get(cv2.CAP_PROP_FPS)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    flow_video = cv2.VideoWriter(os.path.join(out_path, video_name + '.mp4'), fourcc, fps, (width, height))
-    zero = np.zeros((width, height, 3), dtype=np.uint8)
-    flow_video.write(zero)
-    success, prev = video.read()
-    prev = cv2.cvtColor(prev, cv2.COLOR_BGR2GRAY)
-    while success:
-        success, curr = video.read()
-        if success:
-            curr = cv2.cvtColor(curr, cv2.COLOR_BGR2GRAY)
-
-            optflow_model = cv2.optflow.createOptFlow_DeepFlow()
-            flow = optflow_model.calc(prev, curr, None)
-            
-            flow = (flow + bound) * (255.0 / (2 * bound))
-            flow = np.round(flow).astype(int)
-            flow[flow >= 255] = 255
-            flow[flow <= 0] = 0
-            zero = np.zeros((flow.shape[0], flow.shape[1], 1), dtype=int)
-            flow = np.concatenate([flow, zero], axis=-1)
-            prev = curr
-            flow = np.uint8(flow)
-            flow_video.write(flow)
-    flow_video.release()
+    video.release()
+    if output_format == 'mp4':
+        writer = MP4FlowWriter(out_path, video_name, fps, width, height, bound=bound)
+    else:
+        writer = ShardFlowWriter(out_path, video_name, fps, width, height, chunk_size=chunk_size)
+
+    frame_queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    reader = threading.Thread(target=read_gray_frames, args=(video_path, frame_queue, stop_event), daemon=True)
+    reader.start()
+
+    optflow_model = get_flow_engine()
+    num_frames = 0
+    prev = frame_queue.get()
+    try:
+        if prev is not None:
+            num_frames = 1
+            while True:
+                curr = frame_queue.get()
+                if curr is None:
+                    break
+                writer.write(optflow_model.calc(prev, curr, None))
+                prev = curr
+                num_frames += 1
+    finally:
+        stop_event.set()
+        # unblock the reader if the queue is full
+        while reader.is_alive():
+            try:
+                frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+    writer.close()
+    return num_frames, time.time() - tic
+
+def extract_task(task):
+    video_path, video_name, args = task
+    num_frames, cost_time = extract_optical_flow(video_path, args.out_path, video_name,
+                                                 output_format=args.output_format, bound=args.bound,
+                                                 queue_size=args.queue_size, chunk_size=args.chunk_size)
+    return video_name, num_frames, cost_time
 
 def extractor(args):
     path_list = []
@@ -50,15 +187,31 @@ def extractor(args):
     with open(args.input_list, 'r') as f:
         for id, line in enumerate(f):
             video_name = line.strip()
+            if len(video_name) <= 0:
+                continue
             path_list.append(video_name)
             video_name_list.append(video_name.split('/')[-1].split('.')[-2])
-    
+
+    os.makedirs(args.out_path, exist_ok=True)
+    writer_cls = FLOW_WRITERS[args.output_format]
+    tasks = []
     for video_path, video_name in zip(path_list, video_name_list):
-        video = cv2.VideoCapture(video_path)
-        extract_optical_flow(video=video, out_path=args.out_path, video_name=video_name)
-        print(f"finish extract {video_name}.")
+        if args.resume and writer_cls.is_done(args.out_path, video_name):
+            continue
+        tasks.append((video_path, video_name, args))
+    print(f"extract {len(tasks)} videos, skip {len(path_list) - len(tasks)} finished videos.")
+
+    num_workers = max(min(args.num_workers, len(tasks)), 1)
+    start_time = time.time()
+    total_frames = 0
+    with multiprocessing.Pool(num_workers, initializer=init_worker, initargs=(args.cv_threads, )) as pool:
+        for finish_idx, (video_name, num_frames, cost_time) in enumerate(pool.imap_unordered(extract_task, tasks)):
+            total_frames += num_frames
+            elapsed = time.time() - start_time
+            print("[{:d}/{:d}] finish extract {}, {:d} frames, {:.2f} fps | total {:.2f} fps, elapsed {:.1f} s.".format(
+                finish_idx + 1, len(tasks), video_name, num_frames, num_frames / max(cost_time, 1e-10),
+                total_frames / max(elapsed, 1e-10), elapsed))
 
-    
     print("Finish all extracting!")
 
 def parse_args():
@@ -72,6 +225,34 @@ def parse_args():
                         '--out_path',
                         type=str,
                         help='extract flow file out path')
+    parser.add_argument('--output_format',
+                        type=str,
+                        choices=list(FLOW_WRITERS.keys()),
+                        default='mp4',
+                        help='uint8 flow mp4 or raw float16 flow shards')
+    parser.add_argument('--num_workers',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='number of extract processes, one video per process')
+    parser.add_argument('--cv_threads',
+                        type=int,
+                        default=1,
+                        help='opencv threads of every process')
+    parser.add_argument('--queue_size',
+                        type=int,
+                        default=64,
+                        help='max decoded frames waiting for flow')
+    parser.add_argument('--bound',
+                        type=float,
+                        default=15,
+                        help='flow bound of uint8 mp4')
+    parser.add_argument('--chunk_size',
+                        type=int,
+                        default=512,
+                        help='number of frames per raw flow shard file')
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='skip videos which have been extracted')
     args = parser.parse_args()
     return args
 
@@ -80,4 +261,4 @@ def main():
     extractor(args)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
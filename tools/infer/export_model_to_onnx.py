@@ -68,7 +68,9 @@ def export_model_to_onnx(cfg,
         export_path,
         opset_version=11,
         input_names=['input_data', 'masks'],
-        output_names=['output'])
+        output_names=['output'],
+        # dynamic batch for multi stream infer, scores are [num_stages, N, C, T]
+        dynamic_axes={'input_data': {0: 'batch_size'}, 'masks': {0: 'batch_size'}, 'output': {1: 'batch_size'}})
     logger.info("Finish exporting ONNX model to " + export_path + " !")
     
     # Model check
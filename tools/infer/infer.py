@@ -7,18 +7,19 @@ Description  : Multi Device Infer Script with visualize program
 FilePath     : /SVTAS/tools/infer/infer.py
 '''
 import os
+import sys
+path = os.path.join(os.getcwd())
+sys.path.append(path)
 import cv2
 import copy
 import queue
+import threading
 import numpy as np
 import argparse
 import onnxruntime
 from PIL import Image
 from cv2 import getTickCount, getTickFrequency
-
-def load_capture(args):
-    capture = cv2.VideoCapture(args.input)
-    return capture
+from svtas.runner.stream_infer_engine import MultiStreamInferEngine
 
 def make_palette(num_classes):
     """
@@ -75,8 +76,9 @@ def parse_args():
     parser.add_argument('-i',
                         '--input',
                         type=str,
-                        default='example.mp4',
-                        help='infer video path')
+                        nargs='+',
+                        default=['example.mp4'],
+                        help='infer video paths or camera ids, all streams are infered in one batch')
     parser.add_argument('-l',
                         '--label',
                         type=str,
@@ -86,7 +88,7 @@ def parse_args():
                         '--output',
                         type=str,
                         default='example_infer.mp4',
-                        help='infer video output path')
+                        help='infer video output path, add stream index for multi input')
     parser.add_argument('--visualize',
                         action="store_true",
                         help='wheather visualize video when infer')
@@ -101,122 +103,151 @@ def parse_args():
     parser.add_argument('--sliding_window',
                         type=int,
                         default=32,
-                        help='infer model sliding windows size')   
+                        help='infer model sliding windows size')
+    parser.add_argument('--num_slots',
+                        type=int,
+                        default=None,
+                        help='max streams in one batch, default all inputs, need onnx model exported with dynamic batch')
     args = parser.parse_args()
     return args
 
-def infer():
-    args = parse_args()
+class StreamVisualizer(object):
+    """
+    Sliding window reader and label visualizer of one video stream.
+    """
     #! set mean and std
     memory_factor = 3
-    mean = [[[0.551, 0.424, 0.179]]]
-    std = [[[0.133, 0.141, 0.124]]]
-    mean = np.array(mean)[:,:,::-1].transpose((2,0,1))
-    std = np.array(std)[:,:,::-1].transpose((2,0,1))
-
-    # load model
-    ort_session = onnxruntime.InferenceSession(args.model)
-
-    # load mapping label
-    file_ptr = open(args.label, 'r')
-    actions = file_ptr.read().split('\n')[:-1]
-    file_ptr.close()
-    actions_dict = dict()
-    for a in actions:
-        actions_dict[int(a.split()[0])] = a.split()[1]
-    palette = make_palette(len(actions_dict))
-
-    # load video
-    capture = load_capture(args)
-    
-    # get video width
-    frame_width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
-    # get video height
-    frame_height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    # get video fps
-    fps = capture.get(cv2.CAP_PROP_FPS)
-
-    # write video setting
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(args.output, fourcc, fps, (frame_width, frame_height))
-
-    # online infer looping
-    data_queue = queue.Queue(maxsize=args.clip_seg_num * args.sample_rate)
-    label_queue = queue.Queue(maxsize=args.clip_seg_num * args.sample_rate * memory_factor)
-    infer_run_flag = True
-    while data_queue.qsize() != (args.clip_seg_num * args.sample_rate):
-        ret, frame = capture.read()
-        if not ret:
-            infer_run_flag = False
-            break
-        data_queue.put(frame)
+    mean = np.array([[[0.551, 0.424, 0.179]]])[:,:,::-1].transpose((2,0,1))
+    std = np.array([[[0.133, 0.141, 0.124]]])[:,:,::-1].transpose((2,0,1))
+
+    def __init__(self, args, stream_name, input_path, output_path, actions_dict, palette, stop_event):
+        self.args = args
+        self.stream_name = stream_name
+        self.actions_dict = actions_dict
+        self.palette = palette
+        self.stop_event = stop_event
+        # camera id or video path
+        self.capture = cv2.VideoCapture(int(input_path) if input_path.isdigit() else input_path)
         
-    loop_start = getTickCount()
-    while infer_run_flag:
-        # preprocess
-        data = list(copy.deepcopy(data_queue.queue))[::args.sample_rate]
-        imgs = []
-        for img in data:
-            img = cv2.resize(img, (224, 224))
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)[:,:,::-1].transpose((2,0,1))
-            img = img.astype(np.float64) / 255
-            img-=mean
-            img/=std
-            imgs.append(img)
-        imgs = np.array(imgs)
-        imgs = np.expand_dims(imgs, axis=0)
-        masks = np.ones((1, args.clip_seg_num * args.sample_rate))
-        input_data = dict(input_data=imgs.astype(np.float32), masks=masks.astype(np.float32))
-        # model infer
-        outputs = ort_session.run(None, input_data)
-        if type(outputs) is not np.ndarray:
-            outputs = outputs[-1]
-
+        # get video width
+        self.frame_width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        # get video height
+        self.frame_height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # get video fps
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+
+        # write video setting
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        self.out = cv2.VideoWriter(output_path, fourcc, fps, (self.frame_width, self.frame_height))
+
+        self.data_queue = queue.Queue(maxsize=args.clip_seg_num * args.sample_rate)
+        self.label_queue = queue.Queue(maxsize=args.clip_seg_num * args.sample_rate * self.memory_factor)
+        self.loop_start = getTickCount()
+
+    def windows(self):
+        args = self.args
+        while not self.stop_event.is_set():
+            # load frame
+            while not self.data_queue.full():
+                ret, frame = self.capture.read()
+                if not ret:
+                    return
+                self.data_queue.put(frame)
+
+            # preprocess
+            data = list(copy.deepcopy(self.data_queue.queue))[::args.sample_rate]
+            imgs = []
+            for img in data:
+                img = cv2.resize(img, (224, 224))
+                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)[:,:,::-1].transpose((2,0,1))
+                img = img.astype(np.float64) / 255
+                img-=self.mean
+                img/=self.std
+                imgs.append(img)
+            imgs = np.array(imgs)
+            masks = np.ones((args.clip_seg_num * args.sample_rate))
+            yield dict(input_data=imgs.astype(np.float32), masks=masks.astype(np.float32))
+
+    def update(self, window, outputs):
+        args = self.args
+        frame_height, frame_width = self.frame_height, self.frame_width
         # post process
-        loop_time = getTickCount() - loop_start
+        loop_time = getTickCount() - self.loop_start
         total_time = loop_time / (getTickFrequency())
         chunk_fps = 1 / total_time
         for i in range(args.sliding_window):
-            out_frame = data_queue.get()
+            out_frame = self.data_queue.get()
             # add infer info
-            cv2.putText(out_frame, "Prediction: " + actions_dict[np.argmax(outputs[0, -1, :, i])], (0, frame_height - 60), cv2.FONT_HERSHEY_COMPLEX, 0.75, (0, 255, 0), 2)
+            cv2.putText(out_frame, "Prediction: " + self.actions_dict[np.argmax(outputs[0, -1, :, i])], (0, frame_height - 60), cv2.FONT_HERSHEY_COMPLEX, 0.75, (0, 255, 0), 2)
             cv2.putText(out_frame, "FPS: " + "{:.2f}".format(chunk_fps), (frame_width - 150, 20), cv2.FONT_HERSHEY_COMPLEX, 0.75, (0, 255, 0), 1)
-            if label_queue.full():
-                label_queue.get()
-            label_queue.put([np.argmax(outputs[0, -1, :, i])])
-            label_img = label_arr2img(label_queue, palette).convert('RGB')
-            past_width = int((label_img.size[0] / (args.clip_seg_num * args.sample_rate * memory_factor)) * (frame_width - 30))
+            if self.label_queue.full():
+                self.label_queue.get()
+            self.label_queue.put([np.argmax(outputs[0, -1, :, i])])
+            label_img = label_arr2img(self.label_queue, self.palette).convert('RGB')
+            past_width = int((label_img.size[0] / (args.clip_seg_num * args.sample_rate * self.memory_factor)) * (frame_width - 30))
             label_img = cv2.cvtColor(np.asarray(label_img),cv2.COLOR_RGB2BGR)
             label_img = cv2.resize(label_img, (past_width, 20))
             out_frame[(frame_height - 30):(frame_height - 10), 10:(10 + past_width), :] = label_img
             out_frame = cv2.rectangle(out_frame, (10 + past_width, frame_height - 10), (20 + past_width, frame_height - 30), (255, 255, 255), thickness=-1)
             cv2.putText(out_frame, "Current Frame", (max(past_width - 120, 0), frame_height - 40), cv2.FONT_HERSHEY_COMPLEX, 0.5, (0, 255, 0), 1)
 
-            data = list(copy.deepcopy(label_queue.queue))
+            data = list(copy.deepcopy(self.label_queue.queue))
             array = np.array(data).transpose()
             label = list(set(array[0, :].tolist()))
-            out_frame = draw_action_label(out_frame, palette, actions_dict, label)
+            out_frame = draw_action_label(out_frame, self.palette, self.actions_dict, label)
             
             # visualize program
             if args.visualize:
-                cv2.imshow("real-time temporal action segmentation", out_frame)
+                cv2.imshow("real-time temporal action segmentation " + self.stream_name, out_frame)
                 if cv2.waitKey(5) & 0xFF == ord('q'):
-                    infer_run_flag = False
+                    self.stop_event.set()
                     break
-            out.write(out_frame)
-            
-        # load frame
-        while not data_queue.full():
-            ret, frame = capture.read()
-            if not ret:
-                infer_run_flag = False
-                break
-            data_queue.put(frame)
-
-        loop_start = getTickCount()
-    # save process
-    capture.release()
-    out.release()
+            self.out.write(out_frame)
+        self.loop_start = getTickCount()
+
+    def finish(self):
+        # save process
+        self.capture.release()
+        self.out.release()
+        return self.stream_name
+
+def infer():
+    args = parse_args()
+
+    # load model
+    ort_session = onnxruntime.InferenceSession(args.model)
+    output_names = [output.name for output in ort_session.get_outputs()]
+
+    def forward_fn(input_data):
+        # model infer
+        outputs = ort_session.run(None, input_data)
+        if type(outputs) is not np.ndarray:
+            outputs = outputs[output_names.index('output')] if 'output' in output_names else outputs[-1]
+        return outputs
+
+    # load mapping label
+    file_ptr = open(args.label, 'r')
+    actions = file_ptr.read().split('\n')[:-1]
+    file_ptr.close()
+    actions_dict = dict()
+    for a in actions:
+        actions_dict[int(a.split()[0])] = a.split()[1]
+    palette = make_palette(len(actions_dict))
+
+    # online infer looping, windows of all streams are batched into one forward
+    num_slots = args.num_slots if args.num_slots is not None else len(args.input)
+    engine = MultiStreamInferEngine(forward_fn, num_slots, input_names=['input_data', 'masks'])
+    stop_event = threading.Event()
+    for stream_idx, input_path in enumerate(args.input):
+        if len(args.input) > 1:
+            output_root, output_ext = os.path.splitext(args.output)
+            output_path = "{}_{:d}{}".format(output_root, stream_idx, output_ext)
+        else:
+            output_path = args.output
+        visualizer = StreamVisualizer(args, str(stream_idx), input_path, output_path, actions_dict, palette, stop_event)
+        engine.add_stream(stream_idx, visualizer.windows(), visualizer)
+    engine.run()
+    print(engine.latency.format())
     cv2.destroyAllWindows()
 
 if __name__ == '__main__':